@@ -0,0 +1,5 @@
+# Makes the Celery app the default one as soon as Django starts, so tasks
+# published from web processes use its broker, queues and routes.
+from .celery_app import celery_app
+
+__all__ = ('celery_app',)
@@ -1,26 +1,25 @@
+import logging
 import os
 from celery import Celery
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
+logger = logging.getLogger(__name__)
+
+
 def create_celery_app():
     app = Celery('app')
-    
+
     # Using a string here means the worker doesn't have to serialize
     # the configuration object to child processes.
+    # Queues, routing, prefetch and compression are set in the CELERY_*
+    # settings.
     app.config_from_object('django.conf:settings', namespace='CELERY')
-    
-    # Load task modules from all registered Django apps.
+
+    # Load task modules from all registered Django apps, including todo.
     app.autodiscover_tasks()
-    
-    # Explicitly import task modules to ensure they're discovered
-    app.autodiscover_tasks(['todo'])
-    
-    # Print discovered tasks for debugging
-    print("Celery app created successfully")
-    print(f"Registered tasks: {list(app.tasks.keys())}")
-    
+
     return app
 
 # Create the celery app instance
@@ -28,4 +27,4 @@ celery_app = create_celery_app()
 
 @celery_app.task(bind=True)
 def debug_task(self):
-    print(f'Request: {self.request!r}') 
\ No newline at end of file
+    logger.info(f'Request: {self.request!r}')
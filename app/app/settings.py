@@ -19,12 +19,12 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # See https://docs.djangoproject.com/en/3.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-^w((vo@85as9@jf0r&e6mk6x(p7&v8u)@59c5_yont@xfh*yeu'
+SECRET_KEY = os.getenv('SECRET_KEY', 'django-insecure-^w((vo@85as9@jf0r&e6mk6x(p7&v8u)@59c5_yont@xfh*yeu')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.getenv('DEBUG', 'False') == 'True'
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',')
 
 
 # Application definition
@@ -40,6 +40,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # first, so its timings cover the other middleware too
+    'core.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -77,6 +79,19 @@ POSTGRES_PORT = os.getenv("POSTGRES_PORT", 5432)
 POSTGRES_USER = os.getenv("POSTGRES_USER", "postgres_user")
 POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD", "password")
 POSTGRES_NAME = os.getenv("POSTGRES_NAME", "app")
+# "wsgi", "asgi" or "dev", see gunicorn.conf.py and start.sh
+APP_SERVER = os.getenv("APP_SERVER", "wsgi")
+# psycopg 3 connection pool per process; replaces persistent connections
+DB_POOL = os.getenv("DB_POOL", "False") == "True"
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 2))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+# Seconds a request waits for a pooled connection before failing
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+# Seconds a connection is reused across requests. Django recommends no
+# persistent connections under ASGI, where pooling takes their place.
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", 0 if DB_POOL or APP_SERVER == "asgi" else 60))
+# Needed behind pgbouncer in transaction pooling mode
+DB_DISABLE_SERVER_SIDE_CURSORS = os.getenv("DB_DISABLE_SERVER_SIDE_CURSORS", "False") == "True"
 
 DATABASES = {
     "default": {
@@ -85,9 +100,21 @@ DATABASES = {
         "USER": POSTGRES_USER,
         "PASSWORD": POSTGRES_PASSWORD,
         "PORT": POSTGRES_PORT,
-        "NAME": POSTGRES_NAME
+        "NAME": POSTGRES_NAME,
+        "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+        # a reused or pooled connection is checked before a request uses it
+        "CONN_HEALTH_CHECKS": DB_CONN_MAX_AGE > 0 or DB_POOL,
+        "DISABLE_SERVER_SIDE_CURSORS": DB_DISABLE_SERVER_SIDE_CURSORS,
+        "OPTIONS": {},
     }
 }
+if DB_POOL:
+    # Requires psycopg 3 with psycopg_pool instead of psycopg2
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": DB_POOL_MIN_SIZE,
+        "max_size": DB_POOL_MAX_SIZE,
+        "timeout": DB_POOL_TIMEOUT,
+    }
 
 
 # Password validation
@@ -133,6 +160,62 @@ STATIC_URL = '/static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.instrumentation.InstrumentedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+# Request instrumentation, exposed at /metrics
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+# Directory where worker processes share their totals; unset, /metrics only
+# reports the process that serves it
+METRICS_MULTIPROCESS_DIR = os.getenv('METRICS_MULTIPROCESS_DIR', '')
+# Seconds between writes of a process's totals to that directory
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+# A request running the same SQL statement this many times is flagged as N+1
+METRICS_N_PLUS_ONE_THRESHOLD = int(os.getenv('METRICS_N_PLUS_ONE_THRESHOLD', 10))
+
+# Celery task profiling: comma-separated task names (full or short) or "*"
+# to run under cProfile, on top of runs sent with the "profile" header
+TASK_PROFILE = os.getenv('TASK_PROFILE', '')
+# Fraction of the selected task runs that are profiled
+TASK_PROFILE_SAMPLE_RATE = float(os.getenv('TASK_PROFILE_SAMPLE_RATE', 1.0))
+TASK_PROFILE_DIR = os.getenv('TASK_PROFILE_DIR', '/tmp/task-profiles')
+
+# Cache
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.redis.RedisCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'redis://redis:6379/1'),
+    }
+}
+# Read cache for todo lists and todos
+TODO_CACHE_TIMEOUT = int(os.getenv('TODO_CACHE_TIMEOUT', 300))
+TODO_CACHE_LOCAL_MAXSIZE = int(os.getenv('TODO_CACHE_LOCAL_MAXSIZE', 1024))
+# How long a process serves entries from its own memory without checking Redis
+TODO_CACHE_LOCAL_TTL = float(os.getenv('TODO_CACHE_LOCAL_TTL', 2))
+
+# Serve the hot list endpoints from .values() rows rendered straight to JSON
+# instead of DRF serializers; the response body is identical. Installing
+# orjson speeds up the rendering further.
+TODO_FAST_JSON = os.getenv('TODO_FAST_JSON', 'False') == 'True'
+
+# Serve the todo read endpoints from async views. Only worth it under an
+# ASGI server; under WSGI every request would start its own event loop.
+TODO_ASYNC_VIEWS = os.getenv('TODO_ASYNC_VIEWS', str(APP_SERVER == 'asgi')) == 'True'
+
+# Todo change feed, a Redis stream with pub/sub fan-out
+TODO_EVENTS_REDIS_URL = os.getenv('TODO_EVENTS_REDIS_URL', 'redis://redis:6379/2')
+# Events kept for clients resuming with Last-Event-ID
+TODO_EVENTS_STREAM_MAXLEN = int(os.getenv('TODO_EVENTS_STREAM_MAXLEN', 100000))
+# Events buffered per subscriber before it falls back to reading the stream
+TODO_EVENTS_QUEUE_SIZE = int(os.getenv('TODO_EVENTS_QUEUE_SIZE', 1000))
+TODO_EVENTS_BATCH_SIZE = int(os.getenv('TODO_EVENTS_BATCH_SIZE', 100))
+TODO_EVENTS_BATCH_INTERVAL = float(os.getenv('TODO_EVENTS_BATCH_INTERVAL', 0.05))
+TODO_EVENTS_HEARTBEAT = float(os.getenv('TODO_EVENTS_HEARTBEAT', 15))
+
 # Celery Configuration
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://redis:6379/0')
 CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://redis:6379/0')
@@ -140,8 +223,139 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+# gzip task and result bodies, the import chords carry every chunk's
+# arguments and results
+CELERY_TASK_COMPRESSION = os.getenv('CELERY_TASK_COMPRESSION', 'gzip') or None
+CELERY_RESULT_COMPRESSION = os.getenv('CELERY_RESULT_COMPRESSION', 'gzip') or None
+
+# Queues: uploads can keep workers busy for minutes, so they get their own
+# workers and never delay the index sync, reminders or cleanup
+CELERY_TASK_DEFAULT_QUEUE = 'maintenance'
+CELERY_TASK_ROUTES = {
+    'todo.interfaces.tasks.process_todo_upload': {'queue': 'imports'},
+    'todo.interfaces.tasks.import_todo_chunk': {'queue': 'imports'},
+    'todo.interfaces.tasks.finalize_todo_import': {'queue': 'imports'},
+    'todo.interfaces.tasks.fail_todo_import': {'queue': 'imports'},
+    'todo.interfaces.tasks.sync_todo_index': {'queue': 'indexing'},
+    'todo.interfaces.tasks.cleanup_old_todos': {'queue': 'maintenance'},
+    'todo.interfaces.tasks.send_todo_reminders': {'queue': 'maintenance'},
+    'todo.interfaces.tasks.reconcile_todo_counters': {'queue': 'maintenance'},
+}
+# Per worker instance, e.g. "10/m"; empty for no limit
+CELERY_TASK_ANNOTATIONS = {
+    'todo.interfaces.tasks.process_todo_upload': {'rate_limit': os.getenv('TODO_UPLOAD_RATE_LIMIT', '30/m') or None},
+    'todo.interfaces.tasks.import_todo_chunk': {'rate_limit': os.getenv('TODO_IMPORT_CHUNK_RATE_LIMIT', '') or None},
+}
+
+# Messages are acknowledged when a task starts. Tasks that can run twice
+# safely set acks_late=True and are redelivered if their worker dies; the
+# uploads and import chunks are not, a rerun would insert their rows twice
+CELERY_TASK_ACKS_LATE = False
+# Reserve one message per process, so a busy process does not hold back
+# messages another one could run
+CELERY_WORKER_PREFETCH_MULTIPLIER = int(os.getenv('CELERY_WORKER_PREFETCH_MULTIPLIER', 1))
+# A process killed mid-task fails the task instead of redelivering it
+CELERY_TASK_REJECT_ON_WORKER_LOST = False
+# Unacknowledged messages are redelivered after this many seconds, keep it
+# above the longest task
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'visibility_timeout': int(os.getenv('CELERY_VISIBILITY_TIMEOUT', 6 * 3600)),
+}
+# Recycle worker processes to bound memory growth from large imports
+CELERY_WORKER_MAX_TASKS_PER_CHILD = int(os.getenv('CELERY_WORKER_MAX_TASKS_PER_CHILD', 100))
+
+# Todo upload import
+TODO_UPLOAD_BATCH_SIZE = int(os.getenv('TODO_UPLOAD_BATCH_SIZE', 5000))
+# Use PostgreSQL COPY instead of bulk_create when the backend supports it
+TODO_UPLOAD_USE_COPY = os.getenv('TODO_UPLOAD_USE_COPY', 'True') == 'True'
+# Uploads are split into line-aligned ranges of about this size, one import task each
+TODO_UPLOAD_CHUNK_BYTES = int(os.getenv('TODO_UPLOAD_CHUNK_BYTES', 16 * 1024 * 1024))
+# Files uploaded to /tasks/upload/file/ are streamed here; must be shared
+# with the import workers
+TODO_UPLOAD_SPOOL_DIR = os.getenv('TODO_UPLOAD_SPOOL_DIR', '/data/uploads')
+TODO_UPLOAD_MAX_BYTES = int(os.getenv('TODO_UPLOAD_MAX_BYTES', 10 * 1024 ** 3))
+# Serialises submissions of the same file so only one of them is imported
+TODO_IMPORT_LOCK_REDIS_URL = os.getenv('TODO_IMPORT_LOCK_REDIS_URL', 'redis://redis:6379/1')
+TODO_IMPORT_LOCK_TIMEOUT = float(os.getenv('TODO_IMPORT_LOCK_TIMEOUT', 30))
+# Imports pending or running for longer are taken to be lost and can be resubmitted
+TODO_IMPORT_STALE_AFTER = int(os.getenv('TODO_IMPORT_STALE_AFTER', 6 * 3600))
+
+# Todo export, streamed from a server-side cursor
+# Rows fetched from the database per round trip
+TODO_EXPORT_CHUNK_SIZE = int(os.getenv('TODO_EXPORT_CHUNK_SIZE', 2000))
+# Encoded bytes collected before each write to the client
+TODO_EXPORT_BUFFER_BYTES = int(os.getenv('TODO_EXPORT_BUFFER_BYTES', 64 * 1024))
+TODO_EXPORT_GZIP_LEVEL = int(os.getenv('TODO_EXPORT_GZIP_LEVEL', 6))
+
+# Elasticsearch
+ELASTICSEARCH_URL = os.getenv('ELASTICSEARCH_URL', 'http://elasticsearch:9200')
+ELASTICSEARCH_BULK_CHUNK_SIZE = int(os.getenv('ELASTICSEARCH_BULK_CHUNK_SIZE', 1000))
+ELASTICSEARCH_BULK_MAX_CHUNK_BYTES = int(os.getenv('ELASTICSEARCH_BULK_MAX_CHUNK_BYTES', 10 * 1024 * 1024))
+ELASTICSEARCH_BULK_THREAD_COUNT = int(os.getenv('ELASTICSEARCH_BULK_THREAD_COUNT', 4))
+ELASTICSEARCH_BULK_MAX_RETRIES = int(os.getenv('ELASTICSEARCH_BULK_MAX_RETRIES', 3))
+# Loads of at least this many documents run with refresh_interval disabled
+ELASTICSEARCH_BULK_REFRESH_THRESHOLD = int(os.getenv('ELASTICSEARCH_BULK_REFRESH_THRESHOLD', 10000))
+
+# Todo search index sync (outbox drain)
+TODO_INDEX_SYNC_BATCH_SIZE = int(os.getenv('TODO_INDEX_SYNC_BATCH_SIZE', 1000))
+TODO_INDEX_SYNC_MAX_BATCHES = int(os.getenv('TODO_INDEX_SYNC_MAX_BATCHES', 50))
+TODO_INDEX_SYNC_INTERVAL = float(os.getenv('TODO_INDEX_SYNC_INTERVAL', 5))
+
+# Purge of completed todos
+TODO_CLEANUP_RETENTION_DAYS = int(os.getenv('TODO_CLEANUP_RETENTION_DAYS', 30))
+TODO_CLEANUP_BATCH_SIZE = int(os.getenv('TODO_CLEANUP_BATCH_SIZE', 1000))
+# Batches per run; a pass over a large backlog continues on the next run
+TODO_CLEANUP_MAX_BATCHES = int(os.getenv('TODO_CLEANUP_MAX_BATCHES', 100))
+TODO_CLEANUP_INTERVAL = float(os.getenv('TODO_CLEANUP_INTERVAL', 3600))
+
+# Overdue todo reminders
+# Dotted path of a todo.data.reminders.todo.ReminderBackend subclass
+TODO_REMINDER_BACKEND = os.getenv('TODO_REMINDER_BACKEND', 'todo.data.reminders.todo.LoggingReminderBackend')
+TODO_REMINDER_WEBHOOK_URL = os.getenv('TODO_REMINDER_WEBHOOK_URL', '')
+TODO_REMINDER_WEBHOOK_TIMEOUT = float(os.getenv('TODO_REMINDER_WEBHOOK_TIMEOUT', 10))
+# Todos read per page of the scan
+TODO_REMINDER_SCAN_SIZE = int(os.getenv('TODO_REMINDER_SCAN_SIZE', 5000))
+# Reminders (one per list) per backend call, and calls in flight
+TODO_REMINDER_BATCH_SIZE = int(os.getenv('TODO_REMINDER_BATCH_SIZE', 100))
+TODO_REMINDER_CONCURRENCY = int(os.getenv('TODO_REMINDER_CONCURRENCY', 4))
+TODO_REMINDER_INTERVAL = float(os.getenv('TODO_REMINDER_INTERVAL', 300))
+# A run stops scanning after this many seconds, so it ends within its interval
+TODO_REMINDER_TIME_BUDGET = float(os.getenv('TODO_REMINDER_TIME_BUDGET', TODO_REMINDER_INTERVAL * 0.8))
+
+# Per-list todo counters
+# Open todos due within this many days, today included, count as due soon
+TODO_DUE_SOON_DAYS = int(os.getenv('TODO_DUE_SOON_DAYS', 7))
+# Lists recounted per transaction by the reconciliation
+TODO_COUNTERS_RECONCILE_BATCH_SIZE = int(os.getenv('TODO_COUNTERS_RECONCILE_BATCH_SIZE', 500))
+# Overdue and due soon roll over with the date, at most this late
+TODO_COUNTERS_RECONCILE_INTERVAL = float(os.getenv('TODO_COUNTERS_RECONCILE_INTERVAL', 3600))
 
 # Celery Task Discovery
 CELERY_IMPORTS = [
     'todo.interfaces.tasks',
 ]
+
+# Celery Beat Schedule
+CELERY_BEAT_SCHEDULE = {
+    'sync-todo-index': {
+        'task': 'todo.interfaces.tasks.sync_todo_index',
+        'schedule': TODO_INDEX_SYNC_INTERVAL,
+        # a late sync is superseded by the next one
+        'options': {'expires': TODO_INDEX_SYNC_INTERVAL},
+    },
+    'cleanup-old-todos': {
+        'task': 'todo.interfaces.tasks.cleanup_old_todos',
+        'schedule': TODO_CLEANUP_INTERVAL,
+        'options': {'expires': TODO_CLEANUP_INTERVAL},
+    },
+    'send-todo-reminders': {
+        'task': 'todo.interfaces.tasks.send_todo_reminders',
+        'schedule': TODO_REMINDER_INTERVAL,
+        'options': {'expires': TODO_REMINDER_INTERVAL},
+    },
+    'reconcile-todo-counters': {
+        'task': 'todo.interfaces.tasks.reconcile_todo_counters',
+        'schedule': TODO_COUNTERS_RECONCILE_INTERVAL,
+        'options': {'expires': TODO_COUNTERS_RECONCILE_INTERVAL},
+    },
+}
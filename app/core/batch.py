@@ -0,0 +1,36 @@
+import time
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+def batched(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+    """
+    Split an iterable into lists of at most ``size`` items without
+    materialising the whole iterable.
+    """
+    if size < 1:
+        raise ValueError("Batch size must be at least 1")
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def throttled(iterable: Iterable[T], per_second: Optional[float]) -> Iterator[T]:
+    """
+    Yield items no faster than ``per_second`` on average. ``None`` or ``0``
+    disables throttling.
+    """
+    if not per_second:
+        yield from iterable
+        return
+    started_at = time.monotonic()
+    for count, item in enumerate(iterable, 1):
+        yield item
+        ahead = count / per_second - (time.monotonic() - started_at)
+        if ahead > 0:
+            time.sleep(ahead)
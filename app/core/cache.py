@@ -0,0 +1,180 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence, Tuple
+
+from django.core.cache import caches
+
+from core.instrumentation import registry
+
+registry.counter("cache_lookups_total", "TieredCache lookups by cache and result (local_hit, remote_hit, miss)")
+registry.counter("cache_invalidations_total", "TieredCache namespaces invalidated, by cache")
+
+# stats() keys and the result label they are exported under
+LOOKUP_RESULTS = {"local_hits": "local_hit", "remote_hits": "remote_hit", "misses": "miss"}
+
+
+class TieredCache:
+    """
+    Read-through cache with an in-process LRU in front of a Django cache
+    backend (Redis in production).
+
+    Every entry is stamped with the versions of the namespaces it depends
+    on, e.g. ``("todo-list:1", "todo:5")``, and stored next to them so that a
+    single ``get_many`` returns both the payload and the current versions.
+    Writers call ``invalidate`` which bumps the namespace versions; entries
+    stamped with older versions are then treated as misses. A reader that
+    loaded stale data concurrently with a write therefore cannot resurrect
+    it, since it stamps the entry with the versions it saw before loading.
+
+    The local tier skips the shared backend entirely for ``local_ttl``
+    seconds, so other processes may serve an entry for up to that long after
+    an invalidation. Invalidations made in this process apply immediately.
+    Payloads are pickled in both tiers so callers always get a fresh copy
+    they are free to mutate.
+    """
+
+    def __init__(
+        self,
+        prefix: str,
+        timeout: Optional[float] = None,
+        local_maxsize: int = 1024,
+        local_ttl: float = 2.0,
+        alias: str = "default",
+    ) -> None:
+        self.prefix = prefix
+        self.timeout = timeout
+        self.local_maxsize = local_maxsize
+        self.local_ttl = local_ttl
+        self.alias = alias
+        self._local: "OrderedDict[str, Tuple[float, Tuple[str, ...], bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"local_hits": 0, "remote_hits": 0, "misses": 0, "invalidations": 0}
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def get_or_set(self, key: str, namespaces: Sequence[str], loader: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for ``key`` or store the result of
+        ``loader()``. ``None`` results are returned but not cached.
+        """
+        local = self._get_local(key)
+        if local is not None:
+            self._count("local_hits")
+            return pickle.loads(local)
+
+        data_key = self._data_key(key)
+        version_keys = [self._version_key(namespace) for namespace in namespaces]
+        found = self.backend.get_many([data_key, *version_keys])
+        versions = tuple(found.get(version_key, 0) for version_key in version_keys)
+
+        entry = found.get(data_key)
+        if entry is not None and entry[0] == versions:
+            self._count("remote_hits")
+            self._set_local(key, namespaces, entry[1])
+            return pickle.loads(entry[1])
+
+        self._count("misses")
+        value = loader()
+        if value is not None:
+            payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            self.backend.set(data_key, (versions, payload), self.timeout)
+            self._set_local(key, namespaces, payload)
+        return value
+
+    async def aget_or_set(self, key: str, namespaces: Sequence[str], loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Async variant of ``get_or_set`` taking an async ``loader``. Local hits
+        are served without leaving the event loop.
+        """
+        local = self._get_local(key)
+        if local is not None:
+            self._count("local_hits")
+            return pickle.loads(local)
+
+        data_key = self._data_key(key)
+        version_keys = [self._version_key(namespace) for namespace in namespaces]
+        found = await self.backend.aget_many([data_key, *version_keys])
+        versions = tuple(found.get(version_key, 0) for version_key in version_keys)
+
+        entry = found.get(data_key)
+        if entry is not None and entry[0] == versions:
+            self._count("remote_hits")
+            self._set_local(key, namespaces, entry[1])
+            return pickle.loads(entry[1])
+
+        self._count("misses")
+        value = await loader()
+        if value is not None:
+            payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            await self.backend.aset(data_key, (versions, payload), self.timeout)
+            self._set_local(key, namespaces, payload)
+        return value
+
+    def invalidate(self, *namespaces: str) -> None:
+        for namespace in namespaces:
+            version_key = self._version_key(namespace)
+            try:
+                self.backend.incr(version_key)
+            except ValueError:
+                # Not stored yet (or evicted): entries were stamped with 0
+                if not self.backend.add(version_key, 1, None):
+                    self.backend.incr(version_key)
+        self._count("invalidations", len(namespaces))
+
+        dropped = set(namespaces)
+        with self._lock:
+            for key in [key for key, (_, entry_namespaces, _) in self._local.items() if dropped.intersection(entry_namespaces)]:
+                del self._local[key]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Counters of this process, with the current size of the local tier.
+        The counters are also served at ``/metrics``, summed over processes.
+        """
+        with self._lock:
+            return dict(self._stats, local_size=len(self._local))
+
+    def clear_local(self) -> None:
+        with self._lock:
+            self._local.clear()
+
+    def _get_local(self, key: str) -> Optional[bytes]:
+        if not self.local_maxsize:
+            return None
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            expires_at, _, payload = entry
+            if expires_at < time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return payload
+
+    def _set_local(self, key: str, namespaces: Sequence[str], payload: bytes) -> None:
+        if not self.local_maxsize:
+            return
+        with self._lock:
+            self._local[key] = (time.monotonic() + self.local_ttl, tuple(namespaces), payload)
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_maxsize:
+                self._local.popitem(last=False)
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[name] += amount
+        if name in LOOKUP_RESULTS:
+            registry.inc("cache_lookups_total", (("cache", self.prefix), ("result", LOOKUP_RESULTS[name])), amount)
+        else:
+            registry.inc("cache_invalidations_total", (("cache", self.prefix),), amount)
+
+    def _data_key(self, key: str) -> str:
+        return f"{self.prefix}:data:{key}"
+
+    def _version_key(self, namespace: str) -> str:
+        return f"{self.prefix}:version:{namespace}"
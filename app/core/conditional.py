@@ -0,0 +1,58 @@
+from calendar import timegm
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Optional
+
+from django.http import HttpRequest
+from django.http.response import HttpResponseBase
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+def weak_etag(*parts: Any) -> str:
+    """
+    Weak ETag built from version parts. Datetimes are used to the
+    microsecond, None as "none".
+    """
+    values = [
+        int(part.timestamp() * 1_000_000) if isinstance(part, datetime) else ("none" if part is None else part)
+        for part in parts
+    ]
+    return 'W/"{}"'.format("-".join(map(str, values)))
+
+
+@dataclass
+class Validators:
+    """
+    ETag and Last-Modified of a representation, for conditional GETs.
+
+    Check ``not_modified`` before doing the work of building the response
+    and ``apply`` the headers to the response built otherwise. The ETag has
+    to change with the representation. Last-Modified only has a resolution
+    of one second, so clients should send ``If-None-Match``.
+    """
+    etag: str
+    last_modified: Optional[datetime] = None
+
+    def not_modified(self, request: HttpRequest) -> Optional[HttpResponseBase]:
+        """
+        The 304 (or 412) answer to the request's preconditions, None when
+        the full response is needed.
+        """
+        response = get_conditional_response(request, etag=self.etag, last_modified=self._timestamp())
+        return None if response is None else self.apply(response)
+
+    def apply(self, response: HttpResponseBase) -> HttpResponseBase:
+        if response.status_code in (200, 304):
+            response["ETag"] = self.etag
+            if self.last_modified is not None:
+                response["Last-Modified"] = http_date(self._timestamp())
+            # revalidate every time rather than let clients guess a freshness
+            # lifetime from Last-Modified
+            patch_cache_control(response, no_cache=True)
+        return response
+
+    def _timestamp(self) -> Optional[int]:
+        if self.last_modified is None:
+            return None
+        return timegm(self.last_modified.utctimetuple())
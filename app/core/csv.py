@@ -1,7 +1,37 @@
 import csv
-from typing import List, Dict
+import os
+from typing import List, Tuple
 
-def read_csv_file(file_name: str) -> List[Dict[str, str]]:
-    with open(file_name, "r") as file:
-        reader = csv.reader(file)
-        return [row for row in reader]
+def split_csv_file(file_name: str, chunk_bytes: int) -> Tuple[List[str], List[Tuple[int, int]]]:
+    """
+    Return the header fields and ``(start, end)`` byte ranges of roughly
+    ``chunk_bytes`` each covering the data rows. Ranges start and end on
+    line boundaries, so quoted values must not contain newlines.
+    """
+    if chunk_bytes < 1:
+        raise ValueError("Chunk size must be at least 1 byte")
+    size = os.path.getsize(file_name)
+    with open(file_name, "rb") as file:
+        header = file.readline()
+        fieldnames = next(csv.reader([header.decode("utf-8-sig")]), [])
+        offsets = [file.tell()]
+        while offsets[-1] + chunk_bytes < size:
+            file.seek(offsets[-1] + chunk_bytes)
+            # move on to the start of the next line
+            file.readline()
+            if file.tell() >= size:
+                break
+            offsets.append(file.tell())
+    offsets.append(size)
+    ranges = [(start, end) for start, end in zip(offsets, offsets[1:]) if end > start]
+    return fieldnames, ranges
+
+def count_csv_rows(file_name: str) -> int:
+    """
+    Count the data rows of a CSV file as ``CsvReader`` reads them: a quoted
+    value may span lines and blank lines are not rows.
+    """
+    with open(file_name, "r", encoding="utf-8-sig", newline="") as file:
+        rows = sum(1 for row in csv.reader(file) if row)
+    # minus the header
+    return max(rows - 1, 0)
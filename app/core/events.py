@@ -0,0 +1,236 @@
+import asyncio
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+import redis
+import redis.asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+# XADD and PUBLISH in one round trip, so live subscribers receive the id the
+# entry got in the stream and can later resume from it.
+PUBLISH_SCRIPT = """
+local id = redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], '*', 'type', ARGV[2], 'data', ARGV[3])
+redis.call('PUBLISH', KEYS[1], id .. '\\n' .. ARGV[2] .. '\\n' .. ARGV[3])
+return id
+"""
+
+# Sent to a subscriber whose resume point was trimmed from the stream: it
+# missed events and has to reload its state.
+RESET_EVENT = "reset"
+
+
+@dataclass
+class Event:
+    id: str
+    type: str
+    data: Dict[str, Any]
+
+
+def parse_event_id(event_id: str) -> Tuple[int, int]:
+    """
+    Split a Redis stream id (``<ms>-<seq>``) into comparable integers.
+    """
+    try:
+        milliseconds, sequence = event_id.split("-")
+        return int(milliseconds), int(sequence)
+    except (AttributeError, ValueError):
+        raise ValueError("Invalid event id")
+
+
+class _Subscription:
+    def __init__(self, queue_size: int) -> None:
+        self.queue: "asyncio.Queue[Event]" = asyncio.Queue(queue_size)
+        self.lagged = False
+
+    def put(self, event: Event) -> None:
+        if self.lagged:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Never block the fan-out on a slow consumer: it drops out of the
+            # live feed and catches up from the stream at its own pace.
+            self.lagged = True
+
+    def drain(self) -> None:
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+
+class _Hub:
+    """
+    One pub/sub connection per event loop, fanned out to every subscriber
+    of the loop through bounded queues.
+    """
+
+    def __init__(self, stream: "EventStream") -> None:
+        self.stream = stream
+        self.client = aioredis.from_url(stream.url, decode_responses=True)
+        self.subscriptions: Set[_Subscription] = set()
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                async with self.client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.stream.name)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            event = _decode_message(message["data"])
+                            for subscription in list(self.subscriptions):
+                                subscription.put(event)
+            except asyncio.CancelledError:
+                raise
+            except redis.RedisError as e:
+                logger.warning(f"Event subscription to {self.stream.name} lost, reconnecting: {e}")
+                # whatever was published meanwhile is only in the stream
+                for subscription in self.subscriptions:
+                    subscription.lagged = True
+                await asyncio.sleep(1)
+
+
+class EventStream:
+    """
+    Ordered event log kept in a Redis stream, with live fan-out over Redis
+    pub/sub.
+
+    ``publish`` appends to the stream (trimmed to about ``maxlen`` entries)
+    and publishes the entry in the same script. ``listen`` yields batches of
+    events to one consumer, starting after ``last_event_id`` if given. Live
+    events arrive through a per-process pub/sub connection and a bounded
+    queue per consumer; a consumer that falls ``queue_size`` events behind
+    is switched to reading the stream directly until it has caught up, so
+    slow clients neither block others nor lose events.
+    """
+
+    def __init__(self, name: str, url: str, maxlen: int = 100000, queue_size: int = 1000) -> None:
+        self.name = name
+        self.url = url
+        self.maxlen = maxlen
+        self.queue_size = queue_size
+        self._client: Optional[redis.Redis] = None
+        self._script = None
+        self._hubs: Dict[asyncio.AbstractEventLoop, _Hub] = {}
+
+    def publish(self, event_type: str, data: Dict[str, Any]) -> str:
+        if self._client is None:
+            self._client = redis.Redis.from_url(self.url, decode_responses=True)
+            self._script = self._client.register_script(PUBLISH_SCRIPT)
+        payload = json.dumps(data, separators=(",", ":"), default=str)
+        return self._script(keys=[self.name], args=[self.maxlen, event_type, payload])
+
+    async def listen(
+        self,
+        last_event_id: Optional[str] = None,
+        batch_size: int = 100,
+        batch_interval: float = 0.05,
+        heartbeat: float = 15.0,
+    ) -> AsyncIterator[List[Event]]:
+        """
+        Yield lists of events in stream order. Live events are grouped for
+        up to ``batch_interval`` seconds; an empty list is yielded after
+        ``heartbeat`` idle seconds so callers can keep the connection open.
+        The next batch is only read once the caller asks for it.
+        """
+        hub = self._hub()
+        subscription = _Subscription(self.queue_size)
+        hub.subscriptions.add(subscription)
+        try:
+            replay = last_event_id is not None
+            if replay:
+                last_key = parse_event_id(last_event_id)
+                if await self._trimmed_after(hub.client, last_event_id):
+                    yield [Event(id=last_event_id, type=RESET_EVENT, data={})]
+            else:
+                last_event_id, last_key = await self._last_id(hub.client)
+
+            while True:
+                if replay or subscription.lagged:
+                    subscription.lagged = False
+                    # anything queued so far is in the stream as well
+                    subscription.drain()
+                    async for events in self._read_after(hub.client, last_event_id, batch_size):
+                        last_event_id, last_key = events[-1].id, parse_event_id(events[-1].id)
+                        yield events
+                    replay = False
+
+                events = [
+                    event
+                    for event in await self._next_batch(subscription, batch_size, batch_interval, heartbeat)
+                    if parse_event_id(event.id) > last_key
+                ]
+                if events:
+                    last_event_id, last_key = events[-1].id, parse_event_id(events[-1].id)
+                if events or not subscription.lagged:
+                    yield events
+        finally:
+            hub.subscriptions.discard(subscription)
+
+    def _hub(self) -> _Hub:
+        loop = asyncio.get_running_loop()
+        hub = self._hubs.get(loop)
+        if hub is None or hub.task.done():
+            # drop hubs of loops that are gone (e.g. the short-lived loops of async_to_sync)
+            self._hubs = {key: value for key, value in self._hubs.items() if not key.is_closed()}
+            hub = self._hubs[loop] = _Hub(self)
+        return hub
+
+    async def _last_id(self, client: aioredis.Redis) -> Tuple[str, Tuple[int, int]]:
+        entries = await client.xrevrange(self.name, count=1)
+        last_id = entries[0][0] if entries else "0-0"
+        return last_id, parse_event_id(last_id)
+
+    async def _trimmed_after(self, client: aioredis.Redis, event_id: str) -> bool:
+        """
+        Whether entries newer than ``event_id`` were already trimmed away.
+        """
+        try:
+            info = await client.xinfo_stream(self.name)
+        except redis.ResponseError:
+            # no such stream yet
+            return False
+        max_deleted = info.get("max-deleted-entry-id")
+        if max_deleted is None:
+            # Redis < 7 does not track deletions, assume a gap before the oldest entry
+            first_entry = info.get("first-entry")
+            return bool(first_entry) and parse_event_id(first_entry[0]) > parse_event_id(event_id)
+        return parse_event_id(max_deleted) > parse_event_id(event_id)
+
+    async def _read_after(self, client: aioredis.Redis, event_id: str, count: int) -> AsyncIterator[List[Event]]:
+        while True:
+            entries = await client.xrange(self.name, min=f"({event_id}", count=count)
+            if not entries:
+                return
+            events = [Event(id=entry_id, type=fields["type"], data=json.loads(fields["data"])) for entry_id, fields in entries]
+            yield events
+            event_id = events[-1].id
+
+    async def _next_batch(self, subscription: _Subscription, batch_size: int, batch_interval: float, heartbeat: float) -> List[Event]:
+        try:
+            events = [await asyncio.wait_for(subscription.queue.get(), heartbeat)]
+        except asyncio.TimeoutError:
+            return []
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + batch_interval
+        while len(events) < batch_size:
+            try:
+                events.append(subscription.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                events.append(await asyncio.wait_for(subscription.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return events
+
+
+def _decode_message(message: str) -> Event:
+    event_id, event_type, payload = message.split("\n", 2)
+    return Event(id=event_id, type=event_type, data=json.loads(payload))
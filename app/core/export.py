@@ -0,0 +1,75 @@
+import csv
+import io
+import zlib
+from typing import Any, AsyncIterator, Iterable, Iterator, Sequence
+
+from asgiref.sync import sync_to_async
+
+from core.json import dumps
+
+BUFFER_SIZE = 64 * 1024
+
+
+def csv_chunks(header: Sequence[str], rows: Iterable[Sequence[Any]], buffer_size: int = BUFFER_SIZE) -> Iterator[bytes]:
+    """
+    Encode rows as CSV with a header row, yielding about ``buffer_size``
+    bytes at a time so a streaming response makes few, large writes.
+    None is written as an empty field.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= buffer_size:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def ndjson_chunks(header: Sequence[str], rows: Iterable[Sequence[Any]], buffer_size: int = BUFFER_SIZE) -> Iterator[bytes]:
+    """
+    Encode rows as one JSON object per line, keyed by ``header``. Values
+    must be plain JSON types.
+    """
+    lines = []
+    size = 0
+    for row in rows:
+        line = dumps(dict(zip(header, row)))
+        lines.append(line)
+        size += len(line) + 1
+        if size >= buffer_size:
+            yield b"\n".join(lines) + b"\n"
+            lines, size = [], 0
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """
+    Compress a stream of chunks into one gzip member as they come.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+async def aiterate(iterator: Iterator[Any]) -> AsyncIterator[Any]:
+    """
+    Serve a blocking iterator from async code one item at a time.
+
+    Items are produced in the thread sync views run in, so a database cursor
+    opened by the iterator stays on its connection. Django would otherwise
+    read a whole sync iterator into a list before streaming it under ASGI.
+    """
+    done = object()
+    while True:
+        item = await sync_to_async(next, thread_sensitive=True)(iterator, done)
+        if item is done:
+            return
+        yield item
@@ -0,0 +1,23 @@
+import hashlib
+from typing import BinaryIO
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def hash_stream(stream: BinaryIO, algorithm: str = "sha256", chunk_size: int = CHUNK_SIZE) -> str:
+    """
+    Hex digest of everything left in a binary stream, read ``chunk_size``
+    bytes at a time so files of any size hash in constant memory.
+    """
+    digest = hashlib.new(algorithm)
+    for chunk in iter(lambda: stream.read(chunk_size), b""):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_file(file_name: str, algorithm: str = "sha256", chunk_size: int = CHUNK_SIZE) -> str:
+    """
+    Hex digest of a file's raw bytes. Compressed files are hashed as stored.
+    """
+    with open(file_name, "rb") as file:
+        return hash_stream(file, algorithm, chunk_size)
@@ -0,0 +1,165 @@
+import logging
+import re
+import time
+from typing import Dict, Tuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from django.http import HttpRequest, HttpResponse
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+from core.metrics import COUNT_BUCKETS, Registry, RequestStats, collecting, current_stats, track
+
+logger = logging.getLogger(__name__)
+
+registry = Registry()
+registry.histogram("http_request_duration_seconds", "Wall time of HTTP requests")
+registry.histogram("http_request_db_queries", "Database queries per HTTP request", COUNT_BUCKETS)
+registry.histogram("http_request_db_duration_seconds", "Database time per HTTP request")
+registry.histogram("http_request_es_duration_seconds", "Elasticsearch time per HTTP request")
+registry.histogram("http_request_serialization_duration_seconds", "Serialization and rendering time per HTTP request")
+registry.counter("http_requests_total", "HTTP requests by response status")
+registry.counter("http_request_n_plus_one_total", "HTTP requests repeating one SQL statement at least METRICS_N_PLUS_ONE_THRESHOLD times")
+
+UNMATCHED_ROUTE = "<unmatched>"
+# Log a repeated statement of a route at most this often, in seconds
+N_PLUS_ONE_LOG_INTERVAL = 300
+
+_n_plus_one_logged_at: Dict[Tuple[str, str], float] = {}
+
+# Run once per transaction or atomic block, a request writing in a loop of
+# atomic blocks is not an N+1
+TRANSACTION_CONTROL = re.compile(r"\s*(BEGIN|START TRANSACTION|COMMIT|ROLLBACK|SAVEPOINT|RELEASE SAVEPOINT)\b", re.IGNORECASE)
+
+
+class InstrumentationMiddleware:
+    """
+    Record wall time, database queries and time, Elasticsearch time and
+    serialization time of every request into per-route histograms, and flag
+    requests that run one SQL statement over and over (N+1 queries).
+
+    Database time comes from an execute wrapper installed on every
+    connection; the other categories from ``core.metrics.track`` blocks in
+    the code. All of them find the request through a context variable, so
+    they also work for async views whose queries run in another thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        connection_created.connect(_install_query_wrapper, dispatch_uid="core.instrumentation")
+
+    def __call__(self, request: HttpRequest):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        started_at = time.perf_counter()
+        with collecting(stats):
+            response = self.get_response(request)
+        _record(request, response, stats, time.perf_counter() - started_at)
+        return response
+
+    async def __acall__(self, request: HttpRequest):
+        stats = RequestStats()
+        started_at = time.perf_counter()
+        with collecting(stats):
+            response = await self.get_response(request)
+        _record(request, response, stats, time.perf_counter() - started_at)
+        return response
+
+
+def _install_query_wrapper(sender, connection, **kwargs) -> None:
+    # sent on every (re)connect and pool checkout of the same wrapper object
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+def _time_query(execute, sql, params, many, context):
+    stats = current_stats()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started_at = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query(sql, time.perf_counter() - started_at, repeatable=bool(TRANSACTION_CONTROL.match(sql)))
+
+
+def _record(request: HttpRequest, response: HttpResponse, stats: RequestStats, elapsed: float) -> None:
+    match = request.resolver_match
+    labels = (("route", match.route if match else UNMATCHED_ROUTE), ("method", request.method))
+    registry.observe("http_request_duration_seconds", labels, elapsed)
+    registry.observe("http_request_db_queries", labels, stats.queries)
+    registry.observe("http_request_db_duration_seconds", labels, stats.timings.get("db", 0.0))
+    registry.observe("http_request_es_duration_seconds", labels, stats.timings.get("es", 0.0))
+    registry.observe("http_request_serialization_duration_seconds", labels, stats.timings.get("serialization", 0.0))
+    registry.inc("http_requests_total", labels + (("status", str(response.status_code)),))
+
+    repeated = {sql: count for sql, count in stats.query_counts.items() if count >= settings.METRICS_N_PLUS_ONE_THRESHOLD}
+    if repeated:
+        registry.inc("http_request_n_plus_one_total", labels)
+        _log_n_plus_one(labels[0][1], request.method, repeated)
+
+    if settings.METRICS_MULTIPROCESS_DIR:
+        registry.flush(settings.METRICS_MULTIPROCESS_DIR, settings.METRICS_FLUSH_INTERVAL)
+
+
+def _log_n_plus_one(route: str, method: str, repeated: Dict[str, int]) -> None:
+    now = time.monotonic()
+    for sql, count in repeated.items():
+        key = (route, sql)
+        if now - _n_plus_one_logged_at.get(key, float("-inf")) < N_PLUS_ONE_LOG_INTERVAL:
+            continue
+        _n_plus_one_logged_at[key] = now
+        logger.warning(f"Possible N+1 queries in {method} {route}: {count} x {sql[:300]}")
+
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """
+    Prometheus scrape endpoint, summed over all worker processes when
+    METRICS_MULTIPROCESS_DIR is set.
+    """
+    return HttpResponse(
+        registry.collect(settings.METRICS_MULTIPROCESS_DIR),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+class InstrumentedJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer counting its time as serialization.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with track("serialization"):
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class InstrumentedListSerializer(serializers.ListSerializer):
+
+    @property
+    def data(self):
+        with track("serialization"):
+            return super().data
+
+
+class InstrumentedSerializerMixin:
+    """
+    Count the time spent building ``serializer.data`` as serialization.
+    Set ``Meta.list_serializer_class = InstrumentedListSerializer`` to cover
+    ``many=True`` as well.
+    """
+
+    @property
+    def data(self):
+        with track("serialization"):
+            return super().data
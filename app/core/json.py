@@ -0,0 +1,26 @@
+import json
+from typing import Any
+
+from core.metrics import track
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def dumps(data: Any) -> bytes:
+    """
+    Render JSON byte-for-byte like DRF's ``JSONRenderer`` with its default
+    settings (compact, unicode, strict). Uses orjson when it is installed.
+
+    Only plain JSON types are supported: format dates and other rich values
+    before calling this.
+    """
+    with track("serialization"):
+        if orjson is not None:
+            rendered = orjson.dumps(data)
+        else:
+            rendered = json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+    # DRF escapes these so the output stays a strict JavaScript subset
+    return rendered.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
@@ -0,0 +1,43 @@
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+import redis
+from redis.exceptions import LockError
+
+_clients: Dict[str, redis.Redis] = {}
+
+
+class LockTimeout(Exception):
+    """
+    The lock is held elsewhere and was not released in time.
+    """
+
+
+def _client(url: str) -> redis.Redis:
+    client = _clients.get(url)
+    if client is None:
+        client = _clients[url] = redis.Redis.from_url(url)
+    return client
+
+
+@contextmanager
+def redis_lock(url: str, name: str, timeout: float = 30, blocking_timeout: float = 10) -> Iterator[None]:
+    """
+    Hold a Redis lock shared by every process for the duration of the block.
+
+    The lock expires after ``timeout`` seconds so a crashed holder cannot
+    keep it forever; keep the block well below that. Raises ``LockTimeout``
+    when the lock is not free within ``blocking_timeout`` seconds, and
+    ``redis.RedisError`` when Redis is unreachable.
+    """
+    lock = _client(url).lock(f"lock:{name}", timeout=timeout, blocking_timeout=blocking_timeout)
+    if not lock.acquire():
+        raise LockTimeout(f"Lock {name} is held elsewhere")
+    try:
+        yield
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            # expired and possibly taken over, nothing left to release
+            pass
@@ -0,0 +1,239 @@
+import bisect
+import contextvars
+import glob
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+Labels = Tuple[Tuple[str, str], ...]
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Registry:
+    """
+    In-process Prometheus-style histograms and counters.
+
+    Observations only take a lock and bump a few numbers. Several processes
+    (e.g. gunicorn workers) can share their totals by writing snapshots to a
+    common directory with ``flush``, which ``collect`` merges again.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+        # histogram series: bucket counts followed by sum and count
+        self._histograms: Dict[str, Dict[Labels, List[float]]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._flushed_at = 0.0
+
+    def histogram(self, name: str, help: str, buckets: Sequence[float] = DURATION_BUCKETS) -> None:
+        self._help[name] = ("histogram", help)
+        self._buckets[name] = tuple(buckets)
+        self._histograms.setdefault(name, {})
+
+    def counter(self, name: str, help: str) -> None:
+        self._help[name] = ("counter", help)
+        self._counters.setdefault(name, {})
+
+    def observe(self, name: str, labels: Labels, value: float) -> None:
+        buckets = self._buckets[name]
+        index = bisect.bisect_left(buckets, value)
+        with self._lock:
+            series = self._histograms[name].get(labels)
+            if series is None:
+                series = self._histograms[name][labels] = [0] * (len(buckets) + 2)
+            # cumulative counts are computed when rendering
+            if index < len(buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def inc(self, name: str, labels: Labels, amount: float = 1) -> None:
+        with self._lock:
+            counters = self._counters[name]
+            counters[labels] = counters.get(labels, 0) + amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "histograms": {
+                    name: [[list(labels), list(values)] for labels, values in series.items()]
+                    for name, series in self._histograms.items()
+                },
+                "counters": {
+                    name: [[list(labels), value] for labels, value in series.items()]
+                    for name, series in self._counters.items()
+                },
+            }
+
+    def flush(self, directory: str, interval: float = 0) -> None:
+        """
+        Write this process's totals to ``directory``, at most once per
+        ``interval`` seconds.
+        """
+        now = time.monotonic()
+        if now - self._flushed_at < interval:
+            return
+        self._flushed_at = now
+        path = os.path.join(directory, f"{_snapshot_prefix()}{os.getpid()}.json")
+        with tempfile.NamedTemporaryFile("w", dir=directory, prefix="metrics-", suffix=".tmp", delete=False) as file:
+            json.dump(self.snapshot(), file)
+        # readers never see a partial file
+        os.replace(file.name, path)
+
+    def clear(self, directory: str) -> None:
+        """
+        Remove the snapshots a previous run on this host left in
+        ``directory``, they would be added to the new totals.
+        """
+        for path in glob.glob(os.path.join(directory, f"{_snapshot_prefix()}*.json")):
+            os.remove(path)
+
+    def collect(self, directory: Optional[str] = None) -> str:
+        """
+        Render the Prometheus text format, for this process or summed over
+        all snapshots in ``directory``.
+        """
+        if not directory:
+            return self.render([self.snapshot()])
+        self.flush(directory)
+        snapshots = []
+        for path in glob.glob(os.path.join(directory, "metrics-*.json")):
+            try:
+                with open(path) as file:
+                    snapshots.append(json.load(file))
+            except (OSError, ValueError):
+                continue
+        return self.render(snapshots)
+
+    def render(self, snapshots: Iterable[Dict[str, Any]]) -> str:
+        histograms: Dict[str, Dict[Labels, List[float]]] = {name: {} for name in self._histograms}
+        counters: Dict[str, Dict[Labels, float]] = {name: {} for name in self._counters}
+        for snapshot in snapshots:
+            for name, series in snapshot["histograms"].items():
+                for labels, values in series:
+                    labels = tuple(map(tuple, labels))
+                    total = histograms.setdefault(name, {}).get(labels)
+                    histograms[name][labels] = values if total is None else [a + b for a, b in zip(total, values)]
+            for name, series in snapshot["counters"].items():
+                for labels, value in series:
+                    labels = tuple(map(tuple, labels))
+                    counters.setdefault(name, {})[labels] = counters[name].get(labels, 0) + value
+
+        lines = []
+        for name, series in histograms.items():
+            if name not in self._buckets:
+                continue
+            lines.extend(self._header(name))
+            for labels, values in sorted(series.items()):
+                cumulative = 0
+                for bound, count in zip(self._buckets[name], values):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', _number(bound)),))} {_number(cumulative)}")
+                lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {_number(values[-1])}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(values[-2])}")
+                lines.append(f"{name}_count{_labels(labels)} {_number(values[-1])}")
+        for name, series in counters.items():
+            if name not in self._help:
+                continue
+            lines.extend(self._header(name))
+            for labels, value in sorted(series.items()):
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _header(self, name: str) -> List[str]:
+        kind, help = self._help[name]
+        return [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+
+
+def _snapshot_prefix() -> str:
+    # the directory can be shared between containers, whose pids overlap
+    return f"metrics-{socket.gethostname()}-"
+
+
+def _labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class RequestStats:
+    """
+    Time spent per category (database, search, serialization, ...) while
+    handling one request, plus the database statements it ran.
+    """
+
+    __slots__ = ("timings", "queries", "query_counts")
+
+    def __init__(self) -> None:
+        self.timings: Dict[str, float] = {}
+        self.queries = 0
+        # SQL templates, with placeholders instead of values, by count
+        self.query_counts: Dict[str, int] = {}
+
+    def add(self, category: str, seconds: float) -> None:
+        self.timings[category] = self.timings.get(category, 0.0) + seconds
+
+    def add_query(self, sql: str, seconds: float, repeatable: bool = False) -> None:
+        """
+        Count a statement. ``repeatable`` ones, e.g. transaction control, are
+        expected to repeat and are left out of ``query_counts``.
+        """
+        self.queries += 1
+        if not repeatable:
+            self.query_counts[sql] = self.query_counts.get(sql, 0) + 1
+        self.add("db", seconds)
+
+
+_current_stats: "contextvars.ContextVar[Optional[RequestStats]]" = contextvars.ContextVar("request_stats", default=None)
+
+
+def current_stats() -> Optional[RequestStats]:
+    return _current_stats.get()
+
+
+@contextmanager
+def collecting(stats: RequestStats) -> Iterator[RequestStats]:
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+@contextmanager
+def track(category: str) -> Iterator[None]:
+    """
+    Attribute the time spent in the block to ``category`` of the current
+    request, less the database queries it ran, which count as ``db``. Also
+    usable as a decorator. Costs next to nothing outside a request.
+    """
+    stats = _current_stats.get()
+    if stats is None:
+        yield
+        return
+    started_at = time.perf_counter()
+    db_before = stats.timings.get("db", 0.0)
+    try:
+        yield
+    finally:
+        db_time = stats.timings.get("db", 0.0) - db_before
+        stats.add(category, time.perf_counter() - started_at - db_time)
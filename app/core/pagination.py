@@ -0,0 +1,143 @@
+import base64
+import json
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Generic, List, Optional, Sequence, TypeVar
+
+from django.core.exceptions import ValidationError
+from django.db.models import Model, Q, QuerySet
+
+T = TypeVar("T")
+
+
+class InvalidCursor(ValueError):
+    """
+    A cursor that was not issued for the ordering it is used with.
+    """
+
+    def __init__(self, message: str = "Invalid cursor") -> None:
+        super().__init__(message)
+
+
+@dataclass
+class Page(Generic[T]):
+    items: List[T] = field(default_factory=list)
+    page_size: int = 0
+    # Only known for offset pagination; keyset pages skip the COUNT query
+    count: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = json.dumps([_to_json(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise InvalidCursor()
+    if not isinstance(values, list):
+        raise InvalidCursor()
+    return values
+
+
+def paginate_offset(queryset: QuerySet, page: int, page_size: int, ordering: Sequence[str]) -> Page:
+    """
+    Classic page/page_size pagination. The returned page also carries a
+    keyset cursor so clients can continue without deep OFFSETs.
+    """
+    if page < 1:
+        raise ValueError("page must be at least 1")
+    queryset = queryset.order_by(*ordering)
+    offset = (page - 1) * page_size
+    items = list(queryset[offset:offset + page_size + 1])
+    return _build_page(items, page_size, ordering, count=queryset.count())
+
+
+def paginate_keyset(queryset: QuerySet, cursor: Optional[str], page_size: int, ordering: Sequence[str]) -> Page:
+    """
+    Seek pagination over a unique, ascending ``ordering``: the cursor holds
+    the ordering values of the last row returned, so every page is an index
+    range scan no matter how deep it is.
+    """
+    queryset = _seek(queryset, cursor, ordering)
+    items = list(queryset[:page_size + 1])
+    return _build_page(items, page_size, ordering)
+
+
+async def apaginate_offset(queryset: QuerySet, page: int, page_size: int, ordering: Sequence[str]) -> Page:
+    """
+    Async variant of ``paginate_offset``.
+    """
+    if page < 1:
+        raise ValueError("page must be at least 1")
+    queryset = queryset.order_by(*ordering)
+    offset = (page - 1) * page_size
+    items = [item async for item in queryset[offset:offset + page_size + 1]]
+    return _build_page(items, page_size, ordering, count=await queryset.acount())
+
+
+async def apaginate_keyset(queryset: QuerySet, cursor: Optional[str], page_size: int, ordering: Sequence[str]) -> Page:
+    """
+    Async variant of ``paginate_keyset``.
+    """
+    queryset = _seek(queryset, cursor, ordering)
+    items = [item async for item in queryset[:page_size + 1]]
+    return _build_page(items, page_size, ordering)
+
+
+def _seek(queryset: QuerySet, cursor: Optional[str], ordering: Sequence[str]) -> QuerySet:
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(ordering):
+            raise InvalidCursor()
+        queryset = queryset.filter(_after(ordering, _cursor_values(queryset.model, ordering, values)))
+    return queryset
+
+
+def _cursor_values(model: Model, ordering: Sequence[str], values: Sequence[Any]) -> List[Any]:
+    # Cursors come from clients: a value of the wrong type would only fail
+    # once the query is built or run, as a server error
+    try:
+        values = [model._meta.get_field(name).to_python(value) for name, value in zip(ordering, values)]
+    except (ValidationError, TypeError, ValueError):
+        raise InvalidCursor()
+    if any(value is None for value in values):
+        raise InvalidCursor()
+    return values
+
+
+def _after(ordering: Sequence[str], values: Sequence[Any]) -> Q:
+    # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y)
+    condition = Q()
+    for i, name in enumerate(ordering):
+        term = Q(**{f"{name}__gt": values[i]})
+        for previous, value in zip(ordering[:i], values[:i]):
+            term &= Q(**{previous: value})
+        condition |= term
+    # The redundant bound on the leading column gives the planner a range
+    # start on a composite index, which the OR alone does not.
+    return Q(**{f"{ordering[0]}__gte": values[0]}) & condition
+
+
+def _build_page(items: List[Any], page_size: int, ordering: Sequence[str], count: Optional[int] = None) -> Page:
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_cursor([_value(items[-1], name) for name in ordering])
+    return Page(items=items, page_size=page_size, count=count, next_cursor=next_cursor)
+
+
+def _value(item: Any, name: str) -> Any:
+    if isinstance(item, dict):
+        return item[name]
+    return getattr(item, name)
+
+
+def _to_json(value: Any) -> Any:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
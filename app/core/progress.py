@@ -0,0 +1,58 @@
+import time
+from typing import Any, Dict, Optional
+
+from django.core.cache import caches
+
+
+class ProgressTracker:
+    """
+    Progress of a job split across several workers, kept in a Django cache
+    backend (Redis in production) so any process can report it.
+
+    Descriptive fields are written by whoever owns the job state (typically
+    the coordinator and the final step), while counters are bumped with
+    atomic ``incr`` calls from every worker.
+    """
+
+    COUNTERS = ("rows_done", "rows_skipped", "chunks_done")
+
+    def __init__(self, name: str, job_id: str, timeout: Optional[float] = 24 * 60 * 60, alias: str = "default") -> None:
+        self.key = f"progress:{name}:{job_id}"
+        self.timeout = timeout
+        self.alias = alias
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    def start(self, **fields: Any) -> None:
+        state = {"status": "running", "started_at": time.time(), "finished_at": None, **fields}
+        self.backend.set_many(
+            {self.key: state, **{self._counter_key(name): 0 for name in self.COUNTERS}},
+            self.timeout,
+        )
+
+    def incr(self, **counters: int) -> None:
+        for name, amount in counters.items():
+            if amount:
+                self.backend.incr(self._counter_key(name), amount)
+
+    def finish(self, status: str = "completed", **fields: Any) -> None:
+        state = self.backend.get(self.key) or {}
+        state.update(fields, status=status, finished_at=time.time())
+        self.backend.set(self.key, state, self.timeout)
+
+    def get(self) -> Optional[Dict[str, Any]]:
+        counter_keys = {name: self._counter_key(name) for name in self.COUNTERS}
+        found = self.backend.get_many([self.key, *counter_keys.values()])
+        state = found.get(self.key)
+        if state is None:
+            return None
+        progress = dict(state, **{name: found.get(key, 0) for name, key in counter_keys.items()})
+        elapsed = (progress["finished_at"] or time.time()) - progress["started_at"]
+        progress["elapsed_seconds"] = round(elapsed, 3)
+        progress["rows_per_second"] = round(progress["rows_done"] / elapsed, 1) if elapsed > 0 else 0.0
+        return progress
+
+    def _counter_key(self, name: str) -> str:
+        return f"{self.key}:{name}"
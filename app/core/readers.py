@@ -0,0 +1,349 @@
+import csv
+import gzip
+import io
+import json
+import mmap
+import os
+from datetime import date
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Type, Union
+
+from core.batch import batched
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - optional dependency
+    pyarrow = None
+
+Row = Union[Dict[str, Any], Tuple[Any, ...]]
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+# Uncompressed files are decoded in blocks of about this size, cut at a line break
+BLOCK_SIZE = 4 * 1024 * 1024
+DEFAULT_BATCH_SIZE = 5000
+
+
+def parse_dates(values: Sequence[Any]) -> List[Optional[date]]:
+    """
+    Parse a column of ISO ``YYYY-MM-DD`` strings in one ``map`` call, which
+    keeps the loop in C. Only a column with a value the fast path rejects is
+    parsed again one by one: ``date`` values pass through, surrounding
+    whitespace is ignored and anything else becomes ``None``.
+    """
+    try:
+        return list(map(date.fromisoformat, values))
+    except (TypeError, ValueError):
+        return [_parse_date(value) for value in values]
+
+
+def _parse_date(value: Any) -> Optional[date]:
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(value.strip())
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def compression(file_name: str) -> Optional[str]:
+    """
+    Detect gzip or zstd input from the magic bytes, whatever the extension.
+    """
+    with open(file_name, "rb") as file:
+        magic = file.read(4)
+    if magic.startswith(GZIP_MAGIC):
+        return "gzip"
+    if magic.startswith(ZSTD_MAGIC):
+        return "zstd"
+    return None
+
+
+def file_format(file_name: str) -> str:
+    base, extension = os.path.splitext(file_name.lower())
+    if extension in (".gz", ".zst"):
+        extension = os.path.splitext(base)[1]
+    return FORMAT_EXTENSIONS.get(extension, "csv")
+
+
+class RowReader:
+    """
+    Lazy reader yielding the rows of a file, as dicts keyed by
+    ``fieldnames`` or as tuples in that order.
+
+    Rows are produced in batches so that ``date_columns`` can be parsed a
+    whole column at a time with ``parse_dates``. Subclasses only implement
+    ``fieldnames`` and ``_row_batches``, which yields lists of mutable rows
+    in ``fieldnames`` order.
+    """
+
+    def __init__(
+        self,
+        file_name: str,
+        columns: Optional[Sequence[str]] = None,
+        as_tuples: bool = False,
+        date_columns: Sequence[str] = (),
+    ) -> None:
+        self.file_name = file_name
+        self.columns = list(columns) if columns else None
+        self.as_tuples = as_tuples
+        self.date_columns = tuple(date_columns)
+
+    @property
+    def fieldnames(self) -> List[str]:
+        raise NotImplementedError
+
+    def __iter__(self) -> Iterator[Row]:
+        for batch in self.batches():
+            yield from batch
+
+    def batches(self, size: int = DEFAULT_BATCH_SIZE) -> Iterator[List[Row]]:
+        fieldnames = self.fieldnames
+        date_indexes = [fieldnames.index(name) for name in self.date_columns if name in fieldnames]
+        for rows in self._row_batches(size):
+            for index in date_indexes:
+                for row, value in zip(rows, parse_dates([row[index] for row in rows])):
+                    row[index] = value
+            if self.as_tuples:
+                yield list(map(tuple, rows))
+            else:
+                yield [dict(zip(fieldnames, row)) for row in rows]
+
+    def _row_batches(self, size: int) -> Iterator[List[List[Any]]]:
+        raise NotImplementedError
+
+
+class _LineReader(RowReader):
+    """
+    Base for line-oriented formats. Plain files are memory-mapped and
+    decoded block by block; gzip and zstd input is decompressed as a stream.
+    ``start``/``end`` restrict reading to a byte range of a plain file.
+    """
+
+    def __init__(self, file_name: str, start: int = 0, end: Optional[int] = None, **options: Any) -> None:
+        super().__init__(file_name, **options)
+        self.start = start
+        self.end = end
+
+    def _lines(self) -> Iterator[str]:
+        kind = compression(self.file_name)
+        if kind is None:
+            return _mapped_lines(self.file_name, self.start, self.end)
+        if self.start or self.end is not None:
+            raise ValueError("Byte ranges are only supported on uncompressed files")
+        return _stream_lines(self.file_name, kind)
+
+
+class CsvReader(_LineReader):
+    """
+    CSV reader. The header row names the fields unless ``fieldnames`` is
+    given, in which case the first row is data, as with ``csv.DictReader``.
+    A byte range not starting at 0 takes its names from the file's header.
+    Short rows are padded with ``None`` and blank lines are skipped.
+    """
+
+    def __init__(self, file_name: str, fieldnames: Optional[Sequence[str]] = None, **options: Any) -> None:
+        super().__init__(file_name, **options)
+        self._has_header = fieldnames is None
+        self._file_fieldnames = list(fieldnames) if fieldnames else None
+
+    @property
+    def fieldnames(self) -> List[str]:
+        return self.columns or self._all_fieldnames()
+
+    def _all_fieldnames(self) -> List[str]:
+        if self._file_fieldnames is None:
+            kind = compression(self.file_name)
+            if kind is None:
+                with open(self.file_name, "rb") as file:
+                    lines: Iterable[str] = [file.readline().decode("utf-8-sig")]
+            else:
+                lines = _stream_lines(self.file_name, kind)
+            self._file_fieldnames = next(csv.reader(lines), [])
+        return self._file_fieldnames
+
+    def _row_batches(self, size: int) -> Iterator[List[List[Any]]]:
+        all_fieldnames = self._all_fieldnames()
+        width = len(all_fieldnames)
+        reader = csv.reader(self._lines())
+        if self._has_header and self.start == 0:
+            next(reader, None)
+        rows: Iterable[List[Any]] = (_fit(row, width) for row in reader if row)
+        if self.columns:
+            indexes = [all_fieldnames.index(name) for name in self.columns]
+            rows = ([row[index] for index in indexes] for row in rows)
+        return batched(rows, size)
+
+
+class NdjsonReader(_LineReader):
+    """
+    Newline-delimited JSON reader. Without ``columns`` the fields are the
+    keys of the first record, so pass them when records may differ; missing
+    keys read as ``None``.
+    """
+
+    def __init__(self, file_name: str, **options: Any) -> None:
+        super().__init__(file_name, **options)
+        self._fieldnames: Optional[List[str]] = None
+
+    @property
+    def fieldnames(self) -> List[str]:
+        if self._fieldnames is None:
+            if self.columns:
+                self._fieldnames = self.columns
+            else:
+                first = next((line for line in self._lines() if line.strip()), None)
+                self._fieldnames = list(json.loads(first)) if first else []
+        return self._fieldnames
+
+    def _row_batches(self, size: int) -> Iterator[List[List[Any]]]:
+        fieldnames = self.fieldnames
+        records = (json.loads(line) for line in self._lines() if line.strip())
+        rows = ([record.get(name) for name in fieldnames] for record in records)
+        return batched(rows, size)
+
+
+class ParquetReader(RowReader):
+    """
+    Parquet reader, memory-mapped and decoded a record batch at a time.
+    Requires pyarrow.
+    """
+
+    def __init__(self, file_name: str, **options: Any) -> None:
+        _require_pyarrow("Parquet")
+        super().__init__(file_name, **options)
+        self._file = pyarrow.parquet.ParquetFile(file_name, memory_map=True)
+
+    @property
+    def fieldnames(self) -> List[str]:
+        return self.columns or self._file.schema_arrow.names
+
+    def _row_batches(self, size: int) -> Iterator[List[List[Any]]]:
+        for record_batch in self._file.iter_batches(batch_size=size, columns=self.fieldnames):
+            yield _record_batch_rows(record_batch, self.fieldnames)
+
+
+class ArrowReader(RowReader):
+    """
+    Arrow IPC reader for both the file (Feather v2) and the stream format,
+    memory-mapped. Requires pyarrow.
+    """
+
+    def __init__(self, file_name: str, **options: Any) -> None:
+        _require_pyarrow("Arrow")
+        super().__init__(file_name, **options)
+
+    @property
+    def fieldnames(self) -> List[str]:
+        return self.columns or self._open().schema.names
+
+    def _open(self):
+        source = pyarrow.memory_map(self.file_name)
+        try:
+            return pyarrow.ipc.open_file(source)
+        except pyarrow.ArrowInvalid:
+            source.seek(0)
+            return pyarrow.ipc.open_stream(source)
+
+    def _row_batches(self, size: int) -> Iterator[List[List[Any]]]:
+        fieldnames = self.fieldnames
+        reader = self._open()
+        if isinstance(reader, pyarrow.ipc.RecordBatchFileReader):
+            record_batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        else:
+            record_batches = iter(reader)
+        for record_batch in record_batches:
+            for offset in range(0, record_batch.num_rows, size):
+                yield _record_batch_rows(record_batch.slice(offset, size), fieldnames)
+
+
+FORMAT_READERS: Dict[str, Type[RowReader]] = {
+    "csv": CsvReader,
+    "ndjson": NdjsonReader,
+    "parquet": ParquetReader,
+    "arrow": ArrowReader,
+}
+
+FORMAT_EXTENSIONS = {
+    ".csv": "csv",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".parquet": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+}
+
+
+def open_reader(file_name: str, format: Optional[str] = None, **options: Any) -> RowReader:
+    """
+    Return the reader for ``file_name``, picking the format from the
+    extension (``.gz``/``.zst`` suffixes are ignored) unless given.
+    """
+    format = format or file_format(file_name)
+    if format not in FORMAT_READERS:
+        raise ValueError(f"Unsupported file format: {format}")
+    return FORMAT_READERS[format](file_name, **options)
+
+
+def _fit(row: List[Any], width: int) -> List[Any]:
+    if len(row) == width:
+        return row
+    return row[:width] + [None] * (width - len(row))
+
+
+def _record_batch_rows(record_batch: Any, fieldnames: Sequence[str]) -> List[List[Any]]:
+    columns = record_batch.select(fieldnames).to_pydict()
+    return list(map(list, zip(*(columns[name] for name in fieldnames))))
+
+
+def _mapped_lines(file_name: str, start: int = 0, end: Optional[int] = None) -> Iterator[str]:
+    with open(file_name, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        end = size if end is None else min(end, size)
+        if end <= start:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            position = start
+            while position < end:
+                block_end = min(position + BLOCK_SIZE, end)
+                if block_end < end:
+                    # cut after the last full line so no character is split
+                    newline = mapped.rfind(b"\n", position, block_end)
+                    block_end = newline + 1 if newline != -1 else _next_line(mapped, block_end, end)
+                encoding = "utf-8-sig" if position == 0 else "utf-8"
+                # StringIO splits on "\n" only and keeps it, which csv needs
+                # for values quoted across lines
+                yield from io.StringIO(mapped[position:block_end].decode(encoding), newline="")
+                position = block_end
+
+
+def _next_line(mapped: mmap.mmap, position: int, end: int) -> int:
+    newline = mapped.find(b"\n", position, end)
+    return end if newline == -1 else newline + 1
+
+
+def _stream_lines(file_name: str, kind: str) -> Iterator[str]:
+    with _open_compressed(file_name, kind) as stream:
+        yield from stream
+
+
+def _open_compressed(file_name: str, kind: str) -> IO[str]:
+    if kind == "gzip":
+        return gzip.open(file_name, "rt", encoding="utf-8-sig", newline="")
+    if zstandard is None:
+        raise ImportError("zstandard is required to read zstd-compressed files")
+    raw = open(file_name, "rb")
+    stream = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+    return io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+
+
+def _require_pyarrow(format: str) -> None:
+    if pyarrow is None:
+        raise ImportError(f"pyarrow is required to read {format} files")
@@ -0,0 +1,205 @@
+import cProfile
+import logging
+import os
+import random
+import resource
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from celery import current_task
+from celery.signals import (
+    before_task_publish,
+    task_postrun,
+    task_prerun,
+    task_retry,
+    worker_init,
+    worker_process_shutdown
+)
+from django.conf import settings
+
+from core.instrumentation import registry
+
+logger = logging.getLogger(__name__)
+
+TASK_DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+TASK_MEMORY_BUCKETS = tuple(2 ** power * 1024 * 1024 for power in range(5, 13))
+TASK_ROW_BUCKETS = (0, 10, 100, 1000, 5000, 10000, 50000, 100000, 500000, 1000000)
+
+registry.histogram("celery_task_queue_wait_seconds", "Time tasks spent in the broker before a worker started them", TASK_DURATION_BUCKETS)
+registry.histogram("celery_task_runtime_seconds", "Wall time of task runs", TASK_DURATION_BUCKETS)
+registry.histogram("celery_task_max_rss_bytes", "Peak resident memory of the worker process when a task finished", TASK_MEMORY_BUCKETS)
+registry.histogram("celery_task_rows", "Rows processed per task run", TASK_ROW_BUCKETS)
+registry.counter("celery_tasks_total", "Task runs by final state")
+registry.counter("celery_task_retries_total", "Task retries")
+
+# Message header stamped on publish, read back from the task request
+PUBLISHED_AT_HEADER = "published_at"
+# Message header switching the profiler on for one run, passed with
+# apply_async(..., headers={"profile": True}); a keyword argument would fail
+# Celery's check against the task signature
+PROFILE_HEADER = "profile"
+
+# ru_maxrss is in kilobytes on Linux and in bytes on macOS
+_RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+class _TaskRun:
+    __slots__ = ("started_at", "queue_wait", "rss_before", "rows", "profiler")
+
+    def __init__(self, queue_wait: Optional[float], profiler: Optional[cProfile.Profile]) -> None:
+        self.started_at = time.perf_counter()
+        self.queue_wait = queue_wait
+        self.rss_before = _max_rss()
+        self.rows: Optional[int] = None
+        self.profiler = profiler
+
+
+# Runs in progress in this process, by task id
+_runs: Dict[str, _TaskRun] = {}
+
+
+def connect() -> None:
+    """
+    Record queue wait, runtime, peak memory, rows and retries of every Celery
+    task into the ``core.instrumentation`` registry, and profile the runs
+    selected by TASK_PROFILE or the ``profile`` message header.
+
+    Needed in the processes that publish tasks as well as in the workers.
+    """
+    before_task_publish.connect(_stamp_published_at, dispatch_uid="core.task_telemetry")
+    task_prerun.connect(_start_run, dispatch_uid="core.task_telemetry")
+    task_postrun.connect(_finish_run, dispatch_uid="core.task_telemetry")
+    task_retry.connect(_count_retry, dispatch_uid="core.task_telemetry")
+    worker_init.connect(_clear_snapshots, dispatch_uid="core.task_telemetry")
+    worker_process_shutdown.connect(_flush_on_shutdown, dispatch_uid="core.task_telemetry")
+
+
+def record_rows(count: int) -> None:
+    """
+    Add ``count`` to the rows processed by the task running in this thread;
+    does nothing outside a task.
+    """
+    task = current_task
+    run = _runs.get(task.request.id) if task else None
+    if run is not None:
+        run.rows = (run.rows or 0) + count
+
+
+def _stamp_published_at(sender=None, headers=None, **kwargs) -> None:
+    # also overwrites the stamp a retry copies from the original message
+    if headers is not None:
+        headers[PUBLISHED_AT_HEADER] = time.time()
+
+
+def _start_run(sender=None, task_id=None, task=None, **kwargs) -> None:
+    profile = bool(getattr(task.request, PROFILE_HEADER, False)) or _profile_selected(task.name)
+    if not settings.METRICS_ENABLED and not profile:
+        return
+
+    queue_wait = None
+    published_at = getattr(task.request, PUBLISHED_AT_HEADER, None)
+    if published_at is not None:
+        # a countdown or ETA is not time spent waiting for a worker
+        ready_at = max(published_at, _timestamp(getattr(task.request, "eta", None)) or 0)
+        queue_wait = max(0.0, time.time() - ready_at)
+
+    profiler = None
+    if profile:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # another profiler is active, e.g. for an eager task inside a profiled one
+            profiler = None
+    _runs[task_id] = _TaskRun(queue_wait, profiler)
+
+
+def _finish_run(sender=None, task_id=None, task=None, state=None, **kwargs) -> None:
+    run = _runs.pop(task_id, None)
+    if run is None:
+        return
+    runtime = time.perf_counter() - run.started_at
+    if run.profiler is not None:
+        run.profiler.disable()
+        _dump_profile(run.profiler, task.name, task_id)
+    if not settings.METRICS_ENABLED:
+        return
+
+    max_rss = _max_rss()
+    labels = _labels(task)
+    if run.queue_wait is not None:
+        registry.observe("celery_task_queue_wait_seconds", labels, run.queue_wait)
+    registry.observe("celery_task_runtime_seconds", labels, runtime)
+    registry.observe("celery_task_max_rss_bytes", labels, max_rss)
+    if run.rows is not None:
+        registry.observe("celery_task_rows", labels, run.rows)
+    registry.inc("celery_tasks_total", labels + (("state", state or "UNKNOWN"),))
+
+    queued = f"{run.queue_wait:.3f}s" if run.queue_wait is not None else "unknown"
+    logger.info(
+        f"Task {task.name}[{task_id}] {state} in {runtime:.3f}s, queued {queued}, "
+        f"rows {run.rows if run.rows is not None else '-'}, "
+        f"peak RSS {max_rss / 2 ** 20:.0f} MiB (+{(max_rss - run.rss_before) / 2 ** 20:.0f} MiB)"
+    )
+
+    if settings.METRICS_MULTIPROCESS_DIR:
+        registry.flush(settings.METRICS_MULTIPROCESS_DIR, settings.METRICS_FLUSH_INTERVAL)
+
+
+def _count_retry(sender=None, request=None, **kwargs) -> None:
+    if settings.METRICS_ENABLED and sender is not None:
+        registry.inc("celery_task_retries_total", _labels(sender, request))
+
+
+def _clear_snapshots(**kwargs) -> None:
+    if settings.METRICS_ENABLED and settings.METRICS_MULTIPROCESS_DIR:
+        os.makedirs(settings.METRICS_MULTIPROCESS_DIR, exist_ok=True)
+        registry.clear(settings.METRICS_MULTIPROCESS_DIR)
+
+
+def _flush_on_shutdown(**kwargs) -> None:
+    if settings.METRICS_ENABLED and settings.METRICS_MULTIPROCESS_DIR:
+        registry.flush(settings.METRICS_MULTIPROCESS_DIR)
+
+
+def _labels(task, request=None):
+    delivery_info = (request or task.request).delivery_info or {}
+    return (("task", task.name), ("queue", delivery_info.get("routing_key") or "eager"))
+
+
+def _profile_selected(task_name: str) -> bool:
+    if not settings.TASK_PROFILE:
+        return False
+    selected = {name.strip() for name in settings.TASK_PROFILE.split(",")}
+    if "*" not in selected and task_name not in selected and task_name.rsplit(".", 1)[-1] not in selected:
+        return False
+    return random.random() < settings.TASK_PROFILE_SAMPLE_RATE
+
+
+def _dump_profile(profiler: cProfile.Profile, task_name: str, task_id: str) -> None:
+    try:
+        os.makedirs(settings.TASK_PROFILE_DIR, exist_ok=True)
+        path = os.path.join(settings.TASK_PROFILE_DIR, f"{task_name}-{task_id}.prof")
+        profiler.dump_stats(path)
+    except OSError as e:
+        logger.warning(f"Could not write the profile of task {task_name}[{task_id}]: {str(e)}")
+        return
+    logger.info(f"Wrote the profile of task {task_name}[{task_id}] to {path}")
+
+
+def _max_rss() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _RSS_UNIT
+
+
+def _timestamp(value) -> Optional[float]:
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if isinstance(value, datetime):
+        # naive ETAs are in UTC
+        return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
+    return None
@@ -0,0 +1,115 @@
+import hashlib
+import os
+import re
+import tempfile
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Optional
+
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers, StopUpload
+
+# kept on spool files so readers can tell the format, e.g. ".csv.gz"
+SUFFIX_PATTERN = re.compile(r"(\.[a-z0-9]{1,10}){0,2}")
+
+
+@dataclass
+class SpooledUpload:
+    """
+    A file received by ``SpoolingUploadHandler``, with what was learnt about
+    it while it streamed in.
+    """
+    path: str
+    name: str
+    size: int
+    content_hash: str
+
+    def close(self) -> None:
+        # Django closes request.FILES at the end of the request, the spool
+        # file is already closed and is kept for the workers
+        pass
+
+
+class SpoolingUploadHandler(FileUploadHandler):
+    """
+    Write the file sent in the ``field_name`` part of a multipart request
+    straight to a new file in ``directory``, hashing it as the chunks
+    arrive. The request body is never held in memory,
+    so uploads of any size are received in constant memory and need no
+    second pass to be hashed.
+
+    Install it with ``request.upload_handlers = [handler]`` before the
+    request data is read. Files larger than ``max_bytes`` abort the upload
+    and set ``too_large``. The spool file belongs to the caller, who should
+    ``discard`` it when the request fails.
+    """
+
+    chunk_size = 1024 * 1024
+
+    def __init__(
+        self,
+        directory: str,
+        field_name: str = "file",
+        max_bytes: Optional[int] = None,
+        hash_algorithm: str = "sha256",
+        request: Any = None,
+    ) -> None:
+        super().__init__(request)
+        self.directory = directory
+        self.spool_field_name = field_name
+        self.max_bytes = max_bytes
+        self.hash_algorithm = hash_algorithm
+        self.upload: Optional[SpooledUpload] = None
+        self.too_large = False
+        self.path: Optional[str] = None
+        self._file: Optional[BinaryIO] = None
+
+    def new_file(self, field_name: str, file_name: str, *args: Any, **kwargs: Any) -> None:
+        super().new_file(field_name, file_name, *args, **kwargs)
+        if field_name != self.spool_field_name or self.path is not None:
+            return
+        base, suffix = os.path.splitext(file_name.lower())
+        if suffix in (".gz", ".zst"):
+            suffix = os.path.splitext(base)[1] + suffix
+        if not SUFFIX_PATTERN.fullmatch(suffix):
+            suffix = ""
+        os.makedirs(self.directory, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(prefix="upload-", suffix=suffix, dir=self.directory)
+        self._file = os.fdopen(fd, "wb")
+        self._digest = hashlib.new(self.hash_algorithm)
+        self._size = 0
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data: bytes, start: int) -> Optional[bytes]:
+        if self._file is None:
+            return raw_data
+        self._size += len(raw_data)
+        if self.max_bytes is not None and self._size > self.max_bytes:
+            self.too_large = True
+            self.discard()
+            # stop reading the body, there is no point in receiving the rest
+            raise StopUpload(connection_reset=True)
+        self._file.write(raw_data)
+        self._digest.update(raw_data)
+        return None
+
+    def file_complete(self, file_size: int) -> Optional[SpooledUpload]:
+        if self._file is None:
+            return None
+        self._file.close()
+        self._file = None
+        self.upload = SpooledUpload(self.path, self.file_name, self._size, self._digest.hexdigest())
+        return self.upload
+
+    def discard(self) -> None:
+        """
+        Remove the spool file, e.g. when the upload was rejected.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+        self.upload = None
@@ -0,0 +1,68 @@
+"""
+Gunicorn configuration for production serving, used by start.sh.
+
+APP_SERVER picks the interface: "wsgi" runs app.wsgi in threaded sync
+workers, "asgi" runs app.asgi in uvicorn workers (needed for the async
+views and the event streams). Every value can be overridden from the
+environment.
+"""
+
+import glob
+import multiprocessing
+import os
+import socket
+
+
+def _cpu_count():
+    # CPUs this container may run on, not the whole host
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return multiprocessing.cpu_count()
+
+
+APP_SERVER = os.getenv("APP_SERVER", "wsgi")
+CPUS = _cpu_count()
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+
+# Workers share their request metrics through this directory, so /metrics
+# reports all of them whichever one serves it
+os.environ.setdefault("METRICS_MULTIPROCESS_DIR", "/tmp/metrics")
+
+if APP_SERVER == "asgi":
+    wsgi_app = "app.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+    # one event loop per CPU serves any number of concurrent requests
+    workers = int(os.getenv("WEB_CONCURRENCY", CPUS))
+else:
+    wsgi_app = "app.wsgi:application"
+    worker_class = "gthread"
+    # threads cover the time spent waiting on Postgres, Redis and Elasticsearch
+    workers = int(os.getenv("WEB_CONCURRENCY", 2 * CPUS + 1))
+    threads = int(os.getenv("GUNICORN_THREADS", 4))
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+# Recycle workers now and then to bound memory growth, staggered so they do
+# not all restart together
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 1000))
+# heartbeat files on tmpfs, a slow disk can get workers killed as unresponsive
+worker_tmp_dir = "/dev/shm"
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    # totals left by a previous run would be added to this one
+    directory = os.environ["METRICS_MULTIPROCESS_DIR"]
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    # only this container's, Celery workers may share the directory
+    for path in glob.glob(os.path.join(directory, f"metrics-{socket.gethostname()}-*")):
+        os.remove(path)
@@ -1,8 +1,9 @@
 #!/bin/bash
+set -e
 
 # Wait for database to be ready
 echo "Waiting for database..."
-while ! nc -z postgres 5432; do
+while ! nc -z "${POSTGRES_HOST:-postgres}" "${POSTGRES_PORT:-5432}"; do
   sleep 1
 done
 echo "Database is ready!"
@@ -12,5 +13,9 @@ echo "Running migrations..."
 python manage.py migrate
 
 # Start Django
-echo "Starting Django..."
-python manage.py runserver 0.0.0.0:8000 
\ No newline at end of file
+if [ "${APP_SERVER:-wsgi}" = "dev" ]; then
+  echo "Starting Django development server..."
+  exec python manage.py runserver 0.0.0.0:8000
+fi
+echo "Starting gunicorn (${APP_SERVER:-wsgi})..."
+exec gunicorn -c gunicorn.conf.py
@@ -0,0 +1,120 @@
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from todo.data.models.todo import JobCheckpoint, TodoOutbox
+from todo.data.repositories.todo import record_todo_changes
+from todo.data.elasticsearch.bulk import RETRYABLE_STATUSES
+from todo.data.elasticsearch.reindex import REINDEX_CHECKPOINT_NAME
+from todo.data.elasticsearch.search.todo import delete_indexed_todos
+from todo.domain.todo import purge_completed_todos
+from core.use_case import UseCase
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = "todo-cleanup"
+
+
+@dataclass
+class CleanupOldTodosResult:
+    todos_deleted: int = 0
+    index_deleted: int = 0
+    batches: int = 0
+    finished: bool = False
+
+
+class CleanupOldTodosUseCase(UseCase):
+    """
+    Delete todos completed more than ``retention_days`` ago.
+
+    Todos are deleted in batches of ascending ids, each in its own short
+    transaction that only reads the ids and what the list counters need,
+    so no long locks are held and no whole rows are loaded. Progress is kept in a ``JobCheckpoint``: the cutoff fixed
+    when a pass starts and the last deleted id. A run stops after
+    ``max_batches`` and the next one resumes where it left off; a pass ends
+    when no completed todo older than the cutoff is left.
+
+    The deleted ids are removed from the search index with bulk deletes
+    rather than one outbox event each. They are stored in the checkpoint in
+    the same transaction as the delete, so a crash before the bulk request
+    is repaired by the next run. While ``reindex_todos`` is running, and for
+    deletes that fail with a retryable status, they go through the outbox.
+    """
+
+    def __init__(
+        self,
+        retention_days: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        max_batches: Optional[int] = None,
+    ) -> None:
+        self.retention_days = settings.TODO_CLEANUP_RETENTION_DAYS if retention_days is None else retention_days
+        self.batch_size = batch_size or settings.TODO_CLEANUP_BATCH_SIZE
+        self.max_batches = max_batches or settings.TODO_CLEANUP_MAX_BATCHES
+
+    def execute(self) -> CleanupOldTodosResult:
+        result = CleanupOldTodosResult()
+        for _ in range(self.max_batches):
+            if not self._purge_batch(result):
+                break
+        if result.todos_deleted:
+            logger.info(
+                f"Deleted {result.todos_deleted} completed todos in {result.batches} batches, "
+                f"{result.index_deleted} removed from the search index"
+                + ("; pass complete" if result.finished else "; resuming on the next run")
+            )
+        return result
+
+    def _purge_batch(self, result: CleanupOldTodosResult) -> bool:
+        with transaction.atomic():
+            JobCheckpoint.objects.get_or_create(name=CHECKPOINT_NAME)
+            # Serialises runs, two of them would delete the same batch twice
+            checkpoint = JobCheckpoint.objects.select_for_update().get(name=CHECKPOINT_NAME)
+            state = checkpoint.state
+            if not state:
+                cutoff = timezone.now() - timedelta(days=self.retention_days)
+                state.update({"cutoff": cutoff.isoformat(), "last_id": 0, "deleted": 0, "pending_index_deletes": []})
+
+            todo_ids = state["pending_index_deletes"]
+            if not todo_ids:
+                todo_ids = purge_completed_todos(datetime.fromisoformat(state["cutoff"]), state["last_id"], self.batch_size)
+                if not todo_ids:
+                    checkpoint.delete()
+                    result.finished = True
+                    return False
+                state["last_id"] = todo_ids[-1]
+                state["deleted"] += len(todo_ids)
+                result.todos_deleted += len(todo_ids)
+                result.batches += 1
+                if JobCheckpoint.objects.filter(name=REINDEX_CHECKPOINT_NAME).exists():
+                    # the reindex may already have copied these rows into the new index
+                    record_todo_changes(todo_ids, TodoOutbox.OPERATION_DELETE)
+                    todo_ids = []
+                state["pending_index_deletes"] = todo_ids
+                checkpoint.save(update_fields=["state", "updated_at"])
+
+        if todo_ids:
+            result.index_deleted += self._delete_from_index(todo_ids)
+        return True
+
+    def _delete_from_index(self, todo_ids: List[int]) -> int:
+        bulk_result = delete_indexed_todos(todo_ids)
+        # Permanent failures are logged by the indexer; retrying would not help
+        retry_ids = [
+            int(info["_id"])
+            for item in bulk_result.failed
+            for info in item.values()
+            if info.get("status") in RETRYABLE_STATUSES
+        ]
+        with transaction.atomic():
+            record_todo_changes(retry_ids, TodoOutbox.OPERATION_DELETE)
+            # re-read, a concurrent run may have sent the same ids and moved on
+            checkpoint = JobCheckpoint.objects.select_for_update().filter(name=CHECKPOINT_NAME).first()
+            if checkpoint and checkpoint.state.get("pending_index_deletes") == todo_ids:
+                checkpoint.state["pending_index_deletes"] = []
+                checkpoint.save(update_fields=["state", "updated_at"])
+        return bulk_result.succeeded
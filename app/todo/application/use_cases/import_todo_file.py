@@ -0,0 +1,352 @@
+import logging
+import os
+import uuid
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import redis
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from todo.application.use_cases.upload_todo_list import DATE_COLUMNS, UploadTodoListResult, build_todos
+from todo.domain.todo import create_todo_list, get_todo_list, touch_todo_list
+from todo.data.models.todo import TodoImport, TodoOutbox
+from todo.data.repositories.todo import bulk_insert_todos, record_todo_changes, transition_todo_import, upsert_todos
+from todo.interfaces.schema.todo import TodoListCreate
+from core.csv import count_csv_rows, split_csv_file
+from core.hashing import hash_file
+from core.locks import LockTimeout, redis_lock
+from core.readers import CsvReader, RowReader, compression, file_format, open_reader
+from core.progress import ProgressTracker
+from core.use_case import UseCase
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = {"title", "due_date"}
+# NDJSON records name their own fields and may leave any of them out, the
+# first record does not tell which ones the file has
+NDJSON_COLUMNS = ("title", "description", "due_date")
+
+
+def open_import_file(file_path: str, **options: Any) -> RowReader:
+    """
+    ``open_reader`` for import files, reading NDJSON with the todo fields.
+    """
+    if file_format(file_path) == "ndjson":
+        options.setdefault("columns", NDJSON_COLUMNS)
+    return open_reader(file_path, **options)
+
+
+def todo_import_progress(import_id: str) -> ProgressTracker:
+    return ProgressTracker("todo-import", import_id)
+
+
+def get_todo_import(import_id: str) -> Optional[Dict[str, Any]]:
+    """
+    The ledger entry of an import, None for imports that were not submitted
+    through the ledger.
+    """
+    return TodoImport.objects.filter(import_id=import_id).values(
+        "state", "content_hash", "todo_list_id", "upsert", "rows_imported", "rows_skipped", "error",
+        "created_at", "finished_at",
+    ).first()
+
+
+def mark_todo_import_failed(import_id: str, error: str = "") -> None:
+    """
+    Mark an import as failed in its progress and in the ledger, which lets
+    the file be submitted again.
+    """
+    todo_import_progress(import_id).finish("failed", error=error)
+    if transition_todo_import(import_id, TodoImport.STATE_FAILED, error=error):
+        remove_spooled_upload(import_id)
+
+
+def remove_spooled_upload(import_id: str) -> None:
+    """
+    Delete the file of a finished import if it was uploaded to
+    TODO_UPLOAD_SPOOL_DIR; files given by path belong to whoever put them
+    there. A failed upload has to be sent again, the ledger only needs the
+    hash to recognise it.
+    """
+    file_path = TodoImport.objects.filter(import_id=import_id).values_list("file_path", flat=True).first()
+    spool_dir = os.path.realpath(settings.TODO_UPLOAD_SPOOL_DIR)
+    if file_path and os.path.dirname(os.path.realpath(file_path)) == spool_dir:
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+
+
+@dataclass
+class TodoImportSubmission:
+    import_id: str
+    state: str
+    content_hash: str
+    # False when an import of the same file into the same list was found
+    created: bool
+
+
+class SubmitTodoImportUseCase(UseCase):
+    """
+    Record an import of a file in the ledger and hand it to ``enqueue``, or
+    return the import of the same file into the same list that is pending,
+    running or completed already.
+
+    The file is hashed in one streaming pass, which is all a resubmission
+    costs. Submissions of the same file are serialised with a Redis lock so
+    that concurrent requests agree on one import; when Redis is unavailable
+    the unique constraint of the ledger still keeps them to one. Imports
+    pending or running for longer than TODO_IMPORT_STALE_AFTER are taken to
+    be lost with their worker and failed, so the file can be submitted
+    again.
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        enqueue: Callable[[str], Any],
+        todo_list_name: Optional[str] = None,
+        todo_list_id: Optional[int] = None,
+        upsert: bool = False,
+        content_hash: Optional[str] = None,
+    ) -> None:
+        self.file_path = file_path
+        self.enqueue = enqueue
+        self.todo_list_name = todo_list_name
+        self.todo_list_id = todo_list_id
+        self.upsert = upsert
+        self.content_hash = content_hash
+
+    def execute(self) -> TodoImportSubmission:
+        if self.todo_list_id is not None:
+            get_todo_list(self.todo_list_id)
+            destination = f"list:{self.todo_list_id}"
+        else:
+            destination = f"name:{self.todo_list_name or ''}"
+        content_hash = self.content_hash or hash_file(self.file_path)
+
+        try:
+            with redis_lock(
+                settings.TODO_IMPORT_LOCK_REDIS_URL,
+                f"todo-import:{content_hash}:{destination}",
+                timeout=settings.TODO_IMPORT_LOCK_TIMEOUT,
+            ):
+                submission = self._submit(content_hash, destination)
+        except (LockTimeout, redis.RedisError) as e:
+            logger.warning(f"Submitting import of {self.file_path} without the lock: {str(e)}")
+            submission = self._submit(content_hash, destination)
+
+        if submission.created:
+            try:
+                self.enqueue(submission.import_id)
+            except Exception as e:
+                mark_todo_import_failed(submission.import_id, error=str(e))
+                raise
+            logger.info(f"Submitted import {submission.import_id} of {self.file_path} ({content_hash})")
+        else:
+            logger.info(f"{self.file_path} ({content_hash}) is import {submission.import_id} already, not importing it again")
+        return submission
+
+    def _submit(self, content_hash: str, destination: str) -> TodoImportSubmission:
+        existing = self._find(content_hash, destination)
+        if existing is not None:
+            return TodoImportSubmission(existing.import_id, existing.state, content_hash, created=False)
+        try:
+            with transaction.atomic():
+                todo_import = TodoImport.objects.create(
+                    import_id=uuid.uuid4().hex,
+                    content_hash=content_hash,
+                    destination=destination,
+                    file_path=self.file_path,
+                    upsert=self.upsert,
+                    todo_list_id=self.todo_list_id,
+                )
+        except IntegrityError:
+            # a submission that did not hold the lock got there first
+            existing = self._find(content_hash, destination)
+            if existing is None:
+                raise
+            return TodoImportSubmission(existing.import_id, existing.state, content_hash, created=False)
+        return TodoImportSubmission(todo_import.import_id, todo_import.state, content_hash, created=True)
+
+    def _find(self, content_hash: str, destination: str) -> Optional[TodoImport]:
+        # the condition of todo_import_active_hash_uniq
+        active = Q(state__in=[TodoImport.STATE_PENDING, TodoImport.STATE_RUNNING]) | Q(
+            state=TodoImport.STATE_COMPLETED, todo_list__isnull=False
+        )
+        existing = TodoImport.objects.filter(active, content_hash=content_hash, destination=destination).first()
+        if existing is None or existing.state == TodoImport.STATE_COMPLETED:
+            return existing
+        stale_before = timezone.now() - timedelta(seconds=settings.TODO_IMPORT_STALE_AFTER)
+        if existing.updated_at < stale_before and transition_todo_import(
+            existing.import_id, TodoImport.STATE_FAILED, error="Timed out"
+        ):
+            logger.warning(f"Import {existing.import_id} was {existing.state} since {existing.updated_at}, marked failed")
+            todo_import_progress(existing.import_id).finish("failed", error="Timed out")
+            return None
+        return existing
+
+
+@dataclass
+class TodoImportPlan:
+    import_id: str
+    todo_list_id: int
+    fieldnames: List[str] = field(default_factory=list)
+    # ``(0, None)`` is the whole file, for inputs that cannot be split
+    ranges: List[Tuple[int, Optional[int]]] = field(default_factory=list)
+    rows_total: Optional[int] = None
+
+
+class PlanTodoImportUseCase(UseCase):
+    """
+    Create the target list, or use ``todo_list_id``, and split the file into
+    line-aligned byte ranges that chunk workers can import independently.
+    Compressed and non-CSV files are imported as a single chunk.
+
+    Imports submitted through the ledger start running here. Returns None
+    when the ledger shows the import was started already, e.g. by an
+    earlier delivery of the same task.
+    """
+
+    def __init__(
+        self,
+        import_id: str,
+        todo_list_name: str,
+        file_path: str,
+        chunk_bytes: Optional[int] = None,
+        todo_list_id: Optional[int] = None,
+    ) -> None:
+        self.import_id = import_id
+        self.todo_list_name = todo_list_name
+        self.file_path = file_path
+        self.chunk_bytes = chunk_bytes or settings.TODO_UPLOAD_CHUNK_BYTES
+        self.todo_list_id = todo_list_id
+
+    def execute(self) -> Optional[TodoImportPlan]:
+        if not transition_todo_import(self.import_id, TodoImport.STATE_RUNNING):
+            if TodoImport.objects.filter(import_id=self.import_id).exists():
+                logger.info(f"Import {self.import_id} was started already, skipping")
+                return None
+
+        if file_format(self.file_path) == "csv" and compression(self.file_path) is None:
+            fieldnames, ranges = split_csv_file(self.file_path, self.chunk_bytes)
+            rows_total = count_csv_rows(self.file_path)
+        else:
+            fieldnames, ranges, rows_total = open_import_file(self.file_path).fieldnames, [(0, None)], None
+        missing = REQUIRED_COLUMNS - set(fieldnames)
+        if missing:
+            raise ValueError(f"Missing CSV columns: {', '.join(sorted(missing))}")
+
+        if self.todo_list_id is not None:
+            todo_list = get_todo_list(self.todo_list_id)
+        else:
+            todo_list = create_todo_list(TodoListCreate(name=self.todo_list_name))
+            TodoImport.objects.filter(import_id=self.import_id).update(todo_list_id=todo_list.id)
+        plan = TodoImportPlan(
+            import_id=self.import_id,
+            todo_list_id=todo_list.id,
+            fieldnames=fieldnames,
+            ranges=ranges,
+            rows_total=rows_total,
+        )
+        todo_import_progress(self.import_id).start(
+            todo_list_id=plan.todo_list_id,
+            file_path=self.file_path,
+            rows_total=plan.rows_total,
+            chunks_total=len(plan.ranges),
+        )
+        logger.info(f"Importing {self.file_path} into list {plan.todo_list_id} in {len(plan.ranges)} chunks")
+        return plan
+
+
+class ImportTodoChunkUseCase(UseCase):
+    """
+    Insert the rows of one byte range of an import file, one batch at a
+    time, and queue them for indexing in the outbox in the same transaction.
+    With ``upsert``, rows update the todo with the same title and due date
+    in the list instead of adding another one.
+    """
+
+    def __init__(
+        self,
+        import_id: str,
+        todo_list_id: int,
+        file_path: str,
+        start: int,
+        end: Optional[int],
+        fieldnames: Sequence[str],
+        batch_size: Optional[int] = None,
+        upsert: bool = False,
+    ) -> None:
+        self.import_id = import_id
+        self.todo_list_id = todo_list_id
+        self.file_path = file_path
+        self.start = start
+        self.end = end
+        self.fieldnames = fieldnames
+        self.batch_size = batch_size or settings.TODO_UPLOAD_BATCH_SIZE
+        self.upsert = upsert
+
+    def execute(self) -> UploadTodoListResult:
+        progress = todo_import_progress(self.import_id)
+        result = UploadTodoListResult(todo_list_id=self.todo_list_id)
+        if self.end is None:
+            reader = open_import_file(self.file_path, date_columns=DATE_COLUMNS)
+        else:
+            reader = CsvReader(
+                self.file_path, fieldnames=self.fieldnames, start=self.start, end=self.end, date_columns=DATE_COLUMNS
+            )
+        for batch in reader.batches(self.batch_size):
+            skipped_before = result.rows_skipped
+            todos = list(build_todos(batch, self.todo_list_id, result))
+            with transaction.atomic():
+                if self.upsert:
+                    written = upsert_todos(todos, use_copy=settings.TODO_UPLOAD_USE_COPY)
+                else:
+                    bulk_insert_todos(todos, use_copy=settings.TODO_UPLOAD_USE_COPY)
+                    written = todos
+                record_todo_changes([todo.id for todo in written], TodoOutbox.OPERATION_INDEX)
+            result.rows_imported += len(todos)
+            progress.incr(rows_done=len(todos), rows_skipped=result.rows_skipped - skipped_before)
+        progress.incr(chunks_done=1)
+        return result
+
+
+class FinalizeTodoImportUseCase(UseCase):
+    """
+    Record the totals of a finished import and publish the list changes.
+    """
+
+    def __init__(self, import_id: str, todo_list_id: int, chunk_results: Sequence[Dict[str, Any]]) -> None:
+        self.import_id = import_id
+        self.todo_list_id = todo_list_id
+        self.chunk_results = chunk_results
+
+    def execute(self) -> UploadTodoListResult:
+        result = UploadTodoListResult(todo_list_id=self.todo_list_id)
+        for chunk_result in self.chunk_results:
+            result.rows_imported += chunk_result["rows_imported"]
+            result.rows_skipped += chunk_result["rows_skipped"]
+        touch_todo_list(self.todo_list_id)
+
+        progress = todo_import_progress(self.import_id)
+        progress.finish()
+        state = progress.get() or {}
+        result.elapsed_seconds = state.get("elapsed_seconds", 0.0)
+        if transition_todo_import(
+            self.import_id,
+            TodoImport.STATE_COMPLETED,
+            rows_imported=result.rows_imported,
+            rows_skipped=result.rows_skipped,
+        ):
+            remove_spooled_upload(self.import_id)
+        logger.info(
+            f"Imported {result.rows_imported} todos into list {self.todo_list_id} "
+            f"({result.rows_skipped} skipped) in {result.elapsed_seconds:.2f}s "
+            f"({result.rows_per_second:.0f} rows/sec)"
+        )
+        return result
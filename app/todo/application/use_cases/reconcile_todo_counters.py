@@ -0,0 +1,49 @@
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+
+from todo.domain.todo import reconcile_todo_list_counters
+from core.use_case import UseCase
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ReconcileTodoCountersResult:
+    lists_checked: int = 0
+    lists_corrected: int = 0
+    batches: int = 0
+
+
+class ReconcileTodoCountersUseCase(UseCase):
+    """
+    Recount the todo counters of every list and correct the ones that
+    drifted.
+
+    The todo writes keep the counters exact, except for what they cannot
+    see: todos becoming overdue or due soon as days pass, and rows changed
+    outside the domain functions. Lists are walked in ascending id batches
+    of ``batch_size``, each recounted with one grouped query in its own
+    short transaction.
+    """
+
+    def __init__(self, batch_size: Optional[int] = None) -> None:
+        self.batch_size = batch_size or settings.TODO_COUNTERS_RECONCILE_BATCH_SIZE
+
+    def execute(self) -> ReconcileTodoCountersResult:
+        result = ReconcileTodoCountersResult()
+        last_id = 0
+        while True:
+            checked, corrected = reconcile_todo_list_counters(last_id, self.batch_size)
+            if not checked:
+                break
+            last_id = checked[-1]
+            result.batches += 1
+            result.lists_checked += len(checked)
+            result.lists_corrected += len(corrected)
+            if corrected:
+                logger.info(f"Corrected the todo counters of lists {corrected}")
+        logger.info(f"Checked the todo counters of {result.lists_checked} lists, corrected {result.lists_corrected}")
+        return result
@@ -0,0 +1,126 @@
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from core.batch import batched
+from todo.data.models.todo import Todo, TodoList
+from todo.data.repositories.todo import mark_todos_reminded
+from todo.data.reminders.todo import ReminderBackend, TodoReminder, get_reminder_backend
+from core.use_case import UseCase
+
+logger = logging.getLogger(__name__)
+
+Row = Tuple[int, str, date, int]
+
+
+@dataclass
+class SendTodoRemindersResult:
+    todos_scanned: int = 0
+    reminders_sent: int = 0
+    todos_reminded: int = 0
+    batches_failed: int = 0
+    finished: bool = False
+
+
+class SendTodoRemindersUseCase(UseCase):
+    """
+    Remind about open todos whose due date has passed, once per todo.
+
+    Todos are read in pages ordered by ``(due_date, id)`` with a keyset
+    cursor, from a partial index that only holds open, unreminded todos, so
+    the scan never touches reminded or completed rows however large the
+    table grows. Each page is grouped into one reminder per list and handed
+    to the backend in batches, with at most ``concurrency`` sends in flight.
+    A todo is marked reminded once its batch was delivered; failed batches
+    are picked up again by the next run.
+
+    The run stops after ``time_budget`` seconds so it fits in its beat
+    interval. A backlog larger than that is worked off over several runs:
+    delivered todos leave the index, so each run starts at the oldest
+    todo still waiting.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[ReminderBackend] = None,
+        scan_size: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        time_budget: Optional[float] = None,
+    ) -> None:
+        self.backend = backend or get_reminder_backend()
+        self.scan_size = scan_size or settings.TODO_REMINDER_SCAN_SIZE
+        self.batch_size = batch_size or settings.TODO_REMINDER_BATCH_SIZE
+        self.concurrency = concurrency or settings.TODO_REMINDER_CONCURRENCY
+        self.time_budget = time_budget or settings.TODO_REMINDER_TIME_BUDGET
+
+    def execute(self) -> SendTodoRemindersResult:
+        result = SendTodoRemindersResult()
+        deadline = time.monotonic() + self.time_budget
+        today = timezone.localdate()
+        cursor: Optional[Tuple[date, int]] = None
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            pending: Dict[Future, List[TodoReminder]] = {}
+            while time.monotonic() < deadline:
+                rows = self._scan_page(today, cursor)
+                result.todos_scanned += len(rows)
+                for reminders in batched(self._group(rows), self.batch_size):
+                    if len(pending) >= self.concurrency * 2:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            self._settle(future, pending.pop(future), today, result)
+                    pending[executor.submit(self.backend.send, reminders)] = reminders
+                if len(rows) < self.scan_size:
+                    result.finished = True
+                    break
+                cursor = (rows[-1][2], rows[-1][0])
+
+            for future in list(pending):
+                self._settle(future, pending.pop(future), today, result)
+
+        if result.todos_scanned:
+            logger.info(
+                f"Sent {result.reminders_sent} reminders for {result.todos_reminded} overdue todos, "
+                f"{result.batches_failed} batches failed"
+                + ("" if result.finished else "; time budget reached, resuming on the next run")
+            )
+        return result
+
+    def _scan_page(self, today: date, cursor: Optional[Tuple[date, int]]) -> List[Row]:
+        # matches the condition of todo_reminder_due_date_id_idx
+        todos = Todo.objects.filter(due_date__lt=today, completed_at__isnull=True, reminded_at__isnull=True)
+        if cursor is not None:
+            due_date, todo_id = cursor
+            todos = todos.filter(Q(due_date__gt=due_date) | Q(due_date=due_date, id__gt=todo_id))
+        return list(todos.order_by("due_date", "id").values_list("id", "title", "due_date", "list_id")[:self.scan_size])
+
+    def _group(self, rows: List[Row]) -> List[TodoReminder]:
+        list_ids = {todo_list_id for _, _, _, todo_list_id in rows}
+        names = dict(TodoList.objects.filter(id__in=list_ids).values_list("id", "name"))
+        reminders: Dict[int, TodoReminder] = {}
+        for todo_id, title, due_date, todo_list_id in rows:
+            reminder = reminders.get(todo_list_id)
+            if reminder is None:
+                reminder = reminders[todo_list_id] = TodoReminder(todo_list_id, names.get(todo_list_id, ""))
+            reminder.todos.append({"id": todo_id, "title": title, "due_date": due_date})
+        return list(reminders.values())
+
+    def _settle(self, future: Future, reminders: List[TodoReminder], today: date, result: SendTodoRemindersResult) -> None:
+        try:
+            future.result()
+        except Exception as e:
+            result.batches_failed += 1
+            logger.warning(f"Could not send {len(reminders)} todo reminders, retrying on the next run: {str(e)}")
+            return
+        # marked from this thread, the backend threads hold no database connection
+        todo_ids = [todo["id"] for reminder in reminders for todo in reminder.todos]
+        result.todos_reminded += mark_todos_reminded(todo_ids, due_before=today)
+        result.reminders_sent += len(reminders)
@@ -0,0 +1,130 @@
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from todo.data.models.todo import JobCheckpoint, Todo, TodoOutbox, TodoOutboxCursor
+from todo.data.elasticsearch.bulk import BulkResult, RETRYABLE_STATUSES
+from todo.data.elasticsearch.reindex import REINDEX_CHECKPOINT_NAME
+from todo.data.elasticsearch.search.todo import index_todos, delete_indexed_todos
+from core.use_case import UseCase
+
+logger = logging.getLogger(__name__)
+
+CURSOR_NAME = "todo-index"
+
+
+@dataclass
+class SyncTodoIndexResult:
+    events_processed: int = 0
+    todos_indexed: int = 0
+    todos_deleted: int = 0
+    events_retrying: int = 0
+    # applied during a reindex and kept for the replay after the swap
+    events_kept: int = 0
+    high_water_mark: int = 0
+
+
+class SyncTodoIndexUseCase(UseCase):
+    """
+    Drain the todo outbox into Elasticsearch.
+
+    Events are read in id order, coalesced per todo and applied with bulk
+    requests. Each todo is indexed from its current database row, or deleted
+    from the index if the row no longer exists, so the outcome does not
+    depend on how many events were queued for it. Events whose bulk item
+    failed with a retryable status stay in the outbox for the next run.
+
+    While ``reindex_todos`` is building a new index the live alias is still
+    kept up to date, but the events stay in the outbox: only those above the
+    cursor's high-water mark are applied, and the mark moves past them. Once
+    the alias has moved and the reindex checkpoint is gone, the kept events
+    are replayed into the new index, over any row the reindex copied before
+    it changed.
+    """
+
+    def __init__(self, batch_size: Optional[int] = None, max_batches: Optional[int] = None) -> None:
+        self.batch_size = batch_size or settings.TODO_INDEX_SYNC_BATCH_SIZE
+        self.max_batches = max_batches or settings.TODO_INDEX_SYNC_MAX_BATCHES
+
+    def execute(self) -> SyncTodoIndexResult:
+        result = SyncTodoIndexResult()
+        for _ in range(self.max_batches):
+            if not self._drain_batch(result):
+                break
+        if result.events_processed:
+            logger.info(
+                f"Synced {result.events_processed} outbox events: {result.todos_indexed} indexed, "
+                f"{result.todos_deleted} deleted, {result.events_retrying} left for retry, "
+                f"{result.events_kept} kept for the reindex (high-water mark {result.high_water_mark})"
+            )
+        return result
+
+    def _drain_batch(self, result: SyncTodoIndexResult) -> bool:
+        with transaction.atomic():
+            # Serialises consumers: two drains applying the same todo out of
+            # order could leave a stale document behind.
+            TodoOutboxCursor.objects.get_or_create(name=CURSOR_NAME)
+            cursor = TodoOutboxCursor.objects.select_for_update().get(name=CURSOR_NAME)
+
+            reindexing = JobCheckpoint.objects.filter(name=REINDEX_CHECKPOINT_NAME).exists()
+            outbox = TodoOutbox.objects.order_by("id")
+            if reindexing:
+                outbox = outbox.filter(id__gt=cursor.high_water_mark)
+            events = list(outbox.values_list("id", "todo_id")[:self.batch_size])
+            if not events:
+                return False
+
+            event_ids_by_todo: Dict[int, List[int]] = {}
+            for event_id, todo_id in events:
+                event_ids_by_todo.setdefault(todo_id, []).append(event_id)
+
+            todo_ids = list(event_ids_by_todo)
+            todos = list(Todo.objects.filter(id__in=todo_ids))
+            deleted_ids = set(todo_ids) - {todo.id for todo in todos}
+
+            failed_todo_ids = _failed_ids(index_todos(todos)) | _failed_ids(delete_indexed_todos(deleted_ids))
+
+            done_event_ids = [
+                event_id
+                for todo_id, event_ids in event_ids_by_todo.items()
+                if todo_id not in failed_todo_ids
+                for event_id in event_ids
+            ]
+            failed_event_ids = {event_id for event_id, _ in events} - set(done_event_ids)
+            if reindexing:
+                # the next run retries from the first failure; all of them are
+                # replayed after the swap either way
+                high_water_mark = min(failed_event_ids) - 1 if failed_event_ids else events[-1][0]
+            else:
+                TodoOutbox.objects.filter(id__in=done_event_ids).delete()
+                high_water_mark = events[-1][0]
+
+            cursor.high_water_mark = max(cursor.high_water_mark, high_water_mark)
+            cursor.last_synced_at = timezone.now()
+            cursor.save(update_fields=["high_water_mark", "last_synced_at", "updated_at"])
+
+        result.events_processed += len(done_event_ids)
+        if reindexing:
+            result.events_kept += len(done_event_ids)
+        result.events_retrying += len(failed_event_ids)
+        result.todos_indexed += len([todo for todo in todos if todo.id not in failed_todo_ids])
+        result.todos_deleted += len(deleted_ids - failed_todo_ids)
+        result.high_water_mark = cursor.high_water_mark
+        # stop when a batch makes no progress so failing items are not hammered;
+        # during a reindex a failure holds the mark back, so stop at the first
+        return len(events) == self.batch_size and bool(done_event_ids) and not (reindexing and failed_event_ids)
+
+
+def _failed_ids(bulk_result: BulkResult) -> Set[int]:
+    # Permanent failures (e.g. mapping errors) are already logged by the
+    # indexer; keeping them would retry them forever.
+    return {
+        int(info["_id"])
+        for item in bulk_result.failed
+        for info in item.values()
+        if info.get("status") in RETRYABLE_STATUSES
+    }
@@ -1,30 +1,55 @@
-from todo.domain.todo import create_todo_list
+import logging
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, Iterable
+
 from todo.data.models.todo import Todo
-from todo.data.elasticsearch.search.todo import index_todo_list
-from core.csv import read_csv_file
-from core.use_case import UseCase
-
-
-class UploadTodoListUseCase(UseCase):
-
-    def __init__(self, todo_list_name: str, todo_list_file_name: str) -> None:
-        self.todo_list_name = todo_list_name
-        self.todo_list_file_name = todo_list_file_name
-
-    def execute(self) -> None:
-        todo_list = create_todo_list(self.todo_list_name)
-        todo_list_csv_data = read_csv_file(self.todo_list_file_name)
-        todo_list_items = []
-        for todo_list_csv_row in todo_list_csv_data:
-            todo = Todo(
-                title=todo_list_csv_row["title"],
-                description=todo_list_csv_row["description"],
-                due_date=todo_list_csv_row["due_date"],
-                list_id=todo_list.id
-            )
-            todo_list_items.append(todo)
-
-        todo_list.todos = todo_list_items
-        todo_list.save()
-        index_todo_list(todo_list)
 
+logger = logging.getLogger(__name__)
+
+TITLE_MAX_LENGTH = Todo._meta.get_field("title").max_length
+# parsed by the reader a batch at a time
+DATE_COLUMNS = ("due_date",)
+
+
+@dataclass
+class UploadTodoListResult:
+    todo_list_id: int
+    rows_imported: int = 0
+    rows_skipped: int = 0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        if not self.elapsed_seconds:
+            return 0.0
+        return self.rows_imported / self.elapsed_seconds
+
+
+def build_todos(rows: Iterable[Dict[str, Any]], todo_list_id: int, result: UploadTodoListResult) -> Iterable[Todo]:
+    """
+    Build unsaved todos from CSV rows, counting invalid rows as skipped.
+    """
+    for row in rows:
+        try:
+            yield _build_todo(row, todo_list_id)
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            result.rows_skipped += 1
+            logger.warning(f"Skipping invalid todo row {row!r}: {e}")
+
+
+def _build_todo(row: Dict[str, Any], todo_list_id: int) -> Todo:
+    title = (row["title"] or "").strip()
+    if not title:
+        raise ValueError("title is required")
+    if len(title) > TITLE_MAX_LENGTH:
+        raise ValueError(f"title is longer than {TITLE_MAX_LENGTH} characters")
+    due_date = row["due_date"]
+    if not isinstance(due_date, date):
+        raise ValueError(f"invalid due_date {due_date!r}")
+    return Todo(
+        title=title,
+        description=row.get("description") or "",
+        due_date=due_date,
+        list_id=todo_list_id,
+    )
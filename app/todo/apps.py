@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class TodoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'todo'
+
+    def ready(self):
+        from elasticsearch_dsl.connections import connections
+
+        from core import task_telemetry
+
+        # Connections are opened lazily on first use
+        connections.configure(default={"hosts": [settings.ELASTICSEARCH_URL]})
+
+        # web processes stamp the tasks they publish, workers record the runs
+        task_telemetry.connect()
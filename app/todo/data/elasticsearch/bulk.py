@@ -0,0 +1,164 @@
+import json
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from elasticsearch import NotFoundError
+from elasticsearch.helpers import expand_action
+from elasticsearch_dsl.connections import connections
+
+logger = logging.getLogger(__name__)
+
+# Bulk item statuses worth sending again; anything else (mapping errors,
+# version conflicts, ...) would fail the same way on every attempt.
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+
+Action = Dict[str, Any]
+Operation = Tuple[Action, Dict[str, Any], Optional[Dict[str, Any]], int]
+
+
+@dataclass
+class BulkResult:
+    succeeded: int = 0
+    failed: List[Dict[str, Any]] = field(default_factory=list)
+    retried: int = 0
+
+    def merge(self, other: "BulkResult") -> None:
+        self.succeeded += other.succeeded
+        self.failed.extend(other.failed)
+        self.retried += other.retried
+
+
+class BulkIndexer:
+    """
+    Send index/update/delete actions through the ``_bulk`` API.
+
+    Actions use the same format as ``elasticsearch.helpers.bulk`` and are
+    grouped into chunks capped both by document count and by payload size.
+    Chunks are sent from a thread pool with a bounded number of requests
+    in flight, so arbitrarily long action generators are consumed lazily.
+    Items that fail with a retryable status are resent on their own, with
+    exponential backoff, instead of resending the whole chunk.
+    """
+
+    def __init__(
+        self,
+        client: Any = None,
+        chunk_size: Optional[int] = None,
+        max_chunk_bytes: Optional[int] = None,
+        thread_count: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        initial_backoff: float = 0.5,
+    ) -> None:
+        self.client = client or connections.get_connection()
+        self.chunk_size = chunk_size or settings.ELASTICSEARCH_BULK_CHUNK_SIZE
+        self.max_chunk_bytes = max_chunk_bytes or settings.ELASTICSEARCH_BULK_MAX_CHUNK_BYTES
+        self.thread_count = thread_count or settings.ELASTICSEARCH_BULK_THREAD_COUNT
+        self.max_retries = settings.ELASTICSEARCH_BULK_MAX_RETRIES if max_retries is None else max_retries
+        self.initial_backoff = initial_backoff
+
+    def run(self, actions: Iterable[Action]) -> BulkResult:
+        result = BulkResult()
+        if self.thread_count <= 1:
+            for chunk in self._chunks(actions):
+                result.merge(self._send_chunk(chunk))
+            return result
+
+        with ThreadPoolExecutor(max_workers=self.thread_count) as executor:
+            pending = set()
+            for chunk in self._chunks(actions):
+                if len(pending) >= self.thread_count * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        result.merge(future.result())
+                pending.add(executor.submit(self._send_chunk, chunk))
+            for future in pending:
+                result.merge(future.result())
+        return result
+
+    def _chunks(self, actions: Iterable[Action]) -> Iterator[List[Operation]]:
+        chunk: List[Operation] = []
+        chunk_bytes = 0
+        for action in actions:
+            header, body = expand_action(action)
+            size = _json_size(header) + (_json_size(body) if body is not None else 0)
+            if chunk and (len(chunk) >= self.chunk_size or chunk_bytes + size > self.max_chunk_bytes):
+                yield chunk
+                chunk, chunk_bytes = [], 0
+            chunk.append((action, header, body, size))
+            chunk_bytes += size
+        if chunk:
+            yield chunk
+
+    def _send_chunk(self, chunk: List[Operation]) -> BulkResult:
+        result = BulkResult()
+        attempt = 0
+        while chunk:
+            retry: List[Operation] = []
+            for operation, item in zip(chunk, self._bulk(chunk)):
+                (op_type, info), = item.items()
+                status = info.get("status", 500)
+                if 200 <= status < 300 or (op_type == "delete" and status == 404):
+                    result.succeeded += 1
+                elif status in RETRYABLE_STATUSES and attempt < self.max_retries:
+                    retry.append(operation)
+                else:
+                    result.failed.append({op_type: info})
+
+            if retry:
+                attempt += 1
+                result.retried += len(retry)
+                time.sleep(self.initial_backoff * 2 ** (attempt - 1))
+            chunk = retry
+
+        if result.failed:
+            logger.warning(f"{len(result.failed)} bulk actions failed, first error: {result.failed[0]}")
+        return result
+
+    def _bulk(self, chunk: List[Operation]) -> List[Dict[str, Any]]:
+        operations: List[Dict[str, Any]] = []
+        for _, header, body, _ in chunk:
+            operations.append(header)
+            if body is not None:
+                operations.append(body)
+        response = self.client.bulk(operations=operations)
+        return response["items"]
+
+
+@contextmanager
+def suspended_refresh(index_name: str, client: Any = None) -> Iterator[None]:
+    """
+    Turn off periodic refreshes on an index, or the indices behind an
+    alias, for the duration of a large load, then restore each one's
+    previous ``refresh_interval``.
+    """
+    client = client or connections.get_connection()
+    try:
+        response = client.indices.get_settings(index=index_name, name="index.refresh_interval")
+    except NotFoundError:
+        # The index is created on first write, nothing to suspend yet
+        yield
+        return
+    # keyed by concrete index name, not by the alias that was asked for
+    previous = {
+        name: index_settings.get("settings", {}).get("index", {}).get("refresh_interval")
+        for name, index_settings in getattr(response, "body", response).items()
+    }
+
+    for name in previous:
+        client.indices.put_settings(index=name, settings={"index": {"refresh_interval": "-1"}})
+    try:
+        yield
+    finally:
+        for name, refresh_interval in previous.items():
+            # ``None`` resets the setting to the cluster default
+            client.indices.put_settings(index=name, settings={"index": {"refresh_interval": refresh_interval}})
+
+
+def _json_size(data: Any) -> int:
+    # Only used to cap chunk sizes, so an approximation of the wire format is enough
+    return len(json.dumps(data, default=str).encode("utf-8")) + 1
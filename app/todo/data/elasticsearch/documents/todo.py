@@ -1,10 +1,12 @@
-from elasticsearch_dsl import Document, Text, Date, Integer
+from elasticsearch_dsl import Document, Text, Date, Keyword, Long
 
 class TodoIndex(Document):
-    title = Text()
+    # database id, used as the search_after tiebreaker since _id has no doc values
+    todo_id = Long()
+    title = Text(fields={"raw": Keyword()})
     description = Text()
-    due_date = Date()
-    list_id = Integer()
+    due_date = Date(format="strict_date")
+    list_id = Keyword()
 
     class Index:
         name = "todo"
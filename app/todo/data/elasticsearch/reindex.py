@@ -0,0 +1,108 @@
+import re
+from typing import Any, List, Optional
+
+from elasticsearch_dsl.connections import connections
+
+from core.batch import throttled
+from todo.data.elasticsearch.bulk import BulkIndexer, BulkResult
+from todo.data.elasticsearch.documents.todo import TodoIndex
+from todo.data.elasticsearch.search.todo import todo_source
+from todo.data.models.todo import Todo
+
+# While a checkpoint with this name exists the outbox events are kept for a
+# replay into the new index, see SyncTodoIndexUseCase.
+REINDEX_CHECKPOINT_NAME = "todo-reindex"
+
+
+def alias_name() -> str:
+    # Searches and writes go through the name declared on the document
+    return TodoIndex._index._name
+
+
+def next_index_name(client: Any = None) -> str:
+    """
+    Return ``<alias>-v<N>`` with N one above the highest existing version.
+    A concrete index named after the alias counts as version 1.
+    """
+    client = client or connections.get_connection()
+    alias = alias_name()
+    pattern = re.compile(rf"^{re.escape(alias)}-v(\d+)$")
+    existing = client.indices.get(index=f"{alias}-v*", expand_wildcards="all", ignore_unavailable=True)
+    versions = [int(match.group(1)) for match in map(pattern.match, existing) if match]
+    return f"{alias}-v{max(versions, default=1) + 1}"
+
+
+def create_index(index_name: str, client: Any = None) -> None:
+    """
+    Create ``index_name`` with the TodoIndex mappings and settings, with
+    refreshes turned off until ``finish_index`` is called.
+    """
+    index = TodoIndex._index.clone(name=index_name)
+    index.settings(refresh_interval="-1")
+    index.create(using=client or connections.get_connection())
+
+
+def finish_index(index_name: str, client: Any = None) -> None:
+    client = client or connections.get_connection()
+    # ``None`` resets the setting to the cluster default
+    client.indices.put_settings(index=index_name, settings={"index": {"refresh_interval": None}})
+    client.indices.refresh(index=index_name)
+
+
+def index_exists(index_name: str, client: Any = None) -> bool:
+    client = client or connections.get_connection()
+    return bool(client.indices.exists(index=index_name))
+
+
+def aliased_indices(client: Any = None) -> List[str]:
+    client = client or connections.get_connection()
+    alias = alias_name()
+    if not client.indices.exists_alias(name=alias):
+        return []
+    return sorted(client.indices.get_alias(name=alias))
+
+
+def swap_alias(index_name: str, client: Any = None) -> List[str]:
+    """
+    Point the alias at ``index_name`` in a single ``_aliases`` request, so
+    readers and writers see either the old or the new index, never neither.
+    A concrete index that still uses the alias name is dropped in the same
+    request. Returns the indices the alias pointed at before.
+    """
+    client = client or connections.get_connection()
+    alias = alias_name()
+    previous = aliased_indices(client)
+    actions = [{"remove": {"index": previous_index, "alias": alias}} for previous_index in previous]
+    if not previous and client.indices.exists(index=alias):
+        actions.append({"remove_index": {"index": alias}})
+    actions.append({"add": {"index": index_name, "alias": alias, "is_write_index": True}})
+    client.indices.update_aliases(actions=actions)
+    return previous
+
+
+def delete_index(index_name: str, client: Any = None) -> None:
+    client = client or connections.get_connection()
+    client.indices.delete(index=index_name, ignore_unavailable=True)
+
+
+def index_todo_range(
+    index_name: str,
+    start_id: int,
+    end_id: Optional[int],
+    chunk_size: int = 2000,
+    max_rate: Optional[float] = None,
+    thread_count: Optional[int] = None,
+) -> BulkResult:
+    """
+    Index the todos with ``start_id <= id < end_id`` into ``index_name``,
+    streaming rows from a server-side cursor. ``max_rate`` caps the
+    documents sent per second.
+    """
+    todos = Todo.objects.filter(id__gte=start_id).order_by("id")
+    if end_id is not None:
+        todos = todos.filter(id__lt=end_id)
+    actions = (
+        {"_op_type": "index", "_index": index_name, "_id": todo.id, "_source": todo_source(todo)}
+        for todo in todos.iterator(chunk_size=chunk_size)
+    )
+    return BulkIndexer(thread_count=thread_count).run(throttled(actions, max_rate))
@@ -1,31 +1,111 @@
-from typing import List
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional
+from django.conf import settings
+from core.metrics import track
+from core.pagination import InvalidCursor, Page, decode_cursor, encode_cursor
+from todo.data.elasticsearch.bulk import BulkIndexer, BulkResult, suspended_refresh
 from todo.data.elasticsearch.documents.todo import TodoIndex
 from todo.data.models.todo import Todo, TodoList
 
-def search_todos(query: str) -> List[TodoIndex]:
-    return TodoIndex.search().query("match", title=query).execute()
+SEARCH_FIELDS = ["title^2", "description"]
+SEARCH_SOURCE = ["todo_id", "title", "description", "due_date", "list_id"]
+SEARCH_SORT = [{"_score": "desc"}, {"due_date": "asc"}, {"todo_id": "asc"}]
 
-def index_todo_list(todo_list: TodoList) -> None:
-    for todo in todo_list.todos:
-        index_todo(todo)
+def search_todos(
+    query: Optional[str] = None,
+    list_id: Optional[int] = None,
+    due_date_from: Optional[date] = None,
+    due_date_to: Optional[date] = None,
+    page_size: int = 10,
+    cursor: Optional[str] = None,
+) -> Page[Dict[str, Any]]:
+    """
+    Search todos and return their ``_source`` directly, so no database round
+    trip is needed. The cursor carries the sort values of the last hit and
+    is passed as ``search_after``, which stays cheap at any depth, unlike
+    ``from``/``size``.
+    """
+    search = TodoIndex.search()
+    if query:
+        search = search.query("multi_match", query=query, fields=SEARCH_FIELDS)
+    if list_id is not None:
+        search = search.filter("term", list_id=str(list_id))
+    if due_date_from or due_date_to:
+        due_date_range = {}
+        if due_date_from:
+            due_date_range["gte"] = due_date_from.isoformat()
+        if due_date_to:
+            due_date_range["lte"] = due_date_to.isoformat()
+        search = search.filter("range", due_date=due_date_range)
 
-def index_todo(todo: Todo) -> None:
+    search = search.sort(*SEARCH_SORT)
+    search = search.source(SEARCH_SOURCE).extra(size=page_size + 1, track_total_hits=False)
+    if cursor:
+        search_after = decode_cursor(cursor)
+        if len(search_after) != len(SEARCH_SORT):
+            raise InvalidCursor()
+        search = search.extra(search_after=search_after)
+
+    with track("es"):
+        hits = search.execute().to_dict()["hits"]["hits"]
+    next_cursor = encode_cursor(hits[page_size - 1]["sort"]) if len(hits) > page_size else None
+    return Page(items=[_search_hit(hit) for hit in hits[:page_size]], page_size=page_size, next_cursor=next_cursor)
+
+def _search_hit(hit: Dict[str, Any]) -> Dict[str, Any]:
+    source = hit["_source"]
+    return {
+        "id": source["todo_id"],
+        "title": source["title"],
+        "description": source["description"],
+        "due_date": source["due_date"],
+        "list_id": int(source["list_id"]),
+    }
+
+def todo_source(todo: Todo) -> Dict[str, Any]:
+    return {
+        "todo_id": todo.id,
+        "title": todo.title,
+        "description": todo.description,
+        "due_date": todo.due_date,
+        "list_id": todo.list_id,
+    }
+
+def _index_name() -> str:
+    return TodoIndex._index._name
+
+def index_todo_list(todo_list: TodoList) -> BulkResult:
+    todos = todo_list.todos.all()
+    if todos.count() < settings.ELASTICSEARCH_BULK_REFRESH_THRESHOLD:
+        return index_todos(todos.iterator(chunk_size=2000))
+    with suspended_refresh(_index_name()):
+        return index_todos(todos.iterator(chunk_size=2000))
 
-    todo_document = TodoIndex(
-        title=todo.title,
-        description=todo.description,
-        due_date=todo.due_date,
-        list_id=todo.list_id
+def index_todos(todos: Iterable[Todo]) -> BulkResult:
+    index_name = _index_name()
+    return BulkIndexer().run(
+        {"_op_type": "index", "_index": index_name, "_id": todo.id, "_source": todo_source(todo)}
+        for todo in todos
     )
-    todo_document.save()
+
+def update_indexed_todos(todos: Iterable[Todo]) -> BulkResult:
+    index_name = _index_name()
+    return BulkIndexer().run(
+        {"_op_type": "update", "_index": index_name, "_id": todo.id, "doc": todo_source(todo), "doc_as_upsert": True}
+        for todo in todos
+    )
+
+def delete_indexed_todos(todo_ids: Iterable[int]) -> BulkResult:
+    index_name = _index_name()
+    return BulkIndexer().run(
+        {"_op_type": "delete", "_index": index_name, "_id": todo_id}
+        for todo_id in todo_ids
+    )
+
+def index_todo(todo: Todo) -> None:
+    index_todos([todo])
 
 def update_indexed_todo(todo: Todo) -> None:
-    todo_document = TodoIndex.get(id=todo.id)
-    todo_document.title = todo.title
-    todo_document.description = todo.description
-    todo_document.due_date = todo.due_date
-    todo_document.list_id = todo.list_id
-    todo_document.save()
+    update_indexed_todos([todo])
 
 def delete_indexed_todo(todo_id: int) -> None:
-    TodoIndex.delete(id=todo_id)
+    delete_indexed_todos([todo_id])
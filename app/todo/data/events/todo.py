@@ -0,0 +1,40 @@
+import logging
+from typing import Iterable, Optional
+
+import redis
+from django.conf import settings
+
+from core.events import EventStream
+
+logger = logging.getLogger(__name__)
+
+TODO_LIST_CREATED = "todo_list.created"
+TODO_LIST_UPDATED = "todo_list.updated"
+TODO_LIST_DELETED = "todo_list.deleted"
+TODO_CREATED = "todo.created"
+TODO_UPDATED = "todo.updated"
+TODO_DELETED = "todo.deleted"
+
+todo_events = EventStream(
+    "todo:events",
+    settings.TODO_EVENTS_REDIS_URL,
+    maxlen=settings.TODO_EVENTS_STREAM_MAXLEN,
+    queue_size=settings.TODO_EVENTS_QUEUE_SIZE,
+)
+
+
+def publish_todo_event(event_type: str, todo_list_id: int, todo_ids: Iterable[int] = ()) -> Optional[str]:
+    """
+    Publish a change to the feed. Events only carry ids, subscribers fetch
+    the rows they need. A feed outage never fails the write that triggered
+    it.
+    """
+    data = {"list_id": todo_list_id}
+    todo_ids = sorted(todo_ids)
+    if todo_ids:
+        data["todo_ids"] = todo_ids
+    try:
+        return todo_events.publish(event_type, data)
+    except redis.RedisError as e:
+        logger.warning(f"Could not publish {event_type} for list {todo_list_id}: {e}")
+        return None
@@ -4,6 +4,12 @@ from django.db import models
 
 class TodoList(models.Model):
     name = models.CharField(max_length=200)
+    # Counters of the list's todos, moved with F() by every todo write and
+    # recounted by reconcile_todo_counters. Overdue and due soon are
+    # relative to the day of the last write or recount.
+    todos_count = models.IntegerField(default=0)
+    overdue_count = models.IntegerField(default=0)
+    due_soon_count = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -12,5 +18,120 @@ class Todo(models.Model):
     description = models.TextField()
     due_date = models.DateField()
     list = models.ForeignKey(TodoList, on_delete=models.CASCADE, related_name="todos")
+    completed_at = models.DateTimeField(null=True, blank=True)
+    # when the overdue reminder went out, cleared when the due date moves
+    reminded_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
\ No newline at end of file
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # serves the per-list listing ordered and paged by (due_date, id)
+            models.Index(fields=["list", "due_date", "id"], name="todo_list_due_date_id_idx"),
+            # lets the cleanup walk completed todos in id order without
+            # visiting open ones; completed_at is checked in the index
+            models.Index(
+                fields=["id", "completed_at"],
+                name="todo_completed_id_idx",
+                condition=models.Q(completed_at__isnull=False),
+            ),
+            # the reminder scan walks open, unreminded todos by (due_date, id);
+            # reminded ones drop out of the index
+            models.Index(
+                fields=["due_date", "id"],
+                name="todo_reminder_due_date_id_idx",
+                condition=models.Q(completed_at__isnull=True, reminded_at__isnull=True),
+            ),
+        ]
+
+
+class TodoOutbox(models.Model):
+    """
+    Todo changes recorded in the same transaction as the write and
+    drained asynchronously into the search index.
+    """
+    OPERATION_INDEX = "index"
+    OPERATION_DELETE = "delete"
+    OPERATION_CHOICES = [
+        (OPERATION_INDEX, "Index"),
+        (OPERATION_DELETE, "Delete"),
+    ]
+
+    todo_id = models.BigIntegerField()
+    operation = models.CharField(max_length=10, choices=OPERATION_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class TodoOutboxCursor(models.Model):
+    """
+    Progress of an outbox consumer. The row is also locked while draining so
+    that only one consumer applies changes at a time.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    high_water_mark = models.BigIntegerField(default=0)
+    last_synced_at = models.DateTimeField(null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class JobCheckpoint(models.Model):
+    """
+    Resumable state of a long-running maintenance job, keyed by job name.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    state = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class TodoImport(models.Model):
+    """
+    Ledger of file imports, keyed by the content hash of the file and the
+    list it goes into, so a file that was already imported (or is being
+    imported) into a list is not imported again.
+    """
+    STATE_PENDING = "pending"
+    STATE_RUNNING = "running"
+    STATE_COMPLETED = "completed"
+    STATE_FAILED = "failed"
+    STATE_CHOICES = [
+        (STATE_PENDING, "Pending"),
+        (STATE_RUNNING, "Running"),
+        (STATE_COMPLETED, "Completed"),
+        (STATE_FAILED, "Failed"),
+    ]
+    # the states each state can be entered from
+    TRANSITIONS = {
+        STATE_RUNNING: [STATE_PENDING],
+        STATE_COMPLETED: [STATE_RUNNING],
+        STATE_FAILED: [STATE_PENDING, STATE_RUNNING],
+    }
+
+    # id of the process_todo_upload task, which reports the progress
+    import_id = models.CharField(max_length=255, unique=True)
+    content_hash = models.CharField(max_length=64)
+    # "list:<id>" for an existing list, "name:<name>" for a new one
+    destination = models.CharField(max_length=255)
+    file_path = models.CharField(max_length=1024)
+    upsert = models.BooleanField(default=False)
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default=STATE_PENDING)
+    todo_list = models.ForeignKey(TodoList, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    rows_imported = models.IntegerField(default=0)
+    rows_skipped = models.IntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # One live import per file and destination. Failed imports, and
+            # completed ones whose list was deleted since, can be run again.
+            models.UniqueConstraint(
+                fields=["content_hash", "destination"],
+                name="todo_import_active_hash_uniq",
+                condition=(
+                    models.Q(state__in=["pending", "running"])
+                    | models.Q(state="completed", todo_list__isnull=False)
+                ),
+            ),
+        ]
@@ -0,0 +1,90 @@
+import logging
+import threading
+import urllib.request
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from core.json import dumps
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TodoReminder:
+    """
+    Overdue todos of one list, delivered together.
+    """
+    list_id: int
+    list_name: str
+    # {"id", "title", "due_date"} per todo, oldest due date first
+    todos: List[Dict[str, Any]] = field(default_factory=list)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "list_id": self.list_id,
+            "list_name": self.list_name,
+            "todos": [{**todo, "due_date": todo["due_date"].isoformat()} for todo in self.todos],
+        }
+
+
+class ReminderBackend:
+    """
+    Delivers reminders. ``send`` is called with up to
+    TODO_REMINDER_BATCH_SIZE reminders at a time, from several threads at
+    once, and must raise if the batch was not delivered so that its todos
+    are reminded again on the next run.
+    """
+
+    def send(self, reminders: List[TodoReminder]) -> None:
+        raise NotImplementedError
+
+
+class InMemoryReminderBackend(ReminderBackend):
+    """
+    Keeps sent reminders in ``InMemoryReminderBackend.outbox``, for tests
+    and local development.
+    """
+
+    outbox: List[TodoReminder] = []
+    _lock = threading.Lock()
+
+    def send(self, reminders: List[TodoReminder]) -> None:
+        with self._lock:
+            self.outbox.extend(reminders)
+
+
+class LoggingReminderBackend(ReminderBackend):
+
+    def send(self, reminders: List[TodoReminder]) -> None:
+        for reminder in reminders:
+            logger.info(f"Reminder for list {reminder.list_id} ({reminder.list_name}): {len(reminder.todos)} overdue todos")
+
+
+class WebhookReminderBackend(ReminderBackend):
+    """
+    POST each batch as ``{"reminders": [...]}`` to TODO_REMINDER_WEBHOOK_URL.
+    """
+
+    def __init__(self, url: Optional[str] = None, timeout: Optional[float] = None) -> None:
+        self.url = url or settings.TODO_REMINDER_WEBHOOK_URL
+        self.timeout = timeout or settings.TODO_REMINDER_WEBHOOK_TIMEOUT
+        if not self.url:
+            raise ValueError("TODO_REMINDER_WEBHOOK_URL is not set")
+
+    def send(self, reminders: List[TodoReminder]) -> None:
+        request = urllib.request.Request(
+            self.url,
+            data=dumps({"reminders": [reminder.as_dict() for reminder in reminders]}),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        # urlopen raises HTTPError for non-2xx responses
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+def get_reminder_backend(path: Optional[str] = None) -> ReminderBackend:
+    return import_string(path or settings.TODO_REMINDER_BACKEND)()
@@ -0,0 +1,217 @@
+import csv
+import io
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from core.batch import batched
+from todo.data.models.todo import Todo, TodoImport, TodoList, TodoOutbox
+
+COPY_COLUMNS = ("id", "title", "description", "due_date", "list_id", "created_at", "updated_at")
+TODO_COUNTER_FIELDS = ("todos_count", "overdue_count", "due_soon_count")
+
+# Changes of (todos_count, overdue_count, due_soon_count)
+CounterDeltas = Tuple[int, int, int]
+
+
+def bulk_insert_todos(todos: Sequence[Todo], use_copy: bool = True) -> int:
+    """
+    Insert a batch of unsaved todos in a single round trip, set their ids
+    and add them to the counters of their lists.
+
+    On PostgreSQL the batch is streamed with ``COPY ... FROM STDIN``, which
+    skips per-row INSERT parsing entirely. Other backends fall back to
+    ``bulk_create``.
+    """
+    if not todos:
+        return 0
+    if use_copy and connection.vendor == "postgresql":
+        _copy_todos(todos)
+    else:
+        Todo.objects.bulk_create(todos, batch_size=len(todos))
+    update_todo_lists((), todo_counter_deltas(added=todos))
+    return len(todos)
+
+
+def upsert_todos(todos: Sequence[Todo], use_copy: bool = True) -> List[Todo]:
+    """
+    Write a batch of unsaved todos keyed on ``(list, title, due_date)``:
+    the description of an existing todo with the same key is updated, the
+    other todos are inserted. Of several todos with the same key in the
+    batch the last one wins. Returns the todos written, saved ones for the
+    updated keys. Call inside a transaction.
+
+    The lists are locked first so concurrent upserts into a list cannot
+    both insert the same key.
+    """
+    if not todos:
+        return []
+    by_key: Dict[Tuple[int, str, date], Todo] = {}
+    for todo in todos:
+        by_key[(todo.list_id, todo.title, todo.due_date)] = todo
+    list_ids = sorted({todo.list_id for todo in by_key.values()})
+    list(TodoList.objects.select_for_update().filter(id__in=list_ids).order_by("id").values_list("id", flat=True))
+    existing = {
+        (todo.list_id, todo.title, todo.due_date): todo
+        for todo in Todo.objects.filter(list_id__in=list_ids, title__in={title for _, title, _ in by_key})
+    }
+
+    now = timezone.now()
+    updated, inserted = [], []
+    for key, todo in by_key.items():
+        current = existing.get(key)
+        if current is None:
+            inserted.append(todo)
+        else:
+            current.description = todo.description
+            current.updated_at = now
+            updated.append(current)
+    Todo.objects.bulk_update(updated, ["description", "updated_at"], batch_size=1000)
+    bulk_insert_todos(inserted, use_copy=use_copy)
+    return updated + inserted
+
+
+def _copy_todos(todos: Sequence[Todo]) -> int:
+    table = connection.ops.quote_name(Todo._meta.db_table)
+    with connection.cursor() as cursor:
+        # COPY cannot return the generated ids, so reserve them up front
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)",
+            [table, len(todos)],
+        )
+        for todo, (todo_id,) in zip(todos, cursor.fetchall()):
+            todo.id = todo_id
+
+        now = timezone.now()
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for todo in todos:
+            writer.writerow((todo.id, todo.title, todo.description, todo.due_date.isoformat(), todo.list_id, now, now))
+        buffer.seek(0)
+
+        # csv.writer leaves empty strings unquoted, which COPY would read as
+        # NULL; none of the columns is nullable
+        sql = "COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL (title, description))".format(
+            table=table,
+            columns=", ".join(connection.ops.quote_name(column) for column in COPY_COLUMNS),
+        )
+        if hasattr(cursor, "copy_expert"):
+            # psycopg2
+            cursor.copy_expert(sql, buffer)
+        else:
+            # psycopg 3
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+    return len(todos)
+
+
+def _todo_counters(todo: Todo, today: date) -> CounterDeltas:
+    if todo.completed_at is not None:
+        return 1, 0, 0
+    # unsaved and just updated todos may hold the ISO string from the request
+    due_date = Todo._meta.get_field("due_date").to_python(todo.due_date)
+    if due_date < today:
+        return 1, 1, 0
+    if due_date < today + timedelta(days=settings.TODO_DUE_SOON_DAYS):
+        return 1, 0, 1
+    return 1, 0, 0
+
+
+def todo_counter_deltas(
+    added: Iterable[Todo] = (), removed: Iterable[Todo] = (), today: Optional[date] = None
+) -> Dict[int, CounterDeltas]:
+    """
+    How the counters of each list change when the ``removed`` todos, as
+    they were, give way to the ``added`` ones; an updated todo is in both.
+    Lists whose counters stay the same are left out.
+    """
+    today = today or timezone.localdate()
+    deltas: Dict[int, List[int]] = {}
+    for todos, sign in ((added, 1), (removed, -1)):
+        for todo in todos:
+            delta = deltas.setdefault(todo.list_id, [0, 0, 0])
+            for index, count in enumerate(_todo_counters(todo, today)):
+                delta[index] += sign * count
+    return {todo_list_id: tuple(delta) for todo_list_id, delta in deltas.items() if any(delta)}
+
+
+def update_todo_lists(todo_list_ids: Iterable[int], deltas: Dict[int, CounterDeltas], **fields: Any) -> None:
+    """
+    Set ``fields`` on the lists and move their counters by ``deltas``. The
+    counters are moved with F() expressions, so concurrent writers add up
+    instead of overwriting each other. Lists with the same deltas share an
+    UPDATE.
+    """
+    groups: Dict[CounterDeltas, List[int]] = {}
+    for todo_list_id in sorted(set(todo_list_ids) | set(deltas)):
+        groups.setdefault(deltas.get(todo_list_id, (0, 0, 0)), []).append(todo_list_id)
+    for delta, group in groups.items():
+        changes = {field: F(field) + count for field, count in zip(TODO_COUNTER_FIELDS, delta) if count}
+        if changes or fields:
+            TodoList.objects.filter(id__in=group).update(**fields, **changes)
+
+
+def count_list_todos(todo_list_ids: Sequence[int], today: Optional[date] = None) -> Dict[int, CounterDeltas]:
+    """
+    The counters of the lists recounted from their todos, with one grouped
+    query. Lists without todos are left out.
+    """
+    today = today or timezone.localdate()
+    open_todos = Q(completed_at__isnull=True)
+    rows = (
+        Todo.objects.filter(list_id__in=todo_list_ids)
+        .order_by()
+        .values("list_id")
+        .annotate(
+            total=Count("id"),
+            overdue=Count("id", filter=open_todos & Q(due_date__lt=today)),
+            due_soon=Count("id", filter=open_todos & Q(
+                due_date__gte=today, due_date__lt=today + timedelta(days=settings.TODO_DUE_SOON_DAYS)
+            )),
+        )
+        .values_list("list_id", "total", "overdue", "due_soon")
+    )
+    return {todo_list_id: tuple(counts) for todo_list_id, *counts in rows}
+
+
+def record_todo_changes(todo_ids: Iterable[int], operation: str, batch_size: int = 1000) -> None:
+    """
+    Append todo changes to the outbox. Call inside the transaction that
+    performs the write so both commit or roll back together.
+    """
+    for batch in batched(todo_ids, batch_size):
+        TodoOutbox.objects.bulk_create(
+            [TodoOutbox(todo_id=todo_id, operation=operation) for todo_id in batch]
+        )
+
+
+def mark_todos_reminded(todo_ids: Sequence[int], due_before: date) -> int:
+    """
+    Record that the overdue reminder of these todos went out. Todos whose due
+    date moved to ``due_before`` or later since they were read are left for
+    a reminder about the new date. Returns the number of todos marked.
+    """
+    if not todo_ids:
+        return 0
+    # a plain UPDATE leaves updated_at alone, reminders are not a user change
+    return Todo.objects.filter(id__in=todo_ids, due_date__lt=due_before, reminded_at__isnull=True).update(
+        reminded_at=timezone.now()
+    )
+
+
+def transition_todo_import(import_id: str, state: str, **fields: Any) -> bool:
+    """
+    Move an import of the ledger to ``state``, setting ``fields`` along,
+    if its current state allows it (``TodoImport.TRANSITIONS``). The check
+    and the write are a single UPDATE, so of two racing workers only one
+    moves the import. Returns whether it moved.
+    """
+    if state in (TodoImport.STATE_COMPLETED, TodoImport.STATE_FAILED):
+        fields.setdefault("finished_at", timezone.now())
+    return TodoImport.objects.filter(import_id=import_id, state__in=TodoImport.TRANSITIONS[state]).update(
+        state=state, updated_at=timezone.now(), **fields
+    ) > 0
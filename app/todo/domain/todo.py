@@ -1,14 +1,85 @@
-from typing import List
+import copy
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from pydantic import BaseModel
-from django.db.models import Model
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Model, Q, QuerySet
+from django.utils import timezone
+from elasticsearch import ApiError, TransportError
 
-from todo.data.models.todo import TodoList, Todo
-from todo.interfaces.schema.todo import TodoListCreate, TodoListUpdate, TodoCreate, TodoUpdate
-from todo.data.elasticsearch.search.todo import delete_indexed_todo, update_indexed_todo, index_todo
+from core.cache import TieredCache
+from core.pagination import Page, apaginate_keyset, apaginate_offset, decode_cursor, paginate_keyset, paginate_offset
+
+from todo.data.models.todo import TodoList, Todo, TodoOutbox
+from todo.data.repositories.todo import (
+    TODO_COUNTER_FIELDS,
+    count_list_todos,
+    record_todo_changes,
+    todo_counter_deltas,
+    update_todo_lists
+)
+from todo.data.elasticsearch.search import todo as todo_search
+from todo.data.events import todo as todo_events
+from todo.interfaces.schema.todo import TodoListCreate, TodoListUpdate, TodoCreate, TodoUpdate, TodoListQueryParams, TodoQueryParams, TodoSearchQueryParams, TodoBatchCreate, TodoBatchUpdate
+
+logger = logging.getLogger(__name__)
+
+TODO_LIST_ORDERING = ("id",)
+TODO_LIST_FIELDS = ("id", "name", "todos_count", "overdue_count", "due_soon_count", "created_at", "updated_at")
+TODO_ORDERING = ("due_date", "id")
+TODO_FIELDS = ("id", "title", "description", "due_date", "list_id", "list__name", "completed_at", "created_at", "updated_at")
+TODO_EXPORT_FIELDS = ("id", "list_id", "title", "description", "due_date", "completed_at", "created_at", "updated_at")
+
+# Read cache for single lists, single todos and list pages. Entries depend on
+# these namespaces and are dropped when a write invalidates one of them.
+TODO_LISTS_NAMESPACE = "todo-lists"
+
+todo_cache = TieredCache(
+    "todo",
+    timeout=settings.TODO_CACHE_TIMEOUT,
+    local_maxsize=settings.TODO_CACHE_LOCAL_MAXSIZE,
+    local_ttl=settings.TODO_CACHE_LOCAL_TTL,
+)
+
+
+def _todo_list_namespace(todo_list_id: int) -> str:
+    return f"todo-list:{todo_list_id}"
+
+
+def _todo_namespace(todo_id: int) -> str:
+    return f"todo:{todo_id}"
+
+
+def _invalidate_on_commit(*namespaces: str) -> None:
+    # Bumping before commit would let a concurrent reader cache the old row
+    # under the new version.
+    transaction.on_commit(lambda: todo_cache.invalidate(*namespaces))
+
+
+def _bump_todo_lists(*todo_list_ids: int, added: Iterable[Todo] = (), removed: Iterable[Todo] = ()) -> None:
+    """
+    Move ``updated_at`` of lists whose todos changed, and their counters by
+    the ``added`` and ``removed`` todos; an updated todo is in both,
+    ``removed`` as it was before. ``updated_at`` validates the conditional
+    GETs of a list and its todos and shows on the list pages, so their
+    cache entries are dropped too. Call last in the transaction of the
+    write, the list rows stay locked until it commits.
+    """
+    update_todo_lists(todo_list_ids, todo_counter_deltas(added, removed), updated_at=timezone.now())
+    _invalidate_on_commit(TODO_LISTS_NAMESPACE, *map(_todo_list_namespace, todo_list_ids))
+
+
+def _publish_on_commit(event_type: str, todo_list_id: int, todo_ids: Iterable[int] = ()) -> None:
+    # subscribers react by reading the rows, which must be visible by then
+    todo_ids = list(todo_ids)
+    transaction.on_commit(lambda: todo_events.publish_todo_event(event_type, todo_list_id, todo_ids))
 
 
 def _update_model(model: Model, data: BaseModel) -> Model:
-    for k, v in data.dict().items():
+    # only fields sent by the client, so a partial update keeps the rest
+    for k, v in data.model_dump(exclude_unset=True).items():
         if hasattr(model, k):
             setattr(model, k, v)
     return model
@@ -16,16 +87,33 @@ def _update_model(model: Model, data: BaseModel) -> Model:
 
 def create_todo_list(todo_list_in: TodoListCreate) -> TodoList:
     todo_list = TodoList(name=todo_list_in.name)
-    todo_list.save()
+    with transaction.atomic():
+        todo_list.save()
+        _invalidate_on_commit(TODO_LISTS_NAMESPACE)
+        _publish_on_commit(todo_events.TODO_LIST_CREATED, todo_list.id)
     return todo_list
 
 
+def touch_todo_list(todo_list_id: int) -> None:
+    """
+    Mark a list as changed after its todos were written outside the domain
+    functions, e.g. by a bulk import.
+    """
+    with transaction.atomic():
+        _bump_todo_lists(todo_list_id)
+        _publish_on_commit(todo_events.TODO_LIST_UPDATED, todo_list_id)
+
+
 def update_todo_list(todo_list_in: TodoListUpdate) -> TodoList:
     todo_list = TodoList.objects.filter(id=todo_list_in.id).first()
     if not todo_list:
         raise ValueError("Todo list not found")
     _update_model(todo_list, todo_list_in)
-    todo_list.save()
+    with transaction.atomic():
+        # the counters read above may be stale, todo writes move them concurrently
+        todo_list.save(update_fields=["name", "updated_at"])
+        _invalidate_on_commit(_todo_list_namespace(todo_list.id), TODO_LISTS_NAMESPACE)
+        _publish_on_commit(todo_events.TODO_LIST_UPDATED, todo_list.id)
     return todo_list
 
 
@@ -33,62 +121,456 @@ def delete_todo_list(todo_list_id: int) -> None:
     todo_list = TodoList.objects.filter(id=todo_list_id).first()
     if not todo_list:
         raise ValueError("Todo list not found")
-    todo_list.delete()
+    with transaction.atomic():
+        # the cascade removes the todos, so queue their index deletions first
+        todo_ids = todo_list.todos.values_list("id", flat=True).iterator(chunk_size=2000)
+        record_todo_changes(todo_ids, TodoOutbox.OPERATION_DELETE)
+        todo_list.delete()
+        # cached todos of the list depend on the list namespace too
+        _invalidate_on_commit(_todo_list_namespace(todo_list_id), TODO_LISTS_NAMESPACE)
+        # one event for the list, its todos go with it
+        _publish_on_commit(todo_events.TODO_LIST_DELETED, todo_list_id)
     return None
 
 
-def list_todo_lists() -> List[TodoList]:
-    return TodoList.objects.all()
+def list_todo_lists(query_params: Optional[TodoListQueryParams] = None, as_values: bool = False) -> Page[TodoList]:
+    """
+    With ``as_values`` the page holds ``TODO_LIST_FIELDS`` dicts instead of
+    model instances.
+    """
+    query_params = query_params or TodoListQueryParams()
+    return todo_cache.get_or_set(
+        f"todo-lists:{as_values}:{query_params.model_dump_json()}",
+        [TODO_LISTS_NAMESPACE],
+        lambda: _list_todo_lists(query_params, as_values),
+    )
+
+
+async def alist_todo_lists(query_params: Optional[TodoListQueryParams] = None, as_values: bool = False) -> Page[TodoList]:
+    """
+    Async variant of ``list_todo_lists``, sharing its cache entries.
+    """
+    query_params = query_params or TodoListQueryParams()
+    return await todo_cache.aget_or_set(
+        f"todo-lists:{as_values}:{query_params.model_dump_json()}",
+        [TODO_LISTS_NAMESPACE],
+        lambda: _alist_todo_lists(query_params, as_values),
+    )
+
+
+def _list_todo_lists(query_params: TodoListQueryParams, as_values: bool) -> Page[TodoList]:
+    todo_lists = _todo_lists_queryset(query_params, as_values)
+    if query_params.cursor:
+        return paginate_keyset(todo_lists, query_params.cursor, query_params.page_size, TODO_LIST_ORDERING)
+    return paginate_offset(todo_lists, query_params.page, query_params.page_size, TODO_LIST_ORDERING)
+
+
+async def _alist_todo_lists(query_params: TodoListQueryParams, as_values: bool) -> Page[TodoList]:
+    todo_lists = _todo_lists_queryset(query_params, as_values)
+    if query_params.cursor:
+        return await apaginate_keyset(todo_lists, query_params.cursor, query_params.page_size, TODO_LIST_ORDERING)
+    return await apaginate_offset(todo_lists, query_params.page, query_params.page_size, TODO_LIST_ORDERING)
+
+
+def _todo_lists_queryset(query_params: TodoListQueryParams, as_values: bool) -> QuerySet:
+    # the counters are columns of the list, no join
+    todo_lists = TodoList.objects.all()
+    if as_values:
+        todo_lists = todo_lists.values(*TODO_LIST_FIELDS)
+    if query_params.name:
+        todo_lists = todo_lists.filter(name__icontains=query_params.name)
+    return todo_lists
+
+
+def get_todo_lists_version() -> Tuple[Optional[datetime], int]:
+    """
+    Latest ``updated_at`` and number of lists, from one aggregate: the
+    validators of the list pages. Any write to a list or its todos moves one
+    of them. Cached with the pages.
+    """
+    return todo_cache.get_or_set("todo-lists-version", [TODO_LISTS_NAMESPACE], _todo_lists_version)
+
+
+async def aget_todo_lists_version() -> Tuple[Optional[datetime], int]:
+    """
+    Async variant of ``get_todo_lists_version``, sharing its cache entry.
+    """
+    return await todo_cache.aget_or_set("todo-lists-version", [TODO_LISTS_NAMESPACE], _atodo_lists_version)
+
+
+def _todo_lists_version() -> Tuple[Optional[datetime], int]:
+    version = TodoList.objects.aggregate(last_modified=Max("updated_at"), count=Count("id"))
+    return version["last_modified"], version["count"]
+
+
+async def _atodo_lists_version() -> Tuple[Optional[datetime], int]:
+    version = await TodoList.objects.aaggregate(last_modified=Max("updated_at"), count=Count("id"))
+    return version["last_modified"], version["count"]
 
 
 def get_todo_list(todo_list_id: int) -> TodoList:
-    todo_list = TodoList.objects.filter(id=todo_list_id).first()
+    todo_list = todo_cache.get_or_set(
+        f"todo-list:{todo_list_id}",
+        [_todo_list_namespace(todo_list_id)],
+        lambda: TodoList.objects.filter(id=todo_list_id).first(),
+    )
     if not todo_list:
         raise ValueError("Todo list not found")
     return todo_list
 
 
-def get_todo_list_todos(todo_list_id: int) -> List[Todo]:
-    todo_list = TodoList.objects.filter(id=todo_list_id).first()
+async def aget_todo_list(todo_list_id: int) -> TodoList:
+    todo_list = await todo_cache.aget_or_set(
+        f"todo-list:{todo_list_id}",
+        [_todo_list_namespace(todo_list_id)],
+        lambda: TodoList.objects.filter(id=todo_list_id).afirst(),
+    )
     if not todo_list:
         raise ValueError("Todo list not found")
-    return todo_list.todos
+    return todo_list
+
+
+def get_todo_list_todos(todo_list_id: int, query_params: Optional[TodoQueryParams] = None, as_values: bool = False) -> Page[Todo]:
+    """
+    With ``as_values`` the page holds ``TODO_FIELDS`` dicts instead of model
+    instances.
+    """
+    if not TodoList.objects.filter(id=todo_list_id).exists():
+        raise ValueError("Todo list not found")
+    query_params = query_params or TodoQueryParams()
+    todos = _todo_list_todos_queryset(todo_list_id, query_params, as_values)
+    if query_params.cursor:
+        return paginate_keyset(todos, query_params.cursor, query_params.page_size, TODO_ORDERING)
+    return paginate_offset(todos, query_params.page, query_params.page_size, TODO_ORDERING)
+
+
+async def aget_todo_list_todos(todo_list_id: int, query_params: Optional[TodoQueryParams] = None, as_values: bool = False) -> Page[Todo]:
+    """
+    Async variant of ``get_todo_list_todos``.
+    """
+    if not await TodoList.objects.filter(id=todo_list_id).aexists():
+        raise ValueError("Todo list not found")
+    query_params = query_params or TodoQueryParams()
+    todos = _todo_list_todos_queryset(todo_list_id, query_params, as_values)
+    if query_params.cursor:
+        return await apaginate_keyset(todos, query_params.cursor, query_params.page_size, TODO_ORDERING)
+    return await apaginate_offset(todos, query_params.page, query_params.page_size, TODO_ORDERING)
+
+
+def _todo_list_todos_queryset(todo_list_id: int, query_params: TodoQueryParams, as_values: bool) -> QuerySet:
+    todos = Todo.objects.filter(list_id=todo_list_id)
+    if as_values:
+        todos = todos.values(*TODO_FIELDS)
+    else:
+        todos = todos.select_related("list").only(*TODO_FIELDS)
+    if query_params.title:
+        todos = todos.filter(title__icontains=query_params.title)
+    if query_params.description:
+        todos = todos.filter(description__icontains=query_params.description)
+    if query_params.due_date:
+        todos = todos.filter(due_date=query_params.due_date)
+    return todos
+
+
+def export_todos(todo_list_id: Optional[int] = None, chunk_size: Optional[int] = None) -> Iterator[Tuple]:
+    """
+    ``TODO_EXPORT_FIELDS`` tuples of the todos of one list, or of all lists
+    by list, in ``TODO_ORDERING``. Rows are fetched ``chunk_size`` at a time
+    through a server-side cursor on PostgreSQL, so memory stays flat for any
+    number of todos. The query runs on the first ``next()``; a missing list
+    raises ValueError right away.
+    """
+    todos = Todo.objects.all()
+    if todo_list_id is not None:
+        if not TodoList.objects.filter(id=todo_list_id).exists():
+            raise ValueError("Todo list not found")
+        todos = todos.filter(list_id=todo_list_id).order_by(*TODO_ORDERING)
+    else:
+        # todo_list_due_date_id_idx serves both orderings
+        todos = todos.order_by("list_id", *TODO_ORDERING)
+    return todos.values_list(*TODO_EXPORT_FIELDS).iterator(chunk_size=chunk_size or settings.TODO_EXPORT_CHUNK_SIZE)
+
+
+def search_todos(query_params: TodoSearchQueryParams) -> Page[Dict[str, Any]]:
+    """
+    Search through Elasticsearch, falling back to a database scan when the
+    cluster cannot be reached. Both return the same row shape; their cursors
+    are not interchangeable.
+    """
+    if query_params.cursor and len(decode_cursor(query_params.cursor)) == len(TODO_ORDERING):
+        # a paging session that started on the fallback stays there
+        return _search_todos_in_database(query_params)
+    try:
+        return todo_search.search_todos(
+            query=query_params.q,
+            list_id=query_params.list_id,
+            due_date_from=query_params.due_date_from,
+            due_date_to=query_params.due_date_to,
+            page_size=query_params.page_size,
+            cursor=query_params.cursor,
+        )
+    except (TransportError, ApiError) as e:
+        logger.warning(f"Todo search unavailable, falling back to the database: {e}")
+    return _search_todos_in_database(query_params)
+
+
+def _search_todos_in_database(query_params: TodoSearchQueryParams) -> Page[Dict[str, Any]]:
+    todos = Todo.objects.all()
+    if query_params.q:
+        todos = todos.filter(Q(title__icontains=query_params.q) | Q(description__icontains=query_params.q))
+    if query_params.list_id is not None:
+        todos = todos.filter(list_id=query_params.list_id)
+    if query_params.due_date_from:
+        todos = todos.filter(due_date__gte=query_params.due_date_from)
+    if query_params.due_date_to:
+        todos = todos.filter(due_date__lte=query_params.due_date_to)
+    todos = todos.values("id", "title", "description", "due_date", "list_id")
+    page = paginate_keyset(todos, query_params.cursor, query_params.page_size, TODO_ORDERING)
+    for row in page.items:
+        row["due_date"] = row["due_date"].isoformat()
+    return page
 
 
 def get_todo(todo_list_id: int, todo_id: int) -> Todo:
-    todo = Todo.objects.filter(id=todo_id, list_id=todo_list_id).first()
+    todo = todo_cache.get_or_set(
+        f"todo:{todo_list_id}:{todo_id}",
+        [_todo_list_namespace(todo_list_id), _todo_namespace(todo_id)],
+        lambda: _get_todo(todo_list_id, todo_id),
+    )
     if not todo:
         raise ValueError("Todo not found")
     return todo
 
 
-def create_todo(todo_in: TodoCreate) -> Todo:
-    todo_list = get_todo_list(todo_in.list_id)
-    todo = Todo(title=todo_in.title, description=todo_in.description, due_date=todo_in.due_date, list=todo_list)
-    todo.save()
+def _get_todo(todo_list_id: int, todo_id: int) -> Optional[Todo]:
+    # Writes read through here so they never start from a cached copy
+    return Todo.objects.select_related("list").filter(id=todo_id, list_id=todo_list_id).first()
 
-    # index the todo in elasticsearch instead of adding it to Todo.save()
-    # index_todo(todo)
+
+async def aget_todo(todo_list_id: int, todo_id: int) -> Todo:
+    todo = await todo_cache.aget_or_set(
+        f"todo:{todo_list_id}:{todo_id}",
+        [_todo_list_namespace(todo_list_id), _todo_namespace(todo_id)],
+        lambda: Todo.objects.select_related("list").filter(id=todo_id, list_id=todo_list_id).afirst(),
+    )
+    if not todo:
+        raise ValueError("Todo not found")
+    return todo
+
+
+def create_todo(todo_in: TodoCreate) -> Todo:
+    todo_list = TodoList.objects.filter(id=todo_in.list_id).first()
+    if not todo_list:
+        raise ValueError("Todo list not found")
+    todo = Todo(
+        title=todo_in.title,
+        description=todo_in.description,
+        due_date=todo_in.due_date,
+        completed_at=todo_in.completed_at,
+        list=todo_list,
+    )
+    with transaction.atomic():
+        todo.save()
+        # the search index is updated from the outbox instead of in the request
+        record_todo_changes([todo.id], TodoOutbox.OPERATION_INDEX)
+        _bump_todo_lists(todo_list.id, added=[todo])
+        _publish_on_commit(todo_events.TODO_CREATED, todo_list.id, [todo.id])
 
     return todo
 
 
 def update_todo(todo_id: int, todo_in: TodoUpdate) -> Todo:
-    todo = get_todo(todo_in.list_id, todo_id)
+    todo = _get_todo(todo_in.list_id, todo_id)
+    if not todo:
+        raise ValueError("Todo not found")
+    previous = copy.copy(todo)
     _update_model(todo, todo_in)
-    todo.save()
-
-    # index the todo in elasticsearch instead of adding it to Todo.save()
-    # update_indexed_todo(todo)
+    if "due_date" in todo_in.model_fields_set:
+        # a new due date gets its own reminder
+        todo.reminded_at = None
+    with transaction.atomic():
+        todo.save()
+        record_todo_changes([todo.id], TodoOutbox.OPERATION_INDEX)
+        _invalidate_on_commit(_todo_namespace(todo.id))
+        _bump_todo_lists(todo.list_id, added=[todo], removed=[previous])
+        _publish_on_commit(todo_events.TODO_UPDATED, todo.list_id, [todo.id])
 
     return todo
 
 
 def delete_todo(todo_list_id: int, todo_id: int) -> None:
-    todo = get_todo(todo_list_id, todo_id)
-    todo.delete()
-
-    # delete the todo from elasticsearch instead of adding it to Todo.delete()
-    # delete_indexed_todo(todo_id)
+    todo = _get_todo(todo_list_id, todo_id)
+    if not todo:
+        raise ValueError("Todo not found")
+    with transaction.atomic():
+        todo.delete()
+        record_todo_changes([todo_id], TodoOutbox.OPERATION_DELETE)
+        _invalidate_on_commit(_todo_namespace(todo_id))
+        _bump_todo_lists(todo_list_id, removed=[todo])
+        _publish_on_commit(todo_events.TODO_DELETED, todo_list_id, [todo_id])
 
     return None
+
+
+def create_todos(todo_list_id: int, todos_in: List[TodoBatchCreate]) -> List[Todo]:
+    """
+    Create todos in one list with a single INSERT per batch. Returns them in
+    input order with their ids set.
+    """
+    todo_list = TodoList.objects.filter(id=todo_list_id).first()
+    if not todo_list:
+        raise ValueError("Todo list not found")
+    todos = [
+        Todo(
+            title=todo_in.title,
+            description=todo_in.description,
+            due_date=todo_in.due_date,
+            completed_at=todo_in.completed_at,
+            list=todo_list,
+        )
+        for todo_in in todos_in
+    ]
+    with transaction.atomic():
+        Todo.objects.bulk_create(todos)
+        record_todo_changes([todo.id for todo in todos], TodoOutbox.OPERATION_INDEX)
+        _bump_todo_lists(todo_list_id, added=todos)
+        _publish_on_commit(todo_events.TODO_CREATED, todo_list_id, [todo.id for todo in todos])
+
+    return todos
+
+
+def update_todos(todo_list_id: int, todos_in: List[TodoBatchUpdate]) -> Tuple[List[Todo], Set[int]]:
+    """
+    Apply partial updates to todos of one list with a single UPDATE per
+    batch. Returns the updated todos and the ids not found in the list.
+    """
+    if not TodoList.objects.filter(id=todo_list_id).exists():
+        raise ValueError("Todo list not found")
+    with transaction.atomic():
+        todos = {
+            todo.id: todo
+            for todo in Todo.objects.select_related("list").select_for_update(of=("self",)).filter(
+                list_id=todo_list_id, id__in={todo_in.id for todo_in in todos_in}
+            )
+        }
+        fields = {"updated_at"}
+        now = timezone.now()
+        previous = []
+        for todo_in in todos_in:
+            todo = todos.get(todo_in.id)
+            if todo is None:
+                continue
+            previous.append(copy.copy(todo))
+            # todos stay in the list of the URL
+            changes = todo_in.model_dump(exclude_unset=True, exclude={"id", "list_id"})
+            for name, value in changes.items():
+                setattr(todo, name, value)
+            fields.update(changes)
+            if "due_date" in changes:
+                todo.reminded_at = None
+                fields.add("reminded_at")
+            # bulk_update skips auto_now
+            todo.updated_at = now
+
+        if todos:
+            Todo.objects.bulk_update(todos.values(), sorted(fields))
+            record_todo_changes(todos, TodoOutbox.OPERATION_INDEX)
+            # cached todos of the list depend on the list namespace, the bump covers them all
+            _bump_todo_lists(todo_list_id, added=todos.values(), removed=previous)
+            _publish_on_commit(todo_events.TODO_UPDATED, todo_list_id, todos)
+
+    missing_ids = {todo_in.id for todo_in in todos_in} - set(todos)
+    return list(todos.values()), missing_ids
+
+
+def delete_todos(todo_list_id: int, todo_ids: Iterable[int]) -> Set[int]:
+    """
+    Delete todos of one list with a single DELETE. Returns the ids that
+    were deleted; ids not in the list are ignored.
+    """
+    if not TodoList.objects.filter(id=todo_list_id).exists():
+        raise ValueError("Todo list not found")
+    with transaction.atomic():
+        todos = list(
+            Todo.objects.filter(list_id=todo_list_id, id__in=set(todo_ids))
+            .select_for_update()
+            .only("id", "list_id", "due_date", "completed_at")
+        )
+        deleted_ids = {todo.id for todo in todos}
+        if deleted_ids:
+            Todo.objects.filter(id__in=deleted_ids).delete()
+            record_todo_changes(deleted_ids, TodoOutbox.OPERATION_DELETE)
+            _bump_todo_lists(todo_list_id, removed=todos)
+            _publish_on_commit(todo_events.TODO_DELETED, todo_list_id, deleted_ids)
+
+    return deleted_ids
+
+
+def purge_completed_todos(completed_before: datetime, after_id: int, limit: int) -> List[int]:
+    """
+    Delete up to ``limit`` todos completed before ``completed_before`` with
+    ids above ``after_id``, lowest ids first, in one short transaction.
+    Returns the deleted ids in ascending order. Removing them from the
+    search index is left to the caller, which can do it in bulk.
+    """
+    with transaction.atomic():
+        todos = list(
+            Todo.objects.filter(completed_at__lt=completed_before, id__gt=after_id)
+            .order_by("id")
+            .select_for_update()
+            .only("id", "list_id", "due_date", "completed_at")[:limit]
+        )
+        if not todos:
+            return []
+        deleted_ids = [todo.id for todo in todos]
+        Todo.objects.filter(id__in=deleted_ids).delete()
+
+        todo_ids_by_list: Dict[int, List[int]] = {}
+        for todo in todos:
+            todo_ids_by_list.setdefault(todo.list_id, []).append(todo.id)
+        _bump_todo_lists(*sorted(todo_ids_by_list), removed=todos)
+        for todo_list_id, todo_ids in todo_ids_by_list.items():
+            _publish_on_commit(todo_events.TODO_DELETED, todo_list_id, todo_ids)
+
+    return deleted_ids
+
+
+def reconcile_todo_list_counters(after_id: int, limit: int) -> Tuple[List[int], List[int]]:
+    """
+    Recount the counters of up to ``limit`` lists with ids above
+    ``after_id``, lowest ids first, and correct the ones that drifted, in
+    one short transaction. Returns the ids checked, in ascending order, and
+    the ids corrected.
+
+    The lists are locked before their todos are counted. A write that
+    committed before is counted; one still open has not moved the counters
+    yet and does so after the recount.
+    """
+    today = timezone.localdate()
+    with transaction.atomic():
+        todo_lists = list(
+            TodoList.objects.filter(id__gt=after_id)
+            .order_by("id")
+            .select_for_update()
+            .only("id", *TODO_COUNTER_FIELDS)[:limit]
+        )
+        if not todo_lists:
+            return [], []
+        counts = count_list_todos([todo_list.id for todo_list in todo_lists], today)
+
+        corrected = []
+        for todo_list in todo_lists:
+            expected = counts.get(todo_list.id, (0, 0, 0))
+            if tuple(getattr(todo_list, field) for field in TODO_COUNTER_FIELDS) != expected:
+                for field, count in zip(TODO_COUNTER_FIELDS, expected):
+                    setattr(todo_list, field, count)
+                corrected.append(todo_list)
+        if corrected:
+            # the counters are part of the list, so is its version
+            now = timezone.now()
+            for todo_list in corrected:
+                todo_list.updated_at = now
+            TodoList.objects.bulk_update(corrected, [*TODO_COUNTER_FIELDS, "updated_at"])
+            _invalidate_on_commit(TODO_LISTS_NAMESPACE, *(_todo_list_namespace(todo_list.id) for todo_list in corrected))
+
+    return [todo_list.id for todo_list in todo_lists], [todo_list.id for todo_list in corrected]
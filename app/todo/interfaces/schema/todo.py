@@ -1,24 +1,53 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional
-from datetime import datetime
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Literal, Optional
+from datetime import date, datetime
 
-class TodoListQueryParams(BaseModel):
-    page: Optional[int] = 1
-    page_size: Optional[int] = 10
+from core.pagination import decode_cursor
+
+MAX_PAGE_SIZE = 100
+MAX_BATCH_SIZE = 1000
+
+class CursorQueryParams(BaseModel):
+    page_size: Optional[int] = Field(default=10, ge=1, le=MAX_PAGE_SIZE)
+    # cursor returned as next_cursor by the previous page
+    cursor: Optional[str] = None
+
+    @field_validator("cursor")
+    @classmethod
+    def validate_cursor(cls, cursor: Optional[str]) -> Optional[str]:
+        if cursor:
+            decode_cursor(cursor)
+        return cursor
+
+class PaginationQueryParams(CursorQueryParams):
+    # ignored when a cursor is given
+    page: Optional[int] = Field(default=1, ge=1)
+
+class TodoListQueryParams(PaginationQueryParams):
     name: Optional[str] = None
 
-class TodoQueryParams(BaseModel):
-    page: Optional[int] = 1
-    page_size: Optional[int] = 10
+class TodoQueryParams(PaginationQueryParams):
     title: Optional[str] = None
     description: Optional[str] = None
-    due_date: Optional[str] = None
+    due_date: Optional[date] = None
+
+class TodoSearchQueryParams(CursorQueryParams):
+    q: Optional[str] = None
+    list_id: Optional[int] = None
+    due_date_from: Optional[date] = None
+    due_date_to: Optional[date] = None
+
+class TodoExportQueryParams(BaseModel):
+    format: Literal["csv", "ndjson"] = "csv"
+    compression: Optional[Literal["gzip"]] = None
 
 class TodoBase(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
     due_date: Optional[str] = None
     list_id: Optional[int] = None
+    # set when the todo is done, null to reopen it
+    completed_at: Optional[datetime] = None
 
 
 class TodoListBase(BaseModel):
@@ -41,7 +70,30 @@ class TodoListCreate(TodoListBase):
 
 
 class TodoListUpdate(TodoListBase):
-    pass
+    # taken from the URL by the view
+    id: Optional[int] = None
+
+
+# Batch items are validated up front, column limits included: a single bad
+# row would otherwise abort the transaction for the whole batch.
+
+class TodoBatchCreate(TodoCreate):
+    title: str = Field(max_length=200)
+    due_date: date = Field(default_factory=date.today)
+
+
+class TodoBatchUpdate(TodoUpdate):
+    id: int
+    title: Optional[str] = Field(default=None, max_length=200)
+    due_date: Optional[date] = None
+
+    @field_validator("title", "description", "due_date")
+    @classmethod
+    def validate_not_null(cls, value):
+        # only runs for fields present in the payload
+        if value is None:
+            raise ValueError("may not be null")
+        return value
 
 class TodoListResponse(TodoListBase):
     id: int
@@ -1,8 +1,13 @@
+from datetime import date, datetime, tzinfo
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from django.utils import timezone
 from rest_framework import serializers
+from core.instrumentation import InstrumentedListSerializer, InstrumentedSerializerMixin
+from core.metrics import track
 from todo.data.models.todo import Todo, TodoList
 
 
-class TodoListSerializer(serializers.ModelSerializer):
+class TodoListSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for TodoList model
     """
@@ -10,24 +15,21 @@ class TodoListSerializer(serializers.ModelSerializer):
         model = TodoList
         fields = ['id', 'name', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
+        list_serializer_class = InstrumentedListSerializer
 
 
-class TodoListDetailSerializer(serializers.ModelSerializer):
+class TodoListDetailSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     """
-    Detailed serializer for TodoList with todos count
+    Detailed serializer for TodoList with its todo counters
     """
-    todos_count = serializers.SerializerMethodField()
-    
     class Meta:
         model = TodoList
-        fields = ['id', 'name', 'todos_count', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at']
-    
-    def get_todos_count(self, obj):
-        return obj.todos.count()
+        fields = ['id', 'name', 'todos_count', 'overdue_count', 'due_soon_count', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'todos_count', 'overdue_count', 'due_soon_count', 'created_at', 'updated_at']
+        list_serializer_class = InstrumentedListSerializer
 
 
-class TodoSerializer(serializers.ModelSerializer):
+class TodoSerializer(InstrumentedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for Todo model
     """
@@ -35,8 +37,82 @@ class TodoSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Todo
-        fields = ['id', 'title', 'description', 'due_date', 'list', 'list_name', 'created_at', 'updated_at']
+        fields = ['id', 'title', 'description', 'due_date', 'list', 'list_name', 'completed_at', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
+        list_serializer_class = InstrumentedListSerializer
+
+
+# Fast path for hot read endpoints: format ``.values()`` rows exactly like the
+# serializers above without building model instances or DRF fields.
+
+
+def _datetime(value: Optional[datetime], tz: tzinfo) -> Optional[str]:
+    # Same output as DRF's DateTimeField with the ISO 8601 default format
+    if not value:
+        return None
+    value = value.astimezone(tz).isoformat()
+    if value.endswith("+00:00"):
+        value = value[:-6] + "Z"
+    return value
+
 
+def _date(value: Optional[date]) -> Optional[str]:
+    if not value:
+        return None
+    return value.isoformat()
 
- 
\ No newline at end of file
+
+@track("serialization")
+def serialize_todo_list_rows(rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # looked up once per page, it is relatively expensive
+    tz = timezone.get_current_timezone()
+    return [
+        {
+            "id": row["id"],
+            "name": row["name"],
+            "todos_count": row["todos_count"],
+            "overdue_count": row["overdue_count"],
+            "due_soon_count": row["due_soon_count"],
+            "created_at": _datetime(row["created_at"], tz),
+            "updated_at": _datetime(row["updated_at"], tz),
+        }
+        for row in rows
+    ]
+
+
+@track("serialization")
+def serialize_todo_rows(rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    tz = timezone.get_current_timezone()
+    return [
+        {
+            "id": row["id"],
+            "title": row["title"],
+            "description": row["description"],
+            "due_date": _date(row["due_date"]),
+            "list": row["list_id"],
+            "list_name": row["list__name"],
+            "completed_at": _datetime(row["completed_at"], tz),
+            "created_at": _datetime(row["created_at"], tz),
+            "updated_at": _datetime(row["updated_at"], tz),
+        }
+        for row in rows
+    ]
+
+
+def serialize_todo_export_rows(rows: Iterable[Sequence[Any]]) -> Iterator[Tuple]:
+    """
+    Format ``TODO_EXPORT_FIELDS`` tuples for an export: dates and times as
+    the API renders them, everything else as is.
+    """
+    tz = timezone.get_current_timezone()
+    for todo_id, list_id, title, description, due_date, completed_at, created_at, updated_at in rows:
+        yield (
+            todo_id,
+            list_id,
+            title,
+            description,
+            _date(due_date),
+            _datetime(completed_at, tz),
+            _datetime(created_at, tz),
+            _datetime(updated_at, tz),
+        )
@@ -1,52 +1,179 @@
 import logging
-from celery import shared_task
-from todo.application.use_cases.upload_todo_list import UploadTodoListUseCase
+import os
+import uuid
+from typing import Any, Dict, List, Optional
+from celery import chord, shared_task
+from core.task_telemetry import record_rows
+from todo.application.use_cases.import_todo_file import (
+    PlanTodoImportUseCase,
+    ImportTodoChunkUseCase,
+    FinalizeTodoImportUseCase,
+    mark_todo_import_failed
+)
+from todo.application.use_cases.sync_todo_index import SyncTodoIndexUseCase
+from todo.application.use_cases.cleanup_old_todos import CleanupOldTodosUseCase
+from todo.application.use_cases.send_todo_reminders import SendTodoRemindersUseCase
+from todo.application.use_cases.reconcile_todo_counters import ReconcileTodoCountersUseCase
 
 logger = logging.getLogger(__name__)
 
 
-@shared_task
-def process_todo_upload(file_path: str, *args, **kwargs) -> None:
+@shared_task(bind=True)
+def process_todo_upload(
+    self,
+    file_path: str,
+    todo_list_name: Optional[str] = None,
+    *args,
+    todo_list_id: Optional[int] = None,
+    upsert: bool = False,
+    **kwargs
+) -> Dict[str, Any]:
     """
-    Process a todo list upload asynchronously.
+    Import a todo CSV file into a new list, fanning the rows out to
+    ``import_todo_chunk`` tasks. Progress is reported under this task's id,
+    which is the import id of the ledger for submitted uploads.
     
     Args:
         file_path: Path to the uploaded file
+        todo_list_name: Name of the list to create, the file name by default
+        todo_list_id: Import into this existing list instead
+        upsert: Update todos with the same title and due date instead of adding rows
     """
+    import_id = self.request.id or uuid.uuid4().hex
+    todo_list_name = todo_list_name or os.path.splitext(os.path.basename(file_path))[0]
     try:
         logger.info(f"Starting todo upload processing for file: {file_path}")
-        UploadTodoListUseCase().execute(file_path=file_path)
-        logger.info(f"Successfully processed todo upload for file: {file_path}")
+        plan = PlanTodoImportUseCase(import_id, todo_list_name, file_path, todo_list_id=todo_list_id).execute()
+        if plan is None:
+            return {"import_id": import_id, "skipped": True}
+        finalize = finalize_todo_import.s(import_id, plan.todo_list_id)
+        if not plan.ranges:
+            finalize.delay([])
+        else:
+            chord(
+                import_todo_chunk.s(import_id, plan.todo_list_id, file_path, start, end, plan.fieldnames, upsert)
+                for start, end in plan.ranges
+            )(finalize.on_error(fail_todo_import.s(import_id=import_id)))
+        logger.info(f"Dispatched {len(plan.ranges)} import chunks for file: {file_path}")
+        return {"import_id": import_id, "todo_list_id": plan.todo_list_id, "chunks": len(plan.ranges)}
     except Exception as e:
         logger.error(f"Error processing todo upload for file {file_path}: {str(e)}")
+        mark_todo_import_failed(import_id, error=str(e))
         raise
 
 
 @shared_task
+def import_todo_chunk(
+    import_id: str,
+    todo_list_id: int,
+    file_path: str,
+    start: int,
+    end: Optional[int],
+    fieldnames: List[str],
+    upsert: bool = False,
+) -> Dict[str, int]:
+    """
+    Import the rows in bytes ``start`` to ``end`` of an upload, or the whole
+    file when ``end`` is None.
+    """
+    try:
+        logger.info(f"Starting todo import chunk {start}-{end} of file: {file_path}")
+        result = ImportTodoChunkUseCase(
+            import_id, todo_list_id, file_path, start, end, fieldnames, upsert=upsert
+        ).execute()
+        record_rows(result.rows_imported + result.rows_skipped)
+        logger.info(f"Successfully imported chunk {start}-{end}: {result.rows_imported} rows")
+        return {"rows_imported": result.rows_imported, "rows_skipped": result.rows_skipped}
+    except Exception as e:
+        logger.error(f"Error importing chunk {start}-{end} of file {file_path}: {str(e)}")
+        raise
+
+
+# acks_late: only for tasks that can safely run twice, a redelivered message
+# reruns the task from the start
+
+@shared_task(acks_late=True)
+def finalize_todo_import(chunk_results: List[Dict[str, int]], import_id: str, todo_list_id: int) -> Dict[str, int]:
+    """
+    Complete an upload once all of its chunks are imported.
+    """
+    try:
+        logger.info(f"Finalizing todo import {import_id}")
+        result = FinalizeTodoImportUseCase(import_id, todo_list_id, chunk_results).execute()
+        logger.info(f"Successfully finalized todo import {import_id}")
+        return {"rows_imported": result.rows_imported, "rows_skipped": result.rows_skipped}
+    except Exception as e:
+        logger.error(f"Error finalizing todo import {import_id}: {str(e)}")
+        raise
+
+
+@shared_task(acks_late=True)
+def fail_todo_import(*args, import_id: str, **kwargs) -> None:
+    """
+    Error callback of the import chord: mark the upload as failed.
+    """
+    logger.error(f"Todo import {import_id} failed")
+    mark_todo_import_failed(import_id, error="An import chunk failed")
+
+
+@shared_task(acks_late=True)
 def cleanup_old_todos(*args, **kwargs) -> None:
     """
-    Clean up old completed todos asynchronously.
+    Delete todos completed more than TODO_CLEANUP_RETENTION_DAYS ago, a
+    bounded number of batches per run.
     """
     try:
         logger.info("Starting cleanup of old completed todos")
-        # TODO: Implement cleanup use case
-        # CleanupOldTodosUseCase().execute()
+        result = CleanupOldTodosUseCase().execute()
+        record_rows(result.todos_deleted)
         logger.info("Successfully cleaned up old completed todos")
     except Exception as e:
         logger.error(f"Error cleaning up old todos: {str(e)}")
         raise
 
 
-@shared_task
+@shared_task(acks_late=True)
 def send_todo_reminders(*args, **kwargs) -> None:
     """
-    Send reminders for overdue todos asynchronously.
+    Send one reminder per list for open todos that became overdue, through
+    TODO_REMINDER_BACKEND.
     """
     try:
         logger.info("Starting todo reminder processing")
-        # TODO: Implement reminder use case
-        # SendTodoRemindersUseCase().execute()
+        result = SendTodoRemindersUseCase().execute()
+        record_rows(result.todos_scanned)
         logger.info("Successfully sent todo reminders")
     except Exception as e:
         logger.error(f"Error sending todo reminders: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+
+@shared_task(acks_late=True)
+def reconcile_todo_counters(*args, **kwargs) -> None:
+    """
+    Recount the todo counters of every list and correct drifted ones,
+    overdue and due soon counts rolling over with the date included.
+    """
+    try:
+        logger.info("Starting todo counter reconciliation")
+        result = ReconcileTodoCountersUseCase().execute()
+        record_rows(result.lists_checked)
+        logger.info("Successfully reconciled todo counters")
+    except Exception as e:
+        logger.error(f"Error reconciling todo counters: {str(e)}")
+        raise
+
+
+@shared_task(acks_late=True)
+def sync_todo_index(*args, **kwargs) -> None:
+    """
+    Apply pending todo changes from the outbox to the search index.
+    """
+    try:
+        logger.info("Starting todo index sync")
+        result = SyncTodoIndexUseCase().execute()
+        record_rows(result.events_processed)
+        logger.info("Successfully synced todo index")
+    except Exception as e:
+        logger.error(f"Error syncing todo index: {str(e)}")
+        raise
@@ -0,0 +1,110 @@
+import json
+import re
+from typing import AsyncIterator, List, Optional
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpRequest, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework import status
+
+from core.events import Event
+from todo.data.events.todo import todo_events
+from todo.domain.todo import aget_todo_list
+
+EVENT_ID_PATTERN = re.compile(r"^\d+-\d+$")
+# Client reconnect delay, in milliseconds
+RETRY_MS = 3000
+
+
+def _not_streamable(request: HttpRequest) -> Optional[JsonResponse]:
+    # Under WSGI Django consumes an async streaming body in full before
+    # sending any of it, which for an endless stream means never, and the
+    # worker thread is lost with it.
+    if isinstance(request, ASGIRequest):
+        return None
+    return JsonResponse(
+        {"error": "Event streams need an ASGI server (APP_SERVER=asgi)"},
+        status=status.HTTP_501_NOT_IMPLEMENTED,
+    )
+
+
+def _last_event_id(request: HttpRequest) -> Optional[str]:
+    # EventSource sends the header on reconnect, the parameter is for the first connection
+    event_id = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+    if event_id is not None and not EVENT_ID_PATTERN.match(event_id):
+        raise ValueError("Invalid event id")
+    return event_id
+
+
+def _format_events(events: List[Event]) -> str:
+    return "".join(
+        f"id: {event.id}\nevent: {event.type}\ndata: {json.dumps(event.data, separators=(',', ':'))}\n\n"
+        for event in events
+    )
+
+
+async def _event_frames(last_event_id: Optional[str], todo_list_id: Optional[int] = None) -> AsyncIterator[str]:
+    yield f"retry: {RETRY_MS}\n\n"
+    async for batch in todo_events.listen(
+        last_event_id,
+        batch_size=settings.TODO_EVENTS_BATCH_SIZE,
+        batch_interval=settings.TODO_EVENTS_BATCH_INTERVAL,
+        heartbeat=settings.TODO_EVENTS_HEARTBEAT,
+    ):
+        if not batch:
+            # comment line, keeps proxies from closing an idle connection
+            yield ": keepalive\n\n"
+            continue
+        events = batch
+        if todo_list_id is not None:
+            events = [event for event in batch if event.data.get("list_id") in (todo_list_id, None)]
+        if events:
+            # one write per batch rather than per event
+            yield _format_events(events)
+        else:
+            # An id without data dispatches nothing but moves the client's
+            # resume point past events of other lists.
+            yield f"id: {batch[-1].id}\n\n"
+
+
+def _event_stream_response(frames: AsyncIterator[str]) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(frames, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # nginx would otherwise buffer the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@require_GET
+async def todo_events_stream(request: HttpRequest):
+    """
+    Server-sent events for changes to every list and todo
+    """
+    not_streamable = _not_streamable(request)
+    if not_streamable:
+        return not_streamable
+    try:
+        last_event_id = _last_event_id(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return _event_stream_response(_event_frames(last_event_id))
+
+
+@require_GET
+async def todo_list_events_stream(request: HttpRequest, list_id: int):
+    """
+    Server-sent events for changes to one list and its todos
+    """
+    not_streamable = _not_streamable(request)
+    if not_streamable:
+        return not_streamable
+    try:
+        last_event_id = _last_event_id(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        await aget_todo_list(list_id)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+    return _event_stream_response(_event_frames(last_event_id, list_id))
@@ -0,0 +1,60 @@
+from typing import Iterator, Optional
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpRequest, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework import status
+
+from core.export import aiterate, csv_chunks, gzip_chunks, ndjson_chunks
+from todo.domain.todo import TODO_EXPORT_FIELDS, export_todos
+from todo.interfaces.schema.todo import TodoExportQueryParams
+from todo.interfaces.serializers.todo import serialize_todo_export_rows
+
+CONTENT_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+
+def _export_response(request: HttpRequest, todo_list_id: Optional[int], file_name: str):
+    try:
+        query_params = TodoExportQueryParams(**request.GET.dict())
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        rows = export_todos(todo_list_id)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+
+    encode = csv_chunks if query_params.format == "csv" else ndjson_chunks
+    chunks: Iterator[bytes] = encode(TODO_EXPORT_FIELDS, serialize_todo_export_rows(rows), settings.TODO_EXPORT_BUFFER_BYTES)
+    file_name = f"{file_name}.{query_params.format}"
+    content_type = CONTENT_TYPES[query_params.format]
+    if query_params.compression == "gzip":
+        chunks = gzip_chunks(chunks, settings.TODO_EXPORT_GZIP_LEVEL)
+        file_name += ".gz"
+        content_type = "application/gzip"
+
+    # under ASGI a sync iterator would be read into memory before streaming
+    response = StreamingHttpResponse(
+        aiterate(chunks) if isinstance(request, ASGIRequest) else chunks,
+        content_type=content_type,
+    )
+    response["Content-Disposition"] = f'attachment; filename="{file_name}"'
+    # nginx would otherwise buffer the export
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@require_GET
+def export_todo_list(request: HttpRequest, list_id: int):
+    """
+    Stream every todo of a list as CSV or NDJSON
+    """
+    return _export_response(request, list_id, f"todo-list-{list_id}")
+
+
+@require_GET
+def export_all_todos(request: HttpRequest):
+    """
+    Stream the todos of every list as CSV or NDJSON, list by list
+    """
+    return _export_response(request, None, "todos")
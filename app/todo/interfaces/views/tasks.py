@@ -1,15 +1,29 @@
-from rest_framework.decorators import api_view, renderer_classes
+import os
+
+from django.conf import settings
+from rest_framework.decorators import api_view, parser_classes, renderer_classes
+from rest_framework.parsers import MultiPartParser
 from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework import status
 from celery import subtask
+from celery.result import AsyncResult
+
+from core.uploads import SpoolingUploadHandler
+from todo.application.use_cases.import_todo_file import (
+    SubmitTodoImportUseCase,
+    get_todo_import,
+    todo_import_progress
+)
 
 
 @api_view(["POST"])
 @renderer_classes([JSONRenderer])
 def process_todo_upload_task(request):
     """
-    API endpoint to process todo upload asynchronously
+    API endpoint to process todo upload asynchronously. A file that was
+    imported into the same list already, or is being imported, returns that
+    import instead of starting another one.
     """
     file_path = request.data.get('file_path')
     if not file_path:
@@ -17,14 +31,116 @@ def process_todo_upload_task(request):
             {"error": "file_path is required"}, 
             status=status.HTTP_400_BAD_REQUEST
         )
-    
+    todo_list_name = request.data.get('todo_list_name')
+    upsert = str(request.data.get('upsert', '')).lower() in ('1', 'true', 'yes')
+    try:
+        todo_list_id = request.data.get('todo_list_id')
+        todo_list_id = int(todo_list_id) if todo_list_id not in (None, '') else None
+    except (TypeError, ValueError):
+        return Response({"error": "todo_list_id must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
     task = subtask("todo.interfaces.tasks.process_todo_upload")
-    task.apply_async(args=[file_path])
-    
+    try:
+        submission = SubmitTodoImportUseCase(
+            file_path,
+            lambda import_id: task.apply_async(
+                args=[file_path, todo_list_name],
+                kwargs={"todo_list_id": todo_list_id, "upsert": upsert},
+                task_id=import_id,
+            ),
+            todo_list_name=todo_list_name,
+            todo_list_id=todo_list_id,
+            upsert=upsert,
+        ).execute()
+    except FileNotFoundError:
+        return Response({"error": "File not found"}, status=status.HTTP_400_BAD_REQUEST)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+
     return Response({
-        "message": "Todo upload processing started",
-        "file_path": file_path
-    }, status=status.HTTP_202_ACCEPTED)
+        "message": "Todo upload processing started" if submission.created else "Todo upload already submitted",
+        "file_path": file_path,
+        "task_id": submission.import_id,
+        "state": submission.state,
+        "content_hash": submission.content_hash,
+        "duplicate": not submission.created,
+        "status_url": f"/api/v1/tasks/{submission.import_id}/"
+    }, status=status.HTTP_202_ACCEPTED if submission.created else status.HTTP_200_OK)
+
+
+@api_view(["POST"])
+@parser_classes([MultiPartParser])
+@renderer_classes([JSONRenderer])
+def upload_todo_file_task(request):
+    """
+    API endpoint to upload a todo file in the ``file`` field of a multipart
+    request and import it asynchronously. The body is streamed to
+    TODO_UPLOAD_SPOOL_DIR, which the import workers share, and hashed on the
+    way, so duplicates are recognised without reading the file again.
+    """
+    handler = SpoolingUploadHandler(
+        settings.TODO_UPLOAD_SPOOL_DIR,
+        max_bytes=settings.TODO_UPLOAD_MAX_BYTES,
+        request=request._request,
+    )
+    request.upload_handlers = [handler]
+    try:
+        upload = request.FILES.get('file')
+        todo_list_name = request.data.get('todo_list_name')
+        upsert = str(request.data.get('upsert', '')).lower() in ('1', 'true', 'yes')
+        todo_list_id = request.data.get('todo_list_id')
+        todo_list_id = int(todo_list_id) if todo_list_id not in (None, '') else None
+    except (TypeError, ValueError):
+        handler.discard()
+        return Response({"error": "todo_list_id must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+    except BaseException:
+        # e.g. the client went away mid-upload
+        handler.discard()
+        raise
+    if handler.too_large:
+        return Response(
+            {"error": f"File is larger than {settings.TODO_UPLOAD_MAX_BYTES} bytes"},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+    if upload is None:
+        return Response({"error": "file is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+    todo_list_name = todo_list_name or os.path.splitext(upload.name)[0]
+
+    task = subtask("todo.interfaces.tasks.process_todo_upload")
+    try:
+        submission = SubmitTodoImportUseCase(
+            upload.path,
+            lambda import_id: task.apply_async(
+                args=[upload.path, todo_list_name],
+                kwargs={"todo_list_id": todo_list_id, "upsert": upsert},
+                task_id=import_id,
+            ),
+            todo_list_name=todo_list_name,
+            todo_list_id=todo_list_id,
+            upsert=upsert,
+            content_hash=upload.content_hash,
+        ).execute()
+    except ValueError as e:
+        handler.discard()
+        return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+    except BaseException:
+        handler.discard()
+        raise
+    if not submission.created:
+        # the earlier upload of the same file is the one imported
+        handler.discard()
+
+    return Response({
+        "message": "Todo upload processing started" if submission.created else "Todo upload already submitted",
+        "file_name": upload.name,
+        "size": upload.size,
+        "task_id": submission.import_id,
+        "state": submission.state,
+        "content_hash": submission.content_hash,
+        "duplicate": not submission.created,
+        "status_url": f"/api/v1/tasks/{submission.import_id}/"
+    }, status=status.HTTP_202_ACCEPTED if submission.created else status.HTTP_200_OK)
 
 
 @api_view(["POST"])
@@ -55,6 +171,36 @@ def send_todo_reminders_task(request):
     }, status=status.HTTP_202_ACCEPTED)
 
 
+@api_view(["POST"])
+@renderer_classes([JSONRenderer])
+def reconcile_todo_counters_task(request):
+    """
+    API endpoint to recount the todo counters of every list
+    """
+    task = subtask("todo.interfaces.tasks.reconcile_todo_counters")
+    task.apply_async()
+    
+    return Response({
+        "message": "Todo counter reconciliation started"
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(["GET"])
+@renderer_classes([JSONRenderer])
+def get_task_status(request, task_id):
+    """
+    API endpoint to check on a task, with import progress for uploads
+    """
+    result = AsyncResult(task_id)
+    
+    return Response({
+        "task_id": task_id,
+        "state": result.state,
+        "progress": todo_import_progress(task_id).get(),
+        "import": get_todo_import(task_id)
+    }, status=status.HTTP_200_OK)
+
+
 @api_view(["GET"])
 @renderer_classes([JSONRenderer])
 def get_available_tasks(request):
@@ -67,7 +213,23 @@ def get_available_tasks(request):
             "endpoint": "/tasks/upload",
             "method": "POST",
             "description": "Process uploaded todo files asynchronously",
-            "required_params": ["file_path"]
+            "required_params": ["file_path"],
+            "optional_params": ["todo_list_name", "todo_list_id", "upsert"]
+        },
+        {
+            "name": "upload_todo_file",
+            "endpoint": "/tasks/upload/file",
+            "method": "POST",
+            "description": "Upload a todo file as multipart form data and process it asynchronously",
+            "required_params": ["file"],
+            "optional_params": ["todo_list_name", "todo_list_id", "upsert"]
+        },
+        {
+            "name": "task_status",
+            "endpoint": "/tasks/<task_id>",
+            "method": "GET",
+            "description": "Check a task's state and upload progress",
+            "required_params": []
         },
         {
             "name": "cleanup_old_todos",
@@ -82,6 +244,13 @@ def get_available_tasks(request):
             "method": "POST",
             "description": "Send reminders for overdue todos",
             "required_params": []
+        },
+        {
+            "name": "reconcile_todo_counters",
+            "endpoint": "/tasks/counters",
+            "method": "POST",
+            "description": "Recount the todo counters of every list",
+            "required_params": []
         }
     ]
     
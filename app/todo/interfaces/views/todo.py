@@ -1,12 +1,20 @@
+from django.conf import settings
+from django.http import HttpResponse
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.request import Request
 
+from core.conditional import Validators, weak_etag
+from core.json import dumps
+from core.pagination import InvalidCursor
+
 from todo.interfaces.serializers.todo import (
     TodoListSerializer,
     TodoListDetailSerializer,
-    TodoSerializer
+    TodoSerializer,
+    serialize_todo_list_rows,
+    serialize_todo_rows
 )
 from todo.interfaces.schema.todo import (
     TodoListCreate,
@@ -14,7 +22,11 @@ from todo.interfaces.schema.todo import (
     TodoCreate,
     TodoUpdate,
     TodoListQueryParams,
-    TodoQueryParams
+    TodoQueryParams,
+    TodoSearchQueryParams,
+    TodoBatchCreate,
+    TodoBatchUpdate,
+    MAX_BATCH_SIZE
 )
 from todo.domain.todo import (
     create_todo_list,
@@ -22,26 +34,92 @@ from todo.domain.todo import (
     delete_todo_list,
     list_todo_lists,
     get_todo_list,
+    get_todo_lists_version,
     get_todo_list_todos,
     create_todo,
     update_todo,
     delete_todo,
-    get_todo
+    get_todo,
+    search_todos,
+    create_todos,
+    update_todos,
+    delete_todos
 )
 
+
+def _fast_json_response(data) -> HttpResponse:
+    # Same bytes as Response(data) through JSONRenderer, without DRF's
+    # serializer and renderer layers
+    return HttpResponse(dumps(data), content_type="application/json", status=status.HTTP_200_OK)
+
+
+def todo_lists_validators(last_modified, count: int) -> Validators:
+    # a deleted list may leave the latest updated_at alone, the count moves
+    return Validators(weak_etag("todo-lists", last_modified, count), last_modified)
+
+
+def todo_list_validators(todo_list, resource: str) -> Validators:
+    # writes to the list's todos move its updated_at too
+    return Validators(weak_etag(resource, todo_list.id, todo_list.updated_at), todo_list.updated_at)
+
+
+def _batch_items(request: Request, key: str) -> list:
+    items = request.data.get(key) if isinstance(request.data, dict) else None
+    if not isinstance(items, list):
+        raise ValueError(f"'{key}' must be a list")
+    if len(items) > MAX_BATCH_SIZE:
+        raise ValueError(f"At most {MAX_BATCH_SIZE} items per batch")
+    return items
+
+
+def _parse_batch(items: list, schema, **extra):
+    # Validate every item so all errors are reported at once, keeping each
+    # valid item's position in the request.
+    parsed, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            parsed.append((index, schema(**{**item, **extra})))
+        except Exception as e:
+            errors.append({"index": index, "error": str(e)})
+    return parsed, errors
+
+
 # Create your views here.
 class ListTodoListsView(APIView):
 
     def get(self, request: Request, *args, **kwargs):
         # Parse query parameters with Pydantic
-        query_params = TodoListQueryParams(**request.GET.dict())
+        try:
+            query_params = TodoListQueryParams(**request.GET.dict())
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Answer revalidations before fetching the page
+        validators = todo_lists_validators(*get_todo_lists_version())
+        not_modified = validators.not_modified(request)
+        if not_modified is not None:
+            return not_modified
         
-        # Call domain function
-        todo_lists = list_todo_lists()
+        try:
+            # Call domain function
+            page = list_todo_lists(query_params, as_values=settings.TODO_FAST_JSON)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if settings.TODO_FAST_JSON:
+            return validators.apply(_fast_json_response({
+                "results": serialize_todo_list_rows(page.items),
+                "count": page.count,
+                "next_cursor": page.next_cursor
+            }))
         
         # Serialize output
-        serializer = TodoListDetailSerializer(todo_lists, many=True)
-        return Response({"results": serializer.data}, status=status.HTTP_200_OK)
+        serializer = TodoListDetailSerializer(page.items, many=True)
+        return validators.apply(Response({
+            "results": serializer.data,
+            "count": page.count,
+            "next_cursor": page.next_cursor
+        }, status=status.HTTP_200_OK))
 
     def post(self, request: Request, *args, **kwargs):
         # Validate input with Pydantic
@@ -63,10 +141,15 @@ class SingleTodoListView(APIView):
         try:
             # Call domain function
             todo_list = get_todo_list(list_id)
+
+            validators = todo_list_validators(todo_list, "todo-list")
+            not_modified = validators.not_modified(request)
+            if not_modified is not None:
+                return not_modified
             
             # Serialize output
             serializer = TodoListDetailSerializer(todo_list)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return validators.apply(Response(serializer.data, status=status.HTTP_200_OK))
         except ValueError as e:
             return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
 
@@ -100,17 +183,40 @@ class SingleTodoListView(APIView):
 class ListTodoView(APIView):
     def get(self, request: Request, list_id: int, *args, **kwargs):
         # Parse query parameters with Pydantic
-        query_params = TodoQueryParams(**request.query_params.dict())
+        try:
+            query_params = TodoQueryParams(**request.query_params.dict())
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
+            # The cached list carries the validators, answer revalidations
+            # before fetching the page
+            validators = todo_list_validators(get_todo_list(list_id), "todos")
+            not_modified = validators.not_modified(request)
+            if not_modified is not None:
+                return not_modified
+
             # Call domain function
-            todos = get_todo_list_todos(list_id)
-            
-            # Serialize output
-            serializer = TodoSerializer(todos, many=True)
-            return Response({"results": serializer.data}, status=status.HTTP_200_OK)
+            page = get_todo_list_todos(list_id, query_params, as_values=settings.TODO_FAST_JSON)
+        except InvalidCursor as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except ValueError as e:
             return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+            
+        if settings.TODO_FAST_JSON:
+            return validators.apply(_fast_json_response({
+                "results": serialize_todo_rows(page.items),
+                "count": page.count,
+                "next_cursor": page.next_cursor
+            }))
+        
+        # Serialize output
+        serializer = TodoSerializer(page.items, many=True)
+        return validators.apply(Response({
+            "results": serializer.data,
+            "count": page.count,
+            "next_cursor": page.next_cursor
+        }, status=status.HTTP_200_OK))
 
     def post(self, request: Request, list_id: int, *args, **kwargs):
         # Validate input with Pydantic
@@ -167,4 +273,94 @@ class SingleTodoView(APIView):
             delete_todo(todo_list_id, todo_id)
             return Response(None, status=status.HTTP_204_NO_CONTENT)
         except ValueError as e:
-            return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+            return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+
+
+class BatchTodoView(APIView):
+
+    def post(self, request: Request, list_id: int, *args, **kwargs):
+        # Validate input with Pydantic
+        try:
+            items = _batch_items(request, "todos")
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        parsed, errors = _parse_batch(items, TodoBatchCreate, list_id=list_id)
+        if not parsed:
+            return Response({"results": [], "errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            # Call domain function
+            todos = create_todos(list_id, [todo_in for _, todo_in in parsed])
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+
+        # Serialize output
+        serializer = TodoSerializer(todos, many=True)
+        return Response({"results": serializer.data, "errors": errors}, status=status.HTTP_201_CREATED)
+
+    def patch(self, request: Request, list_id: int, *args, **kwargs):
+        # Validate input with Pydantic
+        try:
+            items = _batch_items(request, "todos")
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        parsed, errors = _parse_batch(items, TodoBatchUpdate)
+        if not parsed:
+            return Response({"results": [], "errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            # Call domain function
+            todos, missing_ids = update_todos(list_id, [todo_in for _, todo_in in parsed])
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+
+        errors.extend({"index": index, "error": "Todo not found"} for index, todo_in in parsed if todo_in.id in missing_ids)
+        errors.sort(key=lambda error: error["index"])
+
+        # Serialize output
+        serializer = TodoSerializer(todos, many=True)
+        return Response({"results": serializer.data, "errors": errors}, status=status.HTTP_200_OK)
+
+    def delete(self, request: Request, list_id: int, *args, **kwargs):
+        # Validate input
+        try:
+            items = _batch_items(request, "ids")
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        todo_ids, errors = [], []
+        for index, item in enumerate(items):
+            if isinstance(item, int) and not isinstance(item, bool):
+                todo_ids.append((index, item))
+            else:
+                errors.append({"index": index, "error": "Todo id must be an integer"})
+
+        try:
+            # Call domain function
+            deleted_ids = delete_todos(list_id, [todo_id for _, todo_id in todo_ids])
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+
+        errors.extend({"index": index, "error": "Todo not found"} for index, todo_id in todo_ids if todo_id not in deleted_ids)
+        errors.sort(key=lambda error: error["index"])
+        return Response({"results": sorted(deleted_ids), "errors": errors}, status=status.HTTP_200_OK)
+
+
+class SearchTodoView(APIView):
+
+    def get(self, request: Request, *args, **kwargs):
+        # Parse query parameters with Pydantic
+        try:
+            query_params = TodoSearchQueryParams(**request.query_params.dict())
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            # Call domain function, hits are already in response shape
+            page = search_todos(query_params)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "results": page.items,
+            "next_cursor": page.next_cursor
+        }, status=status.HTTP_200_OK)
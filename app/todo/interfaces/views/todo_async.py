@@ -0,0 +1,154 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpRequest, HttpResponse
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+
+from core.json import dumps
+from core.pagination import InvalidCursor
+
+from todo.interfaces.serializers.todo import (
+    TodoListDetailSerializer,
+    TodoSerializer,
+    serialize_todo_list_rows,
+    serialize_todo_rows
+)
+from todo.interfaces.schema.todo import TodoListQueryParams, TodoQueryParams
+from todo.domain.todo import (
+    alist_todo_lists,
+    aget_todo_list,
+    aget_todo_lists_version,
+    aget_todo_list_todos,
+    aget_todo
+)
+from todo.interfaces.views.todo import (
+    ListTodoListsView,
+    SingleTodoListView,
+    ListTodoView,
+    SingleTodoView,
+    todo_lists_validators,
+    todo_list_validators
+)
+
+
+# Async counterparts of the read endpoints in views/todo.py, for ASGI
+# deployments. GETs run on the event loop with the async ORM and render the
+# same JSON as the DRF views; other methods are handed to the sync views.
+
+
+def _json_response(data, status_code: int = status.HTTP_200_OK) -> HttpResponse:
+    return HttpResponse(dumps(data), content_type="application/json", status=status_code)
+
+
+class AsyncReadView(View):
+    """
+    Async ``get`` in front of a DRF view that keeps handling the writes.
+    Those run through ``sync_to_async``, in the thread shared by all sync
+    code of the process, so transactions behave as under WSGI.
+    """
+
+    sync_view_class = None
+    sync_view = None
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        initkwargs.setdefault("sync_view", sync_to_async(cls.sync_view_class.as_view()))
+        # DRF authentication enforces CSRF itself, as with APIView.as_view
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def write(self, request: HttpRequest, *args, **kwargs):
+        return await self.sync_view(request, *args, **kwargs)
+
+
+class AsyncListTodoListsView(AsyncReadView):
+    sync_view_class = ListTodoListsView
+
+    async def get(self, request: HttpRequest, *args, **kwargs):
+        try:
+            query_params = TodoListQueryParams(**request.GET.dict())
+        except Exception as e:
+            return _json_response({"error": str(e)}, status.HTTP_400_BAD_REQUEST)
+
+        validators = todo_lists_validators(*await aget_todo_lists_version())
+        not_modified = validators.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+
+        try:
+            page = await alist_todo_lists(query_params, as_values=True)
+        except ValueError as e:
+            return _json_response({"error": str(e)}, status.HTTP_400_BAD_REQUEST)
+
+        return validators.apply(_json_response({
+            "results": serialize_todo_list_rows(page.items),
+            "count": page.count,
+            "next_cursor": page.next_cursor
+        }))
+
+    post = AsyncReadView.write
+
+
+class AsyncSingleTodoListView(AsyncReadView):
+    sync_view_class = SingleTodoListView
+
+    async def get(self, request: HttpRequest, list_id: int, *args, **kwargs):
+        try:
+            todo_list = await aget_todo_list(list_id)
+        except ValueError as e:
+            return _json_response({"error": str(e)}, status.HTTP_404_NOT_FOUND)
+
+        validators = todo_list_validators(todo_list, "todo-list")
+        not_modified = validators.not_modified(request)
+        if not_modified is not None:
+            return not_modified
+
+        return validators.apply(_json_response(TodoListDetailSerializer(todo_list).data))
+
+    patch = AsyncReadView.write
+    delete = AsyncReadView.write
+
+
+class AsyncListTodoView(AsyncReadView):
+    sync_view_class = ListTodoView
+
+    async def get(self, request: HttpRequest, list_id: int, *args, **kwargs):
+        try:
+            query_params = TodoQueryParams(**request.GET.dict())
+        except Exception as e:
+            return _json_response({"error": str(e)}, status.HTTP_400_BAD_REQUEST)
+
+        try:
+            validators = todo_list_validators(await aget_todo_list(list_id), "todos")
+            not_modified = validators.not_modified(request)
+            if not_modified is not None:
+                return not_modified
+
+            page = await aget_todo_list_todos(list_id, query_params, as_values=True)
+        except InvalidCursor as e:
+            return _json_response({"error": str(e)}, status.HTTP_400_BAD_REQUEST)
+        except ValueError as e:
+            return _json_response({"error": str(e)}, status.HTTP_404_NOT_FOUND)
+
+        return validators.apply(_json_response({
+            "results": serialize_todo_rows(page.items),
+            "count": page.count,
+            "next_cursor": page.next_cursor
+        }))
+
+    post = AsyncReadView.write
+
+
+class AsyncSingleTodoView(AsyncReadView):
+    sync_view_class = SingleTodoView
+
+    async def get(self, request: HttpRequest, todo_list_id: int, todo_id: int, *args, **kwargs):
+        try:
+            todo = await aget_todo(todo_list_id, todo_id)
+        except ValueError as e:
+            return _json_response({"error": str(e)}, status.HTTP_404_NOT_FOUND)
+        # list is selected with the todo, serializing it does not query
+        return _json_response(TodoSerializer(todo).data)
+
+    patch = AsyncReadView.write
+    delete = AsyncReadView.write
@@ -0,0 +1,104 @@
+import copy
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from todo.data.models.todo import TodoList
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the per-request database connection overhead: simulated "
+        "requests with a new connection each, a persistent connection and, "
+        "when DB_POOL is on, the connection pool"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        original = copy.deepcopy(connection.settings_dict)
+        pool_options = original["OPTIONS"].get("pool")
+
+        modes = [
+            ("new connection", {"CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False}, False),
+            ("persistent", {"CONN_MAX_AGE": 600, "CONN_HEALTH_CHECKS": False}, False),
+            ("persistent+check", {"CONN_MAX_AGE": 600, "CONN_HEALTH_CHECKS": True}, False),
+        ]
+        if pool_options:
+            modes.append(("pool", {"CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": original["CONN_HEALTH_CHECKS"]}, True))
+        else:
+            self.stdout.write("DB_POOL is off, skipping the pool")
+
+        self.stdout.write(
+            f"{'mode':<18} {'requests':>9} {'conns':>6} {'req/s':>9} "
+            f"{'mean ms':>8} {'p50 ms':>8} {'p99 ms':>8}"
+        )
+        try:
+            for name, overrides, use_pool in modes:
+                connection.close()
+                connection.settings_dict.update(overrides)
+                connection.settings_dict["OPTIONS"] = dict(original["OPTIONS"])
+                if not use_pool:
+                    # Django reads the pool options on every new connection
+                    connection.settings_dict["OPTIONS"].pop("pool", None)
+                result = _run(connection, options["requests"])
+                self.stdout.write(
+                    f"{name:<18} {options['requests']:>9} {result['connections']:>6} {result['rps']:>9.0f} "
+                    f"{result['mean']:>8.2f} {result['p50']:>8.2f} {result['p99']:>8.2f}"
+                )
+        finally:
+            connection.close()
+            connection.settings_dict.clear()
+            connection.settings_dict.update(original)
+
+
+def _run(connection, requests):
+    """
+    Go through the request cycle Django's handlers signal, with one small
+    query per request, and count the server connections used.
+    """
+    # Pooled connections are handed out again, so count distinct ones. The
+    # objects are kept alive so their ids are not reused.
+    opened = {}
+
+    def count(sender, connection, **kwargs):
+        opened[id(connection.connection)] = connection.connection
+
+    connection_created.connect(count)
+    latencies = []
+    try:
+        # first request outside the measurement, e.g. to fill the pool
+        _request()
+        opened.clear()
+        if connection.connection is not None:
+            # kept from the warm-up request by a persistent connection
+            opened[id(connection.connection)] = connection.connection
+        started = time.perf_counter()
+        for _ in range(requests):
+            request_started_at = time.perf_counter()
+            _request()
+            latencies.append(time.perf_counter() - request_started_at)
+        elapsed = time.perf_counter() - started
+    finally:
+        connection_created.disconnect(count)
+
+    latencies.sort()
+    return {
+        "connections": len(opened),
+        "rps": requests / elapsed,
+        "mean": elapsed / requests * 1000,
+        "p50": latencies[len(latencies) // 2] * 1000,
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+    }
+
+
+def _request():
+    request_started.send(sender=Command)
+    TodoList.objects.filter(id=0).exists()
+    request_finished.send(sender=Command)
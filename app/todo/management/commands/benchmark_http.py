@@ -0,0 +1,135 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test running deployments of the API, e.g. the WSGI and the ASGI "
+        "server, and compare latency percentiles and requests per second"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--target", action="append", required=True, metavar="NAME=URL",
+            help="Deployment to test, e.g. wsgi=http://localhost:8000; repeat to compare",
+        )
+        parser.add_argument(
+            "--path", action="append", metavar="PATH",
+            help="Path to request, repeat for several (default: the todo list page)",
+        )
+        parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+        parser.add_argument("--duration", type=float, default=10.0, help="Seconds per run")
+        parser.add_argument("--warmup", type=float, default=2.0, help="Seconds of unmeasured load before each run")
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options["target"]:
+            name, _, url = target.partition("=")
+            parts = urlsplit(url)
+            if not url or parts.scheme != "http" or not parts.hostname:
+                raise CommandError(f"Expected NAME=http://host:port, got {target}")
+            targets.append((name, parts.hostname, parts.port or 80))
+        paths = options["path"] or ["/api/v1/todo-lists/"]
+
+        self.stdout.write(
+            f"{'target':<10} {'path':<40} {'conc':>5} {'requests':>9} {'errors':>7} "
+            f"{'req/s':>9} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8}"
+        )
+        for path in paths:
+            for concurrency in options["concurrency"]:
+                for name, host, port in targets:
+                    result = asyncio.run(_load(host, port, path, concurrency, options["duration"], options["warmup"]))
+                    self.stdout.write(
+                        f"{name:<10} {path:<40} {concurrency:>5} {result['requests']:>9} {result['errors']:>7} "
+                        f"{result['rps']:>9.0f} {result['p50']:>8.1f} {result['p90']:>8.1f} {result['p99']:>8.1f}"
+                    )
+
+
+async def _load(host, port, path, concurrency, duration, warmup):
+    """
+    Keep ``concurrency`` keep-alive connections busy with back-to-back GETs
+    for ``warmup + duration`` seconds, recording only the measured window.
+    """
+    loop = asyncio.get_running_loop()
+    measure_from = loop.time() + warmup
+    stop_at = measure_from + duration
+    latencies, errors = [], [0]
+
+    async def client():
+        connection = None
+        while loop.time() < stop_at:
+            try:
+                if connection is None:
+                    connection = await asyncio.open_connection(host, port)
+                started_at = time.perf_counter()
+                status_code, keep_alive = await _get(*connection, host, path)
+                elapsed = time.perf_counter() - started_at
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                errors[0] += loop.time() >= measure_from
+                connection = _close(connection)
+                await asyncio.sleep(0.01)
+                continue
+            if loop.time() >= measure_from:
+                if status_code == 200:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+            if not keep_alive:
+                connection = _close(connection)
+        _close(connection)
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "rps": len(latencies) / duration,
+        "p50": _percentile(latencies, 0.50) * 1000,
+        "p90": _percentile(latencies, 0.90) * 1000,
+        "p99": _percentile(latencies, 0.99) * 1000,
+    }
+
+
+async def _get(reader, writer, host, path):
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: application/json\r\n\r\n".encode("ascii"))
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError("Connection closed by server")
+    status_code = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip().lower()
+
+    if headers.get("transfer-encoding") == "chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    else:
+        # body delimited by the end of the connection
+        await reader.read()
+        return status_code, False
+    return status_code, headers.get("connection") != "close"
+
+
+def _close(connection):
+    if connection is not None:
+        connection[1].close()
+    return None
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
@@ -0,0 +1,80 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from core.json import dumps
+from todo.data.models.todo import Todo, TodoList
+from todo.interfaces.serializers.todo import TodoSerializer, serialize_todo_rows
+
+
+class Command(BaseCommand):
+    help = "Compare DRF serializer rendering with the .values() fast path for todo pages"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, nargs="+", default=[10, 1000, 100000])
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        renderer = JSONRenderer()
+        self.stdout.write(f"{'rows':>8} {'drf (ms)':>10} {'fast (ms)':>10} {'speedup':>8}")
+        for rows in options["rows"]:
+            instances, values = _fixtures(rows)
+
+            drf_body, drf_time = _best_of(
+                options["repeat"],
+                lambda: renderer.render({"results": TodoSerializer(instances, many=True).data}),
+            )
+            fast_body, fast_time = _best_of(
+                options["repeat"],
+                lambda: dumps({"results": serialize_todo_rows(values)}),
+            )
+            if drf_body != fast_body:
+                self.stderr.write(self.style.ERROR(f"Output differs at {rows} rows"))
+
+            self.stdout.write(
+                f"{rows:>8} {drf_time * 1000:>10.1f} {fast_time * 1000:>10.1f} {drf_time / fast_time:>7.1f}x"
+            )
+
+
+def _fixtures(rows):
+    # Unsaved rows: the benchmark measures serialization only, not the database
+    now = timezone.now()
+    todo_list = TodoList(id=1, name="Benchmark", created_at=now, updated_at=now)
+    instances, values = [], []
+    for i in range(rows):
+        todo = Todo(
+            id=i + 1,
+            title=f"Todo {i}",
+            description="Benchmark todo é  ",
+            due_date=date(2024, 1, 1) + timedelta(days=i % 365),
+            list=todo_list,
+            completed_at=now if i % 2 else None,
+            created_at=now,
+            updated_at=now,
+        )
+        instances.append(todo)
+        values.append({
+            "id": todo.id,
+            "title": todo.title,
+            "description": todo.description,
+            "due_date": todo.due_date,
+            "list_id": todo_list.id,
+            "list__name": todo_list.name,
+            "completed_at": todo.completed_at,
+            "created_at": now,
+            "updated_at": now,
+        })
+    return instances, values
+
+
+def _best_of(repeat, func):
+    best, result = None, None
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started_at
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
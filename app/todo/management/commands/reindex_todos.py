@@ -0,0 +1,145 @@
+import multiprocessing
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections as db_connections
+from django.db.models import Max, Min
+from elasticsearch import Elasticsearch
+from elasticsearch_dsl.connections import connections as es_connections
+
+from todo.data.elasticsearch import reindex
+from todo.data.models.todo import JobCheckpoint, Todo
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the todo search index into a new versioned index and move the "
+        "alias to it once complete. Rerun after a crash to resume."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+        parser.add_argument("--partition-size", type=int, default=100000, help="Todo ids per work unit")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Rows fetched per database round trip")
+        parser.add_argument("--bulk-threads", type=int, default=2, help="Concurrent bulk requests per worker")
+        parser.add_argument("--max-rate", type=float, default=None, help="Cap on documents per second, all workers combined")
+        parser.add_argument("--delete-old", action="store_true", help="Delete the previously aliased indices after the swap")
+        parser.add_argument("--abort", action="store_true", help="Discard an unfinished reindex and its index")
+
+    def handle(self, *args, **options):
+        checkpoint = JobCheckpoint.objects.filter(name=reindex.REINDEX_CHECKPOINT_NAME).first()
+        if options["abort"]:
+            self._abort(checkpoint)
+            return
+
+        if checkpoint and reindex.index_exists(checkpoint.state["index"]):
+            self.stdout.write(f"Resuming reindex into {checkpoint.state['index']}")
+        else:
+            checkpoint = self._start(options["partition_size"])
+        state = checkpoint.state
+
+        ranges = [
+            (start, min(start + state["partition_size"], state["max_id"] + 1))
+            for start in range(state["min_id"], state["max_id"] + 1, state["partition_size"])
+        ]
+        pending = [item for item in ranges if item[0] not in set(state["done"])]
+        self.stdout.write(
+            f"{len(ranges) - len(pending)}/{len(ranges)} id ranges already indexed, "
+            f"{len(pending)} to go with {options['workers']} workers"
+        )
+
+        failed_ranges = self._index_ranges(checkpoint, pending, len(ranges), options)
+        if failed_ranges:
+            raise CommandError(
+                f"{failed_ranges} id ranges had failed documents and were not checkpointed; "
+                "rerun the command to retry them"
+            )
+
+        index_name = state["index"]
+        reindex.finish_index(index_name)
+        previous = reindex.swap_alias(index_name)
+        self.stdout.write(self.style.SUCCESS(f"Alias {reindex.alias_name()} now points at {index_name}"))
+
+        # Lets the outbox drain replay the changes kept during the reindex into
+        # the new index, including the rows created since it started
+        checkpoint.delete()
+
+        if options["delete_old"]:
+            for old_index in previous:
+                reindex.delete_index(old_index)
+                self.stdout.write(f"Deleted {old_index}")
+
+    def _start(self, partition_size):
+        bounds = Todo.objects.aggregate(min_id=Min("id"), max_id=Max("id"))
+        index_name = reindex.next_index_name()
+        reindex.create_index(index_name)
+        checkpoint, _ = JobCheckpoint.objects.update_or_create(
+            name=reindex.REINDEX_CHECKPOINT_NAME,
+            defaults={"state": {
+                "index": index_name,
+                "min_id": bounds["min_id"] or 1,
+                "max_id": bounds["max_id"] or 0,
+                "partition_size": partition_size,
+                "done": [],
+                "indexed": 0,
+            }},
+        )
+        self.stdout.write(f"Created {index_name}")
+        return checkpoint
+
+    def _index_ranges(self, checkpoint, pending, total_ranges, options):
+        if not pending:
+            return 0
+        state = checkpoint.state
+        workers = max(1, min(options["workers"], len(pending)))
+        max_rate = options["max_rate"] / workers if options["max_rate"] else None
+        tasks = [
+            (state["index"], start, end, options["chunk_size"], max_rate, options["bulk_threads"])
+            for start, end in pending
+        ]
+
+        failed_ranges = 0
+        indexed = 0
+        started_at = time.monotonic()
+        # Forked children must not share the parent's database sockets
+        db_connections.close_all()
+        with multiprocessing.get_context("fork").Pool(workers, initializer=_init_worker) as pool:
+            for start, succeeded, failed in pool.imap_unordered(_index_range, tasks):
+                indexed += succeeded
+                if failed:
+                    failed_ranges += 1
+                    self.stderr.write(f"Range starting at id {start}: {failed} documents failed")
+                else:
+                    state["done"].append(start)
+                state["indexed"] += succeeded
+                checkpoint.save(update_fields=["state", "updated_at"])
+
+                elapsed = time.monotonic() - started_at
+                self.stdout.write(
+                    f"[{len(state['done'])}/{total_ranges}] {state['indexed']} todos indexed, "
+                    f"{indexed / elapsed if elapsed else 0:.0f} docs/s"
+                )
+        return failed_ranges
+
+    def _abort(self, checkpoint):
+        if checkpoint is None:
+            self.stdout.write("No reindex in progress")
+            return
+        index_name = checkpoint.state.get("index")
+        if index_name and index_name not in reindex.aliased_indices():
+            reindex.delete_index(index_name)
+            self.stdout.write(f"Deleted {index_name}")
+        checkpoint.delete()
+
+
+def _init_worker():
+    # Replace the client inherited from the parent, its pooled sockets
+    # cannot be shared across processes.
+    es_connections.add_connection("default", Elasticsearch(hosts=[settings.ELASTICSEARCH_URL]))
+
+
+def _index_range(task):
+    index_name, start, end, chunk_size, max_rate, thread_count = task
+    result = reindex.index_todo_range(index_name, start, end, chunk_size, max_rate, thread_count)
+    return start, result.succeeded, len(result.failed)
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:04
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction, and avoids
+    # blocking writes on the todo table while the index builds
+    atomic = False
+
+    dependencies = [
+        ('todo', '0002_todo_outbox'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='todo',
+            index=models.Index(fields=['list', 'due_date', 'id'], name='todo_list_due_date_id_idx'),
+        ),
+    ]
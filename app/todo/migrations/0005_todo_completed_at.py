@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:39
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction; adding a
+    # nullable column without a default only touches the catalog
+    atomic = False
+
+    dependencies = [
+        ('todo', '0004_job_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='todo',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        AddIndexConcurrently(
+            model_name='todo',
+            index=models.Index(condition=models.Q(('completed_at__isnull', False)), fields=['id', 'completed_at'], name='todo_completed_id_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:41
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('todo', '0005_todo_completed_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='todo',
+            name='reminded_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        AddIndexConcurrently(
+            model_name='todo',
+            index=models.Index(condition=models.Q(('completed_at__isnull', True), ('reminded_at__isnull', True)), fields=['due_date', 'id'], name='todo_reminder_due_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0006_todo_reminded_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TodoImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('import_id', models.CharField(max_length=255, unique=True)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('destination', models.CharField(max_length=255)),
+                ('file_path', models.CharField(max_length=1024)),
+                ('upsert', models.BooleanField(default=False)),
+                ('state', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('rows_imported', models.IntegerField(default=0)),
+                ('rows_skipped', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('todo_list', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='todo.todolist')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('state__in', ['pending', 'running']), models.Q(('state', 'completed'), ('todo_list__isnull', False)), _connector='OR'), fields=('content_hash', 'destination'), name='todo_import_active_hash_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:05
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+BATCH_SIZE = 1000
+
+
+def count_todos(apps, schema_editor):
+    # Lists are counted in batches of ids, each UPDATE in its own
+    # transaction; reconcile_todo_counters corrects writes made meanwhile
+    TodoList = apps.get_model('todo', 'TodoList')
+    Todo = apps.get_model('todo', 'Todo')
+    today = timezone.localdate()
+    open_todos = Q(completed_at__isnull=True)
+    filters = {
+        'todos_count': Q(),
+        'overdue_count': open_todos & Q(due_date__lt=today),
+        'due_soon_count': open_todos & Q(due_date__gte=today, due_date__lt=today + timedelta(days=settings.TODO_DUE_SOON_DAYS)),
+    }
+    counts = {
+        field: Coalesce(
+            Subquery(
+                Todo.objects.filter(condition, list=OuterRef('pk')).order_by().values('list').annotate(count=Count('id')).values('count'),
+                output_field=IntegerField(),
+            ),
+            0,
+        )
+        for field, condition in filters.items()
+    }
+    last_id = 0
+    while True:
+        ids = list(TodoList.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:BATCH_SIZE])
+        if not ids:
+            break
+        TodoList.objects.filter(id__in=ids).update(**counts)
+        last_id = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    # adding columns with a constant default only touches the catalog, the
+    # backfill commits batch by batch
+    atomic = False
+
+    dependencies = [
+        ('todo', '0007_todo_import'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='todolist',
+            name='due_soon_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='todolist',
+            name='overdue_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='todolist',
+            name='todos_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_todos, migrations.RunPython.noop),
+    ]
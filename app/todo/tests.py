@@ -1,3 +1,1445 @@
-from django.test import TestCase
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from contextlib import nullcontext
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import elasticsearch
+import redis
+from celery import shared_task
+from celery.app.task import Context
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import StopFutureHandlers, StopUpload
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from app.celery_app import celery_app
+from core import readers, task_telemetry
+from core.cache import TieredCache
+from core.csv import count_csv_rows, split_csv_file
+from core.instrumentation import _time_query, registry
+from core.metrics import RequestStats, collecting
+from core.pagination import encode_cursor
+from core.uploads import SpoolingUploadHandler
+from todo.application.use_cases import cleanup_old_todos, import_todo_file, sync_todo_index
+from todo.application.use_cases.reconcile_todo_counters import ReconcileTodoCountersUseCase
+from todo.application.use_cases.send_todo_reminders import SendTodoRemindersUseCase
+from todo.data.elasticsearch.bulk import BulkIndexer, BulkResult, suspended_refresh
+from todo.data.elasticsearch.documents.todo import TodoIndex
+from todo.data.elasticsearch.reindex import REINDEX_CHECKPOINT_NAME
+from todo.data.elasticsearch.search import todo as todo_search
+from todo.data.models.todo import JobCheckpoint, Todo, TodoImport, TodoList, TodoOutbox
+from todo.data.reminders.todo import InMemoryReminderBackend
+from todo.data.repositories.todo import bulk_insert_todos, upsert_todos
+from todo.domain.todo import todo_cache
+from todo.interfaces import tasks
+from todo.interfaces.views.todo_async import AsyncListTodoListsView, AsyncListTodoView, AsyncSingleTodoListView
+
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ApiTestCase(TestCase):
+    """
+    API requests starting from empty read caches, with the events that
+    would go to Redis dropped.
+    """
+
+    def setUp(self):
+        self.clear_caches()
+        patcher = mock.patch("todo.data.events.todo.publish_todo_event")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def clear_caches(self):
+        caches["default"].clear()
+        todo_cache.clear_local()
+
+    def create_lists(self, count, todos_per_list=0):
+        todo_lists = TodoList.objects.bulk_create([TodoList(name=f"List {i}") for i in range(count)])
+        # keeps the list counters, unlike bulk_create
+        bulk_insert_todos([
+            Todo(list=todo_list, title=f"Todo {i}", description="", due_date=date(2024, 1, 1) + timedelta(days=i))
+            for todo_list in todo_lists
+            for i in range(todos_per_list)
+        ], use_copy=False)
+        return todo_lists
+
+
+class QueryCountTests(ApiTestCase):
+    """
+    The read endpoints cost the same number of queries however many rows
+    they return.
+    """
+
+    def test_list_page(self):
+        for fast_json in (False, True):
+            for count in (1, 30):
+                with self.subTest(fast_json=fast_json, lists=count), override_settings(TODO_FAST_JSON=fast_json):
+                    TodoList.objects.all().delete()
+                    self.create_lists(count, todos_per_list=3)
+                    self.clear_caches()
+                    # version, COUNT and the page
+                    with self.assertNumQueries(3):
+                        response = self.client.get("/api/v1/todo-lists/?page_size=50")
+                    self.assertEqual(len(response.json()["results"]), count)
+                    self.assertEqual(response.json()["results"][0]["todos_count"], 3)
+
+    def test_keyset_page_skips_count(self):
+        self.create_lists(30)
+        cursor = self.client.get("/api/v1/todo-lists/?page_size=10").json()["next_cursor"]
+        self.clear_caches()
+        with self.assertNumQueries(2):
+            response = self.client.get(f"/api/v1/todo-lists/?page_size=10&cursor={cursor}")
+        self.assertEqual(len(response.json()["results"]), 10)
+
+    def test_single_list(self):
+        todo_list, = self.create_lists(1, todos_per_list=20)
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/api/v1/todo-lists/{todo_list.id}/")
+        self.assertEqual(response.json()["todos_count"], 20)
+
+    def test_todo_page(self):
+        for count in (1, 30):
+            with self.subTest(todos=count):
+                todo_list, = self.create_lists(1, todos_per_list=count)
+                self.clear_caches()
+                # list, existence check, COUNT and the page
+                with self.assertNumQueries(4):
+                    response = self.client.get(f"/api/v1/todo-lists/{todo_list.id}/todos/?page_size=50")
+                self.assertEqual(len(response.json()["results"]), count)
+
+
+class CursorTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.todo_list, = self.create_lists(1, todos_per_list=3)
+        self.todos_url = f"/api/v1/todo-lists/{self.todo_list.id}/todos/"
+
+    def test_cursor_round_trip(self):
+        page = self.client.get(f"{self.todos_url}?page_size=2").json()
+        response = self.client.get(f"{self.todos_url}?page_size=2&cursor={page['next_cursor']}")
+        self.assertEqual([todo["title"] for todo in response.json()["results"]], ["Todo 2"])
+        self.assertIsNone(response.json()["next_cursor"])
+
+    def test_invalid_cursors_are_bad_requests(self):
+        cursors = {
+            "not base64": "%%%",
+            "wrong type": encode_cursor(["x", 1]),
+            "null": encode_cursor([None, 1]),
+            "wrong length": encode_cursor([1]),
+        }
+        for reason, cursor in cursors.items():
+            with self.subTest(reason):
+                response = self.client.get(f"{self.todos_url}?cursor={cursor}")
+                self.assertEqual(response.status_code, 400)
+        response = self.client.get(f"/api/v1/todo-lists/?cursor={encode_cursor(['x'])}")
+        self.assertEqual(response.status_code, 400)
+
+    def test_missing_list_is_not_found(self):
+        cursor = encode_cursor(["2024-01-01", 1])
+        response = self.client.get(f"/api/v1/todo-lists/{self.todo_list.id + 1}/todos/?cursor={cursor}")
+        self.assertEqual(response.status_code, 404)
+
+    async def test_async_view(self):
+        view = AsyncListTodoView.as_view()
+        for cursor, expected_status in ((encode_cursor(["x", 1]), 400), (encode_cursor([1]), 400), (None, 200)):
+            with self.subTest(cursor=cursor):
+                request = AsyncRequestFactory().get(self.todos_url, {"cursor": cursor} if cursor else {})
+                response = await view(request, list_id=self.todo_list.id)
+                self.assertEqual(response.status_code, expected_status)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TieredCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        caches["default"].clear()
+        self.cache = TieredCache("test", local_maxsize=2)
+        self.loader = mock.Mock(side_effect=lambda: {"loads": self.loader.call_count})
+
+    def _count(self, name, **labels):
+        expected = sorted((("cache", "test"), *labels.items()))
+        return sum(value for series, value in registry.snapshot()["counters"][name] if sorted(map(tuple, series)) == expected)
+
+    def test_local_hit(self):
+        local_hits = self._count("cache_lookups_total", result="local_hit")
+        self.assertEqual(self.cache.get_or_set("a", ["ns"], self.loader), {"loads": 1})
+
+        with mock.patch.object(TieredCache, "backend", new_callable=mock.PropertyMock) as backend:
+            self.assertEqual(self.cache.get_or_set("a", ["ns"], self.loader), {"loads": 1})
+        backend.assert_not_called()
+        self.assertEqual(self.loader.call_count, 1)
+        self.assertEqual(self.cache.stats(), {"local_hits": 1, "remote_hits": 0, "misses": 1, "invalidations": 0, "local_size": 1})
+        self.assertEqual(self._count("cache_lookups_total", result="local_hit"), local_hits + 1)
+
+    def test_falls_through_to_the_shared_tier(self):
+        remote_hits = self._count("cache_lookups_total", result="remote_hit")
+        self.cache.get_or_set("a", ["ns"], self.loader)
+        # another process, with an empty local tier
+        other = TieredCache("test")
+
+        self.assertEqual(other.get_or_set("a", ["ns"], self.loader), {"loads": 1})
+        self.assertEqual(self.loader.call_count, 1)
+        self.assertEqual(other.stats()["remote_hits"], 1)
+        self.assertEqual(self._count("cache_lookups_total", result="remote_hit"), remote_hits + 1)
+
+    def test_invalidation(self):
+        invalidations = self._count("cache_invalidations_total")
+        other = TieredCache("test")
+        self.cache.get_or_set("a", ["ns", "other-ns"], self.loader)
+        other.get_or_set("a", ["ns", "other-ns"], self.loader)
+        self.cache.get_or_set("b", ["other-ns"], self.loader)
+
+        self.cache.invalidate("ns")
+
+        self.assertEqual(self.cache.stats()["local_size"], 1)
+        self.assertEqual(self.cache.get_or_set("a", ["ns", "other-ns"], self.loader), {"loads": 3})
+        self.assertEqual(self.cache.get_or_set("b", ["other-ns"], self.loader), {"loads": 2})
+        # other processes go on serving their local copy until it expires
+        self.assertEqual(other.get_or_set("a", ["ns", "other-ns"], self.loader), {"loads": 1})
+        other.clear_local()
+        self.assertEqual(other.get_or_set("a", ["ns", "other-ns"], self.loader), {"loads": 3})
+        self.assertEqual(self._count("cache_invalidations_total"), invalidations + 1)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        for key in ("a", "b"):
+            self.cache.get_or_set(key, ["ns"], self.loader)
+        self.cache.get_or_set("a", ["ns"], self.loader)
+        self.cache.get_or_set("c", ["ns"], self.loader)
+
+        self.assertEqual(self.cache.stats()["local_size"], 2)
+        self.cache.get_or_set("a", ["ns"], self.loader)
+        self.cache.get_or_set("b", ["ns"], self.loader)
+        self.assertEqual(self.cache.stats(), {"local_hits": 2, "remote_hits": 1, "misses": 3, "invalidations": 0, "local_size": 2})
+
+
+class EventStreamTests(TestCase):
+
+    def test_wsgi_requests_are_refused(self):
+        for url in ("/api/v1/events/", "/api/v1/todo-lists/1/events/"):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 501)
+
+    async def test_asgi_requests_are_served(self):
+        response = await self.async_client.get("/api/v1/events/?last_event_id=invalid")
+        self.assertEqual(response.status_code, 400)
+
+        response = await self.async_client.get("/api/v1/todo-lists/999/events/")
+        self.assertEqual(response.status_code, 404)
+
+
+@shared_task(bind=True, name="todo.tests.telemetry_probe", max_retries=1)
+def telemetry_probe(self, rows=0, fail=False, retry=False):
+    task_telemetry.record_rows(rows)
+    if retry and not self.request.retries:
+        raise self.retry(countdown=0)
+    if fail:
+        raise ValueError("failed")
+
+
+class TaskTelemetryTests(SimpleTestCase):
+
+    LABELS = (("task", telemetry_probe.name), ("queue", "eager"))
+
+    def setUp(self):
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir)
+        settings = override_settings(METRICS_ENABLED=True, TASK_PROFILE="", TASK_PROFILE_DIR=self.profile_dir)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def _histogram(self, name, labels=LABELS):
+        # [sum, count]
+        series = dict((tuple(map(tuple, key)), values) for key, values in registry.snapshot()["histograms"][name])
+        return series.get(labels, [0, 0])[-2:]
+
+    def _counter(self, name, labels):
+        series = dict((tuple(map(tuple, key)), value) for key, value in registry.snapshot()["counters"][name])
+        return series.get(labels, 0)
+
+    def _run(self, task_id, **request):
+        # a worker sets the message headers on the request
+        task = SimpleNamespace(name=telemetry_probe.name, request=Context(delivery_info={"routing_key": "imports"}, **request))
+        task_telemetry._start_run(task_id=task_id, task=task)
+        task_telemetry._finish_run(task_id=task_id, task=task, state="SUCCESS")
+
+    def _profiles(self):
+        return os.listdir(self.profile_dir)
+
+    def test_runs_are_recorded(self):
+        runtime = self._histogram("celery_task_runtime_seconds")
+        rows = self._histogram("celery_task_rows")
+        states = {state: self._counter("celery_tasks_total", self.LABELS + (("state", state),)) for state in ("SUCCESS", "FAILURE")}
+
+        telemetry_probe.apply(kwargs={"rows": 5})
+        telemetry_probe.apply(kwargs={"rows": 2, "fail": True})
+
+        self.assertEqual(self._histogram("celery_task_runtime_seconds")[1], runtime[1] + 2)
+        self.assertEqual(self._histogram("celery_task_rows"), [rows[0] + 7, rows[1] + 2])
+        for state, count in states.items():
+            self.assertEqual(self._counter("celery_tasks_total", self.LABELS + (("state", state),)), count + 1)
+
+    def test_retries_are_counted(self):
+        retries = self._counter("celery_task_retries_total", self.LABELS)
+
+        telemetry_probe.apply(kwargs={"retry": True})
+
+        self.assertEqual(self._counter("celery_task_retries_total", self.LABELS), retries + 1)
+
+    def test_queue_wait(self):
+        labels = (("task", telemetry_probe.name), ("queue", "imports"))
+        headers = {}
+        task_telemetry._stamp_published_at(headers=headers)
+        self.assertAlmostEqual(headers[task_telemetry.PUBLISHED_AT_HEADER], time.time(), delta=5)
+
+        published_at = time.time() - 60
+        wait = self._histogram("celery_task_queue_wait_seconds", labels)
+        self._run("waited", published_at=published_at)
+        # a countdown is not time spent waiting for a worker
+        eta = datetime.fromtimestamp(published_at + 50, dt_timezone.utc).isoformat()
+        self._run("delayed", published_at=published_at, eta=eta)
+
+        total, count = self._histogram("celery_task_queue_wait_seconds", labels)
+        self.assertEqual(count, wait[1] + 2)
+        self.assertAlmostEqual(total - wait[0], 60 + 10, delta=5)
+
+    def test_profile_header(self):
+        self._run("unprofiled")
+        self.assertEqual(self._profiles(), [])
+
+        self._run("profiled", profile=True)
+        self.assertEqual(self._profiles(), [f"{telemetry_probe.name}-profiled.prof"])
+
+    def test_profile_setting(self):
+        for selected, sample_rate, profiled in (
+            ("other_task", 1.0, False),
+            ("telemetry_probe", 0.0, False),
+            ("telemetry_probe", 1.0, True),
+            (f"other_task, {telemetry_probe.name}", 1.0, True),
+            ("*", 1.0, True),
+        ):
+            with self.subTest(selected=selected, sample_rate=sample_rate):
+                with override_settings(TASK_PROFILE=selected, TASK_PROFILE_SAMPLE_RATE=sample_rate):
+                    result = telemetry_probe.apply()
+                self.assertEqual(f"{telemetry_probe.name}-{result.id}.prof" in self._profiles(), profiled)
+
+    def test_profiles_without_metrics(self):
+        runtime = self._histogram("celery_task_runtime_seconds")
+
+        with override_settings(METRICS_ENABLED=False, TASK_PROFILE="*"):
+            result = telemetry_probe.apply()
+
+        self.assertEqual(self._histogram("celery_task_runtime_seconds"), runtime)
+        self.assertEqual(self._profiles(), [f"{telemetry_probe.name}-{result.id}.prof"])
+
+
+class QueryStatsTests(SimpleTestCase):
+
+    def test_transaction_control_is_not_repeated(self):
+        stats = RequestStats()
+        execute = mock.Mock()
+        with collecting(stats):
+            for _ in range(11):
+                for sql in ("BEGIN", 'SAVEPOINT "s1_x1"', "UPDATE todo SET name = %s", 'RELEASE SAVEPOINT "s1_x1"', "COMMIT"):
+                    _time_query(execute, sql, None, False, {})
+
+        self.assertEqual((stats.queries, execute.call_count), (55, 55))
+        self.assertEqual(stats.query_counts, {"UPDATE todo SET name = %s": 11})
+
+
+class TodoReminderTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        InMemoryReminderBackend.outbox.clear()
+        self.todo_list, = self.create_lists(1)
+        self.today = timezone.localdate()
+        self.overdue, self.other, self.upcoming = [
+            Todo.objects.create(list=self.todo_list, title=title, due_date=due_date)
+            for title, due_date in (
+                ("overdue", self.today - timedelta(days=3)),
+                ("other", self.today - timedelta(days=1)),
+                ("upcoming", self.today + timedelta(days=3)),
+            )
+        ]
+
+    def _send(self):
+        InMemoryReminderBackend.outbox.clear()
+        result = SendTodoRemindersUseCase(backend=InMemoryReminderBackend(), concurrency=1, time_budget=60).execute()
+        self.assertTrue(result.finished)
+        return sorted(todo["id"] for reminder in InMemoryReminderBackend.outbox for todo in reminder.todos)
+
+    def _patch(self, todo, data):
+        url = f"/api/v1/todo-lists/{self.todo_list.id}/todos/{todo.id}/"
+        response = self.client.patch(url, data, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_overdue_todos_are_reminded_once(self):
+        self.assertEqual(self._send(), [self.overdue.id, self.other.id])
+        self.assertEqual(InMemoryReminderBackend.outbox[0].list_name, "List 0")
+        self.assertEqual(self._send(), [])
+
+    def test_changing_the_due_date_reschedules(self):
+        self._send()
+
+        self._patch(self.overdue, {"due_date": (self.today - timedelta(days=2)).isoformat()})
+        self.assertEqual(self._send(), [self.overdue.id])
+
+        # the batch endpoint too, and only for todos whose due date changed
+        todos = [
+            {"id": self.overdue.id, "title": "renamed"},
+            {"id": self.other.id, "due_date": (self.today - timedelta(days=2)).isoformat()},
+        ]
+        response = self.client.patch(
+            f"/api/v1/todo-lists/{self.todo_list.id}/todos/batch/", {"todos": todos}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._send(), [self.other.id])
+
+        # not before the new date has passed
+        self._patch(self.overdue, {"due_date": (self.today + timedelta(days=1)).isoformat()})
+        self.assertEqual(self._send(), [])
+
+    def test_completed_and_deleted_todos_are_not_reminded(self):
+        self._patch(self.overdue, {"completed_at": "2024-01-01T00:00:00Z"})
+        response = self.client.delete(f"/api/v1/todo-lists/{self.todo_list.id}/todos/{self.other.id}/")
+        self.assertEqual(response.status_code, 204)
+
+        self.assertEqual(self._send(), [])
+
+
+class TaskAcknowledgementTests(SimpleTestCase):
+
+    def test_only_idempotent_tasks_are_acknowledged_late(self):
+        for task in (tasks.process_todo_upload, tasks.import_todo_chunk):
+            with self.subTest(task=task.name):
+                self.assertFalse(task.acks_late)
+        for task in (
+            tasks.finalize_todo_import,
+            tasks.fail_todo_import,
+            tasks.sync_todo_index,
+            tasks.cleanup_old_todos,
+            tasks.send_todo_reminders,
+            tasks.reconcile_todo_counters,
+        ):
+            with self.subTest(task=task.name):
+                self.assertTrue(task.acks_late)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TodoImportLedgerTests(TestCase):
+
+    def setUp(self):
+        self.file_path = self._write("title,description,due_date\nfirst,,2024-01-01\n")
+        self.enqueue = mock.Mock()
+        self.lock = mock.patch.object(import_todo_file, "redis_lock", return_value=nullcontext())
+        self.lock.start()
+        self.addCleanup(self.lock.stop)
+
+    def _write(self, content):
+        fd, path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(fd, "w") as file:
+            file.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def _submit(self, file_path=None, **kwargs):
+        kwargs.setdefault("todo_list_name", "imported")
+        return import_todo_file.SubmitTodoImportUseCase(file_path or self.file_path, self.enqueue, **kwargs).execute()
+
+    def test_same_file_is_imported_once(self):
+        first = self._submit()
+        # same content under another path
+        second = self._submit(self._write("title,description,due_date\nfirst,,2024-01-01\n"))
+
+        self.assertTrue(first.created)
+        self.assertFalse(second.created)
+        self.assertEqual(second.import_id, first.import_id)
+        self.enqueue.assert_called_once_with(first.import_id)
+
+    def test_other_files_and_lists_are_imported(self):
+        todo_list = TodoList.objects.create(name="existing")
+        submissions = [
+            self._submit(),
+            self._submit(self._write("title,description,due_date\nsecond,,2024-01-01\n")),
+            self._submit(todo_list_name="other"),
+            self._submit(todo_list_id=todo_list.id),
+        ]
+
+        self.assertTrue(all(submission.created for submission in submissions))
+        self.assertEqual(len({submission.import_id for submission in submissions}), 4)
+
+    def test_completed_import_is_not_repeated(self):
+        first = self._submit()
+        todo_list = TodoList.objects.create(name="imported")
+        TodoImport.objects.filter(import_id=first.import_id).update(state=TodoImport.STATE_COMPLETED, todo_list=todo_list)
+
+        second = self._submit()
+        self.assertEqual((second.import_id, second.state, second.created), (first.import_id, TodoImport.STATE_COMPLETED, False))
+
+    def test_failed_import_can_be_submitted_again(self):
+        first = self._submit()
+        import_todo_file.mark_todo_import_failed(first.import_id, error="boom")
+
+        second = self._submit()
+        self.assertTrue(second.created)
+        self.assertNotEqual(second.import_id, first.import_id)
+
+    def test_stale_import_is_failed_and_submitted_again(self):
+        first = self._submit()
+        TodoImport.objects.filter(import_id=first.import_id).update(updated_at=timezone.now() - timedelta(days=1))
+
+        second = self._submit()
+        self.assertTrue(second.created)
+        self.assertEqual(TodoImport.objects.get(import_id=first.import_id).state, TodoImport.STATE_FAILED)
+
+    def test_failed_enqueue_frees_the_file(self):
+        self.enqueue.side_effect = ConnectionError("broker down")
+        with self.assertRaises(ConnectionError):
+            self._submit()
+
+        self.enqueue.side_effect = None
+        self.assertTrue(self._submit().created)
+
+    def test_unique_constraint_catches_a_racing_submission(self):
+        first = self._submit()
+        existing = TodoImport.objects.get(import_id=first.import_id)
+        # the racing submission looked before the first one was recorded
+        with mock.patch.object(import_todo_file.SubmitTodoImportUseCase, "_find", side_effect=[None, existing]):
+            second = self._submit()
+
+        self.assertEqual((second.import_id, second.created), (first.import_id, False))
+        self.assertEqual(TodoImport.objects.count(), 1)
+        self.enqueue.assert_called_once_with(first.import_id)
+
+    def test_without_redis_the_ledger_still_dedupes(self):
+        for error in (redis.ConnectionError("unreachable"), import_todo_file.LockTimeout("held")):
+            with self.subTest(error=type(error).__name__):
+                TodoImport.objects.all().delete()
+                self.enqueue.reset_mock()
+                with mock.patch.object(import_todo_file, "redis_lock", side_effect=error):
+                    first = self._submit()
+                    second = self._submit()
+
+                self.assertEqual((first.created, second.created), (True, False))
+                self.enqueue.assert_called_once_with(first.import_id)
+
+
+class ConditionalRequestTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.todo_list, self.other_list = self.create_lists(2, todos_per_list=2)
+
+    def _revalidate(self, url, response, expected_status):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, expected_status)
+        return response
+
+    def _write(self, method, url, data=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(url, data, content_type="application/json")
+        self.assertLess(response.status_code, 300)
+
+    def test_unchanged_resources_are_not_modified(self):
+        for url in (
+            "/api/v1/todo-lists/",
+            f"/api/v1/todo-lists/{self.todo_list.id}/",
+            f"/api/v1/todo-lists/{self.todo_list.id}/todos/",
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response["Cache-Control"], "no-cache")
+                self.assertTrue(response["ETag"].startswith('W/"'))
+
+                # the validators come from the read cache
+                with self.assertNumQueries(0):
+                    not_modified = self._revalidate(url, response, 304)
+                self.assertEqual(not_modified.content, b"")
+                self.assertEqual(not_modified["ETag"], response["ETag"])
+
+                not_modified = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+                self.assertEqual(not_modified.status_code, 304)
+
+    def test_other_pages_share_the_etag(self):
+        response = self.client.get("/api/v1/todo-lists/?page_size=1")
+        self._revalidate("/api/v1/todo-lists/?page_size=1&page=2", response, 304)
+
+    def test_todo_writes_change_the_etags_of_their_list(self):
+        list_url = f"/api/v1/todo-lists/{self.todo_list.id}/"
+        todos_url = f"{list_url}todos/"
+        other_url = f"/api/v1/todo-lists/{self.other_list.id}/"
+        todo = self.todo_list.todos.first()
+        writes = [
+            ("post", todos_url, {"title": "new", "due_date": "2024-03-01"}),
+            ("patch", f"{todos_url}{todo.id}/", {"title": "renamed"}),
+            ("patch", f"{todos_url}batch/", {"todos": [{"id": todo.id, "description": "changed"}]}),
+            ("delete", f"{todos_url}{todo.id}/", None),
+        ]
+        for method, url, data in writes:
+            with self.subTest(method=method, url=url):
+                before = [self.client.get(read_url) for read_url in ("/api/v1/todo-lists/", list_url, todos_url, other_url)]
+                self._write(method, url, data)
+
+                for read_url, response in zip(("/api/v1/todo-lists/", list_url, todos_url), before):
+                    self._revalidate(read_url, response, 200)
+                self._revalidate(other_url, before[3], 304)
+
+    def test_list_writes_change_the_list_page_etag(self):
+        writes = [
+            ("post", "/api/v1/todo-lists/", {"name": "new"}),
+            ("patch", f"/api/v1/todo-lists/{self.todo_list.id}/", {"name": "renamed"}),
+            ("delete", f"/api/v1/todo-lists/{self.todo_list.id}/", None),
+        ]
+        for method, url, data in writes:
+            with self.subTest(method=method):
+                before = self.client.get("/api/v1/todo-lists/")
+                self._write(method, url, data)
+                self._revalidate("/api/v1/todo-lists/", before, 200)
+
+    async def test_async_views(self):
+        factory = AsyncRequestFactory()
+        views = [
+            ("/api/v1/todo-lists/", AsyncListTodoListsView.as_view(), {}),
+            (f"/api/v1/todo-lists/{self.todo_list.id}/", AsyncSingleTodoListView.as_view(), {"list_id": self.todo_list.id}),
+        ]
+        for url, view, kwargs in views:
+            with self.subTest(url=url):
+                response = await view(factory.get(url), **kwargs)
+                self.assertEqual(response.status_code, 200)
+                response = await view(factory.get(url, headers={"If-None-Match": response["ETag"]}), **kwargs)
+                self.assertEqual(response.status_code, 304)
+
+
+class TodoCounterTests(ApiTestCase):
+    """
+    (todos_count, overdue_count, due_soon_count) of a list after each kind
+    of write.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.todo_list, = self.create_lists(1)
+        self.today = timezone.localdate()
+        self.url = f"/api/v1/todo-lists/{self.todo_list.id}/todos/"
+
+    def _due(self, days):
+        return (self.today + timedelta(days=days)).isoformat()
+
+    def _counters(self, todo_list=None):
+        todo_list = todo_list or self.todo_list
+        return tuple(TodoList.objects.filter(id=todo_list.id).values_list("todos_count", "overdue_count", "due_soon_count").get())
+
+    def _request(self, method, url, data=None):
+        response = getattr(self.client, method)(url, data, content_type="application/json")
+        self.assertLess(response.status_code, 300, response.content)
+        return response.json() if response.content else None
+
+    def test_single_writes(self):
+        overdue = self._request("post", self.url, {"title": "overdue", "due_date": self._due(-1)})
+        self._request("post", self.url, {"title": "soon", "due_date": self._due(2)})
+        later = self._request("post", self.url, {"title": "later", "due_date": self._due(30)})
+        self.assertEqual(self._counters(), (3, 1, 1))
+
+        self._request("patch", f"{self.url}{overdue['id']}/", {"completed_at": "2024-01-01T00:00:00Z"})
+        self.assertEqual(self._counters(), (3, 0, 1))
+        self._request("patch", f"{self.url}{overdue['id']}/", {"completed_at": None})
+        self.assertEqual(self._counters(), (3, 1, 1))
+        self._request("patch", f"{self.url}{later['id']}/", {"due_date": self._due(0)})
+        self.assertEqual(self._counters(), (3, 1, 2))
+        self._request("patch", f"{self.url}{later['id']}/", {"title": "renamed"})
+        self.assertEqual(self._counters(), (3, 1, 2))
+
+        self._request("delete", f"{self.url}{overdue['id']}/")
+        self.assertEqual(self._counters(), (2, 0, 2))
+
+    def test_batch_writes(self):
+        created = self._request("post", f"{self.url}batch/", {"todos": [
+            {"title": "overdue", "due_date": self._due(-5)},
+            {"title": "soon", "due_date": self._due(6)},
+            {"title": "later", "due_date": self._due(7)},
+            {"title": "x" * 201},
+        ]})["results"]
+        self.assertEqual(self._counters(), (3, 1, 1))
+
+        ids = [todo["id"] for todo in created]
+        self._request("patch", f"{self.url}batch/", {"todos": [
+            {"id": ids[0], "completed_at": "2024-01-01T00:00:00Z"},
+            {"id": ids[2], "due_date": self._due(-1)},
+        ]})
+        self.assertEqual(self._counters(), (3, 1, 1))
+
+        self._request("delete", f"{self.url}batch/", {"ids": ids[1:]})
+        self.assertEqual(self._counters(), (1, 0, 0))
+
+    def test_imports(self):
+        other, = self.create_lists(1)
+        todos = [
+            Todo(list=self.todo_list, title="overdue", description="", due_date=self.today - timedelta(days=1)),
+            Todo(list=other, title="soon", description="", due_date=self.today),
+        ]
+        bulk_insert_todos(todos, use_copy=False)
+        self.assertEqual((self._counters(), self._counters(other)), ((1, 1, 0), (1, 0, 1)))
+
+        # an existing key is updated in place, a new one added
+        upsert_todos([
+            Todo(list=self.todo_list, title="overdue", description="changed", due_date=self.today - timedelta(days=1)),
+            Todo(list=self.todo_list, title="new", description="", due_date=self.today + timedelta(days=60)),
+        ], use_copy=False)
+        self.assertEqual(self._counters(), (2, 1, 0))
+
+    def test_cleanup(self):
+        old = timezone.now() - timedelta(days=400)
+        self._request("post", self.url, {"title": "open", "due_date": self._due(-1)})
+        done = self._request("post", self.url, {"title": "done", "due_date": self._due(-1)})
+        # completed long ago, with the counters to match
+        Todo.objects.filter(id=done["id"]).update(completed_at=old)
+        TodoList.objects.filter(id=self.todo_list.id).update(overdue_count=1)
+
+        with mock.patch.object(cleanup_old_todos, "delete_indexed_todos", return_value=BulkResult(succeeded=1)):
+            result = cleanup_old_todos.CleanupOldTodosUseCase(retention_days=30).execute()
+        self.assertEqual(result.todos_deleted, 1)
+        self.assertEqual(self._counters(), (1, 1, 0))
+
+    def test_reconcile_corrects_drift_and_date_rollover(self):
+        other, = self.create_lists(1)
+        self._request("post", self.url, {"title": "soon", "due_date": self._due(1)})
+        self._request("post", self.url, {"title": "later", "due_date": self._due(10)})
+        self.assertEqual(self._counters(), (2, 0, 1))
+        # written around the domain functions
+        TodoList.objects.filter(id=other.id).update(todos_count=5)
+        before = self.client.get(f"/api/v1/todo-lists/{other.id}/")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = ReconcileTodoCountersUseCase(batch_size=1).execute()
+        self.assertEqual((result.lists_checked, result.lists_corrected, result.batches), (2, 1, 2))
+        self.assertEqual(self._counters(other), (0, 0, 0))
+        # corrected lists are served fresh
+        self.assertEqual(self.client.get(f"/api/v1/todo-lists/{other.id}/", HTTP_IF_NONE_MATCH=before["ETag"]).status_code, 200)
+
+        with mock.patch("django.utils.timezone.localdate", return_value=self.today + timedelta(days=5)):
+            result = ReconcileTodoCountersUseCase().execute()
+        self.assertEqual(result.lists_corrected, 1)
+        self.assertEqual(self._counters(), (2, 1, 1))
+
+
+class ExportTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.first, self.second = self.create_lists(2)
+        self.todos = [
+            Todo.objects.create(
+                list=self.first, title="later", description='with, "quotes"\nand a line break', due_date=date(2024, 2, 1)
+            ),
+            Todo.objects.create(list=self.first, title="sooner", description="", due_date=date(2024, 1, 1)),
+            Todo.objects.create(list=self.second, title="other list", description="", due_date=date(2023, 1, 1)),
+        ]
+
+    def _get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, b"".join(response.streaming_content)
+
+    def test_list_as_csv(self):
+        response, body = self._get(f"/api/v1/todo-lists/{self.first.id}/export/")
+
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertEqual(response["Content-Disposition"], f'attachment; filename="todo-list-{self.first.id}.csv"')
+        rows = list(csv.DictReader(io.StringIO(body.decode())))
+        self.assertEqual(list(rows[0]), ["id", "list_id", "title", "description", "due_date", "completed_at", "created_at", "updated_at"])
+        self.assertEqual(
+            [(row["title"], row["description"], row["due_date"], row["completed_at"]) for row in rows],
+            [("sooner", "", "2024-01-01", ""), ("later", 'with, "quotes"\nand a line break', "2024-02-01", "")],
+        )
+
+    def test_all_lists_as_ndjson(self):
+        _, body = self._get("/api/v1/todo-lists/export/?format=ndjson")
+
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual([row["title"] for row in rows], ["sooner", "later", "other list"])
+        self.assertEqual(rows[0]["list_id"], self.first.id)
+
+    def test_gzip(self):
+        _, plain = self._get("/api/v1/todo-lists/export/")
+        response, body = self._get("/api/v1/todo-lists/export/?compression=gzip")
+
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="todos.csv.gz"')
+        self.assertEqual(gzip.decompress(body), plain)
+
+    async def test_streams_under_asgi(self):
+        response = await self.async_client.get(f"/api/v1/todo-lists/{self.second.id}/export/?format=ndjson")
+
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual([json.loads(line)["title"] for line in body.decode().splitlines()], ["other list"])
+
+    def test_errors(self):
+        self.assertEqual(self.client.get("/api/v1/todo-lists/999/export/").status_code, 404)
+        self.assertEqual(self.client.get("/api/v1/todo-lists/export/?format=xml").status_code, 400)
+        self.assertEqual(self.client.get("/api/v1/todo-lists/export/?compression=zip").status_code, 400)
+
+
+class ReaderTests(SimpleTestCase):
+
+    CSV = "title,description,due_date\nfirst,,2024-01-01\nsecond,\"two\nlines\",2024-01-02\n\nthird,short\n"
+
+    def _file(self, content, suffix=".csv"):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, "wb") as file:
+            file.write(content.encode("utf-8") if isinstance(content, str) else content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def _rows(self, path, **options):
+        return list(readers.open_reader(path, date_columns=["due_date"], **options))
+
+    def test_csv(self):
+        rows = self._rows(self._file("﻿" + self.CSV))
+
+        self.assertEqual(rows, [
+            {"title": "first", "description": "", "due_date": date(2024, 1, 1)},
+            {"title": "second", "description": "two\nlines", "due_date": date(2024, 1, 2)},
+            {"title": "third", "description": "short", "due_date": None},
+        ])
+
+    def test_csv_columns_and_tuples(self):
+        path = self._file(self.CSV)
+
+        self.assertEqual(
+            self._rows(path, columns=["due_date", "title"], as_tuples=True),
+            [(date(2024, 1, 1), "first"), (date(2024, 1, 2), "second"), (None, "third")],
+        )
+        self.assertEqual([len(batch) for batch in readers.CsvReader(path).batches(2)], [2, 1])
+
+    def test_quoted_newlines_across_blocks(self):
+        rows = [("title", "description", "due_date")] + [
+            (f"todo {i}", "line\n" * (i % 5) + "end", "2024-01-01") for i in range(200)
+        ]
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerows(rows)
+        path = self._file("﻿" + buffer.getvalue())
+
+        # blocks cut at line breaks inside the quoted values
+        with mock.patch.object(readers, "BLOCK_SIZE", 64):
+            read = list(readers.CsvReader(path, as_tuples=True))
+
+        self.assertEqual(read, rows[1:])
+
+    def test_compressed_streams(self):
+        content = ("﻿" + self.CSV).encode("utf-8")
+        files = [("gzip", ".csv.gz", gzip.compress(content))]
+        if readers.zstandard is not None:
+            files.append(("zstd", ".csv.zst", readers.zstandard.ZstdCompressor().compress(content)))
+        for kind, suffix, compressed in files:
+            with self.subTest(kind):
+                path = self._file(compressed, suffix=suffix)
+                self.assertEqual(readers.compression(path), kind)
+                self.assertEqual(readers.file_format(path), "csv")
+                self.assertEqual(self._rows(path), self._rows(self._file(self.CSV)))
+                with self.assertRaises(ValueError):
+                    list(readers.CsvReader(path, start=10))
+
+    def test_byte_ranges(self):
+        content = "title,description,due_date\n" + "".join(f"todo {i},,2024-01-01\n" for i in range(100))
+        path = self._file("﻿" + content)
+        fieldnames, ranges = split_csv_file(path, 100)
+
+        rows = [
+            row
+            for start, end in ranges
+            for row in readers.CsvReader(path, fieldnames=fieldnames, start=start, end=end)
+        ]
+
+        self.assertGreater(len(ranges), 1)
+        self.assertEqual([row["title"] for row in rows], [f"todo {i}" for i in range(100)])
+        # a range past the header takes its names from the file
+        start, end = ranges[1]
+        self.assertEqual(
+            list(readers.CsvReader(path, start=start, end=end)),
+            list(readers.CsvReader(path, fieldnames=fieldnames, start=start, end=end)),
+        )
+
+    def test_ndjson(self):
+        path = self._file('{"title": "first", "due_date": "2024-01-01"}\n\n{"title": "second", "description": "text"}\n', suffix=".ndjson")
+
+        self.assertEqual(self._rows(path), [
+            {"title": "first", "due_date": date(2024, 1, 1)},
+            {"title": "second", "due_date": None},
+        ])
+        self.assertEqual(self._rows(path, columns=["title", "description", "due_date"]), [
+            {"title": "first", "description": None, "due_date": date(2024, 1, 1)},
+            {"title": "second", "description": "text", "due_date": None},
+        ])
+
+    @skipUnless(readers.pyarrow, "pyarrow is not installed")
+    def test_parquet_and_arrow(self):
+        table = readers.pyarrow.table({
+            "title": [f"todo {i}" for i in range(5)],
+            "description": ["", None, "text", "", ""],
+            "due_date": [date(2024, 1, i + 1) for i in range(5)],
+        })
+        writers = {
+            ".parquet": lambda path: readers.pyarrow.parquet.write_table(table, path, row_group_size=2),
+            ".arrow": self._arrow_writer(table, readers.pyarrow.ipc.new_file),
+            ".ipc": self._arrow_writer(table, readers.pyarrow.ipc.new_stream),
+        }
+        for suffix, write in writers.items():
+            with self.subTest(suffix):
+                path = self._file(b"", suffix=suffix)
+                write(path)
+                reader = readers.open_reader(path, columns=["title", "due_date"], date_columns=["due_date"])
+                self.assertEqual([len(batch) for batch in reader.batches(2)], [2, 2, 1])
+                self.assertEqual(list(reader)[1], {"title": "todo 1", "due_date": date(2024, 1, 2)})
+                self.assertEqual(readers.open_reader(path).fieldnames, ["title", "description", "due_date"])
+
+    def _arrow_writer(self, table, new_writer):
+        def write(path):
+            with new_writer(path, table.schema) as writer:
+                writer.write_table(table, max_chunksize=2)
+        return write
+
+    def test_unsupported_format(self):
+        with self.assertRaises(ValueError):
+            readers.open_reader("todos.csv", format="xml")
+
+    def test_parse_dates(self):
+        self.assertEqual(readers.parse_dates(["2024-01-01", "2024-01-02"]), [date(2024, 1, 1), date(2024, 1, 2)])
+        self.assertEqual(
+            readers.parse_dates([" 2024-01-01 ", date(2024, 1, 2), "", None]),
+            [date(2024, 1, 1), date(2024, 1, 2), None, None],
+        )
+
+
+class TodoImportFileTests(TestCase):
+    """
+    Imports planned and run chunk by chunk, as the import chord does.
+    """
+
+    def _write(self, content, suffix=".csv"):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, "w") as file:
+            file.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def _import(self, file_path, **kwargs):
+        plan = import_todo_file.PlanTodoImportUseCase("import", "imported", file_path, **kwargs).execute()
+        results = [
+            import_todo_file.ImportTodoChunkUseCase(
+                plan.import_id, plan.todo_list_id, file_path, start, end, plan.fieldnames
+            ).execute()
+            for start, end in plan.ranges
+        ]
+        return plan, results
+
+    def _todos(self, plan):
+        return list(Todo.objects.filter(list_id=plan.todo_list_id).order_by("id").values_list("title", "description", "due_date"))
+
+    def test_blank_description_is_stored_empty(self):
+        # COPY reads unquoted empty fields as NULL unless told otherwise
+        plan, results = self._import(self._write("title,description,due_date\nfirst,,2024-01-01\nsecond,text,2024-01-02\n"))
+
+        self.assertEqual((results[0].rows_imported, results[0].rows_skipped), (2, 0))
+        self.assertEqual(self._todos(plan), [("first", "", date(2024, 1, 1)), ("second", "text", date(2024, 1, 2))])
+
+    def test_invalid_rows_are_skipped(self):
+        plan, results = self._import(self._write("title,description,due_date\n,no title,2024-01-01\nok,,not a date\nkept,,2024-01-03\n"))
+
+        self.assertEqual((results[0].rows_imported, results[0].rows_skipped), (1, 2))
+        self.assertEqual(self._todos(plan), [("kept", "", date(2024, 1, 3))])
+
+    def test_rows_are_indexed_through_the_outbox(self):
+        plan, _ = self._import(self._write("title,description,due_date\nfirst,,2024-01-01\nsecond,,2024-01-02\n"))
+
+        todo_ids = Todo.objects.filter(list_id=plan.todo_list_id).order_by("id").values_list("id", flat=True)
+        self.assertEqual(
+            sorted(TodoOutbox.objects.values_list("todo_id", "operation")),
+            [(todo_id, TodoOutbox.OPERATION_INDEX) for todo_id in todo_ids],
+        )
+
+    def test_csv_is_split_into_line_aligned_ranges(self):
+        content = "title,description,due_date\n" + "".join(f"todo {i},{'x' * (i % 7)},2024-01-01\n" for i in range(50))
+        path = self._write(content)
+
+        fieldnames, ranges = split_csv_file(path, 64)
+
+        self.assertEqual(fieldnames, ["title", "description", "due_date"])
+        self.assertEqual(ranges[0][0], len("title,description,due_date\n"))
+        self.assertEqual(ranges[-1][1], len(content))
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, start)
+            self.assertEqual(content[start - 1], "\n")
+        self.assertEqual(split_csv_file(self._write("title,description,due_date\n"), 64)[1], [])
+        with self.assertRaises(ValueError):
+            split_csv_file(path, 0)
+
+    def test_rows_are_counted_by_the_csv_parser(self):
+        path = self._write('title,description,due_date\nfirst,"two\nlines",2024-01-01\n\nsecond,,2024-01-02')
+
+        self.assertEqual(count_csv_rows(path), 2)
+        plan, results = self._import(path)
+        self.assertEqual(plan.rows_total, 2)
+        self.assertEqual(results[0].rows_imported, 2)
+
+    def test_chunks_are_imported_by_the_chord(self):
+        path = self._write("title,description,due_date\n" + "".join(f"todo {i},,2024-01-01\n" for i in range(100)))
+
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(setattr, celery_app.conf, "task_always_eager", False)
+        with override_settings(TODO_UPLOAD_CHUNK_BYTES=256):
+            result = tasks.process_todo_upload.apply(args=[path, "imported"], task_id="chord-import").get()
+
+        self.assertGreater(result["chunks"], 1)
+        self.assertEqual(Todo.objects.filter(list_id=result["todo_list_id"]).count(), 100)
+        progress = import_todo_file.todo_import_progress("chord-import").get()
+        self.assertEqual(progress["status"], "completed")
+        self.assertEqual((progress["rows_total"], progress["rows_done"]), (100, 100))
+        self.assertEqual(progress["chunks_done"], result["chunks"])
+
+    def test_finalize_records_the_totals(self):
+        todo_list = TodoList.objects.create(name="imported")
+        spool_dir = tempfile.mkdtemp()
+        self.addCleanup(os.rmdir, spool_dir)
+        file_path = os.path.join(spool_dir, "upload.csv")
+        open(file_path, "w").close()
+        TodoImport.objects.create(
+            import_id="finalized", content_hash="hash", destination="name:imported", file_path=file_path,
+            state=TodoImport.STATE_RUNNING, todo_list=todo_list,
+        )
+        import_todo_file.todo_import_progress("finalized").start(todo_list_id=todo_list.id)
+
+        with override_settings(TODO_UPLOAD_SPOOL_DIR=spool_dir):
+            result = import_todo_file.FinalizeTodoImportUseCase("finalized", todo_list.id, [
+                {"rows_imported": 3, "rows_skipped": 1},
+                {"rows_imported": 2, "rows_skipped": 0},
+            ]).execute()
+
+        self.assertEqual((result.rows_imported, result.rows_skipped), (5, 1))
+        self.assertEqual(import_todo_file.todo_import_progress("finalized").get()["status"], "completed")
+        self.assertEqual(
+            [import_todo_file.get_todo_import("finalized")[name] for name in ("state", "rows_imported", "rows_skipped")],
+            [TodoImport.STATE_COMPLETED, 5, 1],
+        )
+        self.assertFalse(os.path.exists(file_path))
+
+    def test_failed_chunk_fails_the_import(self):
+        TodoImport.objects.create(
+            import_id="failing", content_hash="hash", destination="name:imported", file_path="/data/todos.csv",
+            state=TodoImport.STATE_RUNNING,
+        )
+        import_todo_file.todo_import_progress("failing").start()
+
+        # the chord calls its error callback with the failed task's request
+        tasks.fail_todo_import.apply(args=["request", "error", "traceback"], kwargs={"import_id": "failing"}).get()
+
+        self.assertEqual(import_todo_file.todo_import_progress("failing").get()["status"], "failed")
+        todo_import = TodoImport.objects.get(import_id="failing")
+        self.assertEqual((todo_import.state, todo_import.error), (TodoImport.STATE_FAILED, "An import chunk failed"))
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_task_status_reports_the_progress(self):
+        plan, _ = self._import(self._write("title,description,due_date\nfirst,,2024-01-01\n,,2024-01-02\n"))
+
+        response = self.client.get(f"/api/v1/tasks/{plan.import_id}/").json()
+
+        self.assertEqual(response["task_id"], plan.import_id)
+        self.assertEqual(response["progress"]["status"], "running")
+        self.assertEqual(response["progress"]["todo_list_id"], plan.todo_list_id)
+        self.assertEqual(
+            [response["progress"][name] for name in ("rows_total", "rows_done", "rows_skipped", "chunks_total", "chunks_done")],
+            [2, 1, 1, 1, 1],
+        )
+        self.assertIsNone(response["import"])
+        self.assertIsNone(self.client.get("/api/v1/tasks/unknown/").json()["progress"])
+
+    def test_ndjson_records_with_different_fields(self):
+        # the first record alone would leave out the description
+        path = self._write(
+            '{"title": "first", "due_date": "2024-01-01"}\n'
+            '{"title": "second", "description": "text", "due_date": "2024-01-02"}\n',
+            suffix=".ndjson",
+        )
+
+        plan, results = self._import(path)
+
+        self.assertEqual(plan.ranges, [(0, None)])
+        self.assertEqual(results[0].rows_imported, 2)
+        self.assertEqual(self._todos(plan), [("first", "", date(2024, 1, 1)), ("second", "text", date(2024, 1, 2))])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class UploadTodoFileTests(TestCase):
+
+    CONTENT = b"title,description,due_date\nfirst,,2024-01-01\nsecond,,2024-01-02\n"
+
+    def setUp(self):
+        self.spool_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.spool_dir)
+        settings = override_settings(TODO_UPLOAD_SPOOL_DIR=self.spool_dir)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        lock = mock.patch.object(import_todo_file, "redis_lock", return_value=nullcontext())
+        lock.start()
+        self.addCleanup(lock.stop)
+        subtask = mock.patch("todo.interfaces.views.tasks.subtask")
+        self.task = subtask.start().return_value
+        self.addCleanup(subtask.stop)
+
+    def _upload(self, content=CONTENT, name="todos.csv", **data):
+        return self.client.post("/api/v1/tasks/upload/file/", {"file": SimpleUploadedFile(name, content), **data})
+
+    def _spooled(self):
+        return sorted(os.listdir(self.spool_dir))
+
+    def test_upload_is_spooled_and_submitted(self):
+        with mock.patch.object(import_todo_file, "hash_file") as hash_file:
+            response = self._upload(todo_list_name="imported")
+
+        self.assertEqual(response.status_code, 202)
+        body = response.json()
+        self.assertEqual(body["size"], len(self.CONTENT))
+        # hashed while it streamed in, not read again
+        self.assertEqual(body["content_hash"], hashlib.sha256(self.CONTENT).hexdigest())
+        hash_file.assert_not_called()
+        spooled, = self._spooled()
+        self.assertTrue(spooled.endswith(".csv"))
+        path = os.path.join(self.spool_dir, spooled)
+        with open(path, "rb") as file:
+            self.assertEqual(file.read(), self.CONTENT)
+        self.task.apply_async.assert_called_once_with(
+            args=[path, "imported"], kwargs={"todo_list_id": None, "upsert": False}, task_id=body["task_id"],
+        )
+        self.assertEqual(TodoImport.objects.get(import_id=body["task_id"]).file_path, path)
+
+    def test_oversize_upload_is_rejected(self):
+        with override_settings(TODO_UPLOAD_MAX_BYTES=len(self.CONTENT) - 1):
+            response = self._upload()
+
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(self._spooled(), [])
+        self.task.apply_async.assert_not_called()
+
+    def test_duplicate_upload_is_discarded(self):
+        first = self._upload(todo_list_name="imported").json()
+        spooled = self._spooled()
+
+        response = self._upload(todo_list_name="imported")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()["duplicate"], response.json()["task_id"]), (True, first["task_id"]))
+        self.assertEqual(self._spooled(), spooled)
+        self.task.apply_async.assert_called_once()
+
+    def test_bad_requests_leave_no_spool_file(self):
+        for data, expected_status in (({"todo_list_id": "x"}, 400), ({"todo_list_id": 999}, 404)):
+            with self.subTest(data=data):
+                self.assertEqual(self._upload(**data).status_code, expected_status)
+                self.assertEqual(self._spooled(), [])
+        response = self.client.post("/api/v1/tasks/upload/file/", {"todo_list_name": "imported"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_handler_streams_chunks_to_the_spool_file(self):
+        handler = SpoolingUploadHandler(self.spool_dir, max_bytes=10)
+        handler.new_file("other", "other.txt", "text/plain", None)
+        self.assertEqual(handler.receive_data_chunk(b"passed on", 0), b"passed on")
+
+        with self.assertRaises(StopFutureHandlers):
+            handler.new_file("file", "Todos.CSV.GZ", "application/gzip", None)
+        for start, chunk in ((0, b"abcd"), (4, b"efgh")):
+            self.assertIsNone(handler.receive_data_chunk(chunk, start))
+        upload = handler.file_complete(8)
+
+        self.assertEqual((upload.name, upload.size), ("Todos.CSV.GZ", 8))
+        self.assertEqual(upload.content_hash, hashlib.sha256(b"abcdefgh").hexdigest())
+        self.assertTrue(upload.path.endswith(".csv.gz"))
+        with open(upload.path, "rb") as file:
+            self.assertEqual(file.read(), b"abcdefgh")
+
+        handler.discard()
+        self.assertFalse(os.path.exists(upload.path))
+
+    def test_handler_stops_at_max_bytes(self):
+        handler = SpoolingUploadHandler(self.spool_dir, max_bytes=6)
+        with self.assertRaises(StopFutureHandlers):
+            handler.new_file("file", "todos.csv;rm", "text/csv", None)
+        self.assertFalse(handler.path.endswith("rm"))
+        handler.receive_data_chunk(b"abcd", 0)
+
+        with self.assertRaises(StopUpload):
+            handler.receive_data_chunk(b"efgh", 4)
+
+        self.assertTrue(handler.too_large)
+        self.assertEqual(self._spooled(), [])
+
+
+class SearchTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.todo_list, self.other_list = TodoList.objects.bulk_create([TodoList(name="groceries"), TodoList(name="work")])
+        bulk_insert_todos([
+            Todo(list=self.todo_list, title="Buy milk", description="", due_date=date(2024, 1, 2)),
+            Todo(list=self.todo_list, title="Bread", description="and MILK", due_date=date(2024, 1, 1)),
+            Todo(list=self.todo_list, title="Milk again", description="", due_date=date(2024, 3, 1)),
+            Todo(list=self.todo_list, title="Eggs", description="", due_date=date(2024, 1, 3)),
+            Todo(list=self.other_list, title="Milk the numbers", description="", due_date=date(2024, 1, 1)),
+        ], use_copy=False)
+        self.client_es = mock.Mock()
+        search = TodoIndex.search
+        patcher = mock.patch.object(TodoIndex, "search", lambda: search(using=self.client_es))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _hits(self, *todos):
+        self.client_es.search.return_value.body = {"hits": {"hits": [
+            {"_source": todo_search.todo_source(todo), "sort": [1.5, todo.due_date.isoformat(), todo.id]}
+            for todo in todos
+        ]}}
+
+    def _search(self, **params):
+        response = self.client.get("/api/v1/todos/search/", params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def _sent(self):
+        return self.client_es.search.call_args.kwargs["body"]
+
+    def test_query_and_filters(self):
+        todo = Todo.objects.get(title="Buy milk")
+        self._hits(todo)
+
+        page = self._search(q="milk", list_id=self.todo_list.id, due_date_from="2024-01-01", due_date_to="2024-02-01")
+
+        self.assertEqual(page["results"], [
+            {"id": todo.id, "title": "Buy milk", "description": "", "due_date": "2024-01-02", "list_id": self.todo_list.id},
+        ])
+        self.assertIsNone(page["next_cursor"])
+        body = self._sent()
+        self.assertEqual(body["query"]["bool"]["must"], [{"multi_match": {"query": "milk", "fields": ["title^2", "description"]}}])
+        self.assertEqual(body["query"]["bool"]["filter"], [
+            {"term": {"list_id": str(self.todo_list.id)}},
+            {"range": {"due_date": {"gte": "2024-01-01", "lte": "2024-02-01"}}},
+        ])
+        self.assertEqual(body["sort"], todo_search.SEARCH_SORT)
+        self.assertEqual((body["size"], body["track_total_hits"]), (11, False))
+        self.assertEqual(body["_source"], todo_search.SEARCH_SOURCE)
+
+    def test_search_after_cursor(self):
+        todos = list(Todo.objects.filter(list=self.todo_list).order_by("id"))
+        self._hits(*todos[:3])
+
+        page = self._search(q="milk", page_size=2)
+        self.assertEqual([todo["id"] for todo in page["results"]], [todo.id for todo in todos[:2]])
+
+        self._hits(todos[2])
+        next_page = self._search(q="milk", page_size=2, cursor=page["next_cursor"])
+
+        self.assertEqual(self._sent()["search_after"], [1.5, todos[1].due_date.isoformat(), todos[1].id])
+        self.assertEqual([todo["id"] for todo in next_page["results"]], [todos[2].id])
+        self.assertIsNone(next_page["next_cursor"])
+
+    def test_database_fallback(self):
+        self.client_es.search.side_effect = elasticsearch.ConnectionError("unreachable")
+
+        page = self._search(q="milk", list_id=self.todo_list.id, due_date_to="2024-02-01", page_size=1)
+        self.assertEqual([todo["title"] for todo in page["results"]], ["Bread"])
+        self.assertEqual(page["results"][0]["due_date"], "2024-01-01")
+
+        # the fallback cursor keeps the next pages on the database
+        self.client_es.search.reset_mock()
+        next_page = self._search(q="milk", list_id=self.todo_list.id, due_date_to="2024-02-01", cursor=page["next_cursor"])
+        self.assertEqual([todo["title"] for todo in next_page["results"]], ["Buy milk"])
+        self.client_es.search.assert_not_called()
+
+    def test_bad_parameters(self):
+        for params in (
+            {"due_date_from": "soon"},
+            {"list_id": "groceries"},
+            {"page_size": 0},
+            {"cursor": "%%%"},
+            {"cursor": encode_cursor([1.5])},
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get("/api/v1/todos/search/", params).status_code, 400)
+        self.client_es.search.assert_not_called()
+
+
+class SyncTodoIndexTests(TestCase):
+
+    def setUp(self):
+        todo_list = TodoList.objects.create(name="List")
+        self.todos = Todo.objects.bulk_create([Todo(list=todo_list, title=f"Todo {i}", due_date=date(2024, 1, 1)) for i in range(3)])
+        self.indexed = []
+        self.failing = set()
+        for name in ("index_todos", "delete_indexed_todos"):
+            patcher = mock.patch.object(sync_todo_index, name, side_effect=self._bulk)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _bulk(self, items):
+        ids = [getattr(item, "id", item) for item in items]
+        self.indexed.extend(ids)
+        failed = [{"index": {"_id": todo_id, "status": 503}} for todo_id in ids if todo_id in self.failing]
+        return BulkResult(succeeded=len(ids) - len(failed), failed=failed)
+
+    def _record(self, *todos):
+        TodoOutbox.objects.bulk_create([TodoOutbox(todo_id=todo.id, operation=TodoOutbox.OPERATION_INDEX) for todo in todos])
+
+    def _sync(self):
+        self.indexed = []
+        return sync_todo_index.SyncTodoIndexUseCase(batch_size=10).execute()
+
+    def test_drained_events_are_deleted(self):
+        self._record(*self.todos)
+        result = self._sync()
+
+        self.assertEqual(sorted(self.indexed), [todo.id for todo in self.todos])
+        self.assertEqual((result.events_processed, result.events_kept), (3, 0))
+        self.assertFalse(TodoOutbox.objects.exists())
+
+    def test_events_are_kept_during_a_reindex_and_replayed_after(self):
+        first, second, third = self.todos
+        JobCheckpoint.objects.create(name=REINDEX_CHECKPOINT_NAME, state={"index": "todo-v2"})
+        self._record(first, second)
+
+        # the live index keeps up
+        result = self._sync()
+        self.assertEqual(sorted(self.indexed), [first.id, second.id])
+        self.assertEqual(result.events_kept, 2)
+        self.assertEqual(TodoOutbox.objects.count(), 2)
+
+        # only new events on the next run
+        self._record(third)
+        self._sync()
+        self.assertEqual(self.indexed, [third.id])
+
+        # the swap is done, everything is replayed into the new index
+        JobCheckpoint.objects.filter(name=REINDEX_CHECKPOINT_NAME).delete()
+        result = self._sync()
+        self.assertEqual(sorted(self.indexed), [todo.id for todo in self.todos])
+        self.assertEqual((result.events_processed, result.events_kept), (3, 0))
+        self.assertFalse(TodoOutbox.objects.exists())
+
+    def test_failures_during_a_reindex_are_retried(self):
+        first, second, third = self.todos
+        JobCheckpoint.objects.create(name=REINDEX_CHECKPOINT_NAME, state={"index": "todo-v2"})
+        self._record(first, second, third)
+        self.failing = {second.id}
+
+        result = self._sync()
+        self.assertEqual(result.events_retrying, 1)
+
+        self.failing = set()
+        self._sync()
+        self.assertEqual(sorted(self.indexed), [second.id, third.id])
+
+
+class StubBulkClient:
+    """
+    Answers ``bulk`` requests like Elasticsearch, with the statuses given
+    per document id, one per attempt; 201 once they run out.
+    """
+
+    def __init__(self, statuses=None):
+        self.statuses = {doc_id: list(values) for doc_id, values in (statuses or {}).items()}
+        self.requests = []
+
+    def bulk(self, operations):
+        self.requests.append(operations)
+        items = []
+        for operation in operations:
+            (op_type, meta), = operation.items()
+            if op_type not in ("index", "create", "update", "delete"):
+                # the document following its action line
+                continue
+            pending = self.statuses.get(meta["_id"])
+            status = pending.pop(0) if pending else 201
+            items.append({op_type: {"_id": meta["_id"], "status": status}})
+        return {"items": items}
+
+    def ids(self, request):
+        # document ids sent in the n-th request
+        return [operation["index"]["_id"] for operation in self.requests[request] if "index" in operation]
+
+
+def _index_actions(count, size=1):
+    return [{"_index": "todos", "_id": doc_id, "_source": {"title": "x" * size}} for doc_id in range(1, count + 1)]
+
+
+class BulkIndexerTests(SimpleTestCase):
+
+    def _indexer(self, client, **kwargs):
+        kwargs.setdefault("chunk_size", 100)
+        kwargs.setdefault("max_chunk_bytes", 10 * 1024 * 1024)
+        kwargs.setdefault("max_retries", 3)
+        return BulkIndexer(client, thread_count=1, initial_backoff=0, **kwargs)
+
+    def test_chunks_are_capped_by_count(self):
+        client = StubBulkClient()
+        result = self._indexer(client, chunk_size=2).run(_index_actions(5))
+
+        self.assertEqual([client.ids(i) for i in range(3)], [[1, 2], [3, 4], [5]])
+        self.assertEqual(result.succeeded, 5)
+
+    def test_chunks_are_capped_by_bytes(self):
+        client = StubBulkClient()
+        # each action takes a bit over 1000 bytes, two do not fit
+        result = self._indexer(client, max_chunk_bytes=2000).run(_index_actions(3, size=1000))
+
+        self.assertEqual([client.ids(i) for i in range(3)], [[1], [2], [3]])
+        self.assertEqual(result.succeeded, 3)
+
+    def test_only_failed_items_are_retried(self):
+        for status in (429, 502, 503, 504):
+            with self.subTest(status=status):
+                client = StubBulkClient({2: [status]})
+                result = self._indexer(client).run(_index_actions(3))
+
+                self.assertEqual([client.ids(0), client.ids(1)], [[1, 2, 3], [2]])
+                self.assertEqual((result.succeeded, result.retried, result.failed), (3, 1, []))
+
+    def test_other_errors_are_not_retried(self):
+        client = StubBulkClient({2: [400], 3: [409]})
+        result = self._indexer(client).run(_index_actions(3))
+
+        self.assertEqual(len(client.requests), 1)
+        self.assertEqual(result.succeeded, 1)
+        self.assertEqual([item["index"]["_id"] for item in result.failed], [2, 3])
+
+    def test_items_failing_every_retry_are_reported(self):
+        client = StubBulkClient({1: [503] * 10})
+        result = self._indexer(client, max_retries=2).run(_index_actions(2))
+
+        self.assertEqual(len(client.requests), 3)
+        self.assertEqual((result.succeeded, result.retried), (1, 2))
+        self.assertEqual(result.failed, [{"index": {"_id": 1, "status": 503}}])
+
+    def test_missing_documents_count_as_deleted(self):
+        client = StubBulkClient({1: [404]})
+        result = self._indexer(client).run([{"_op_type": "delete", "_index": "todos", "_id": 1}])
+
+        self.assertEqual((result.succeeded, result.failed), (1, []))
+
+
+class SuspendedRefreshTests(SimpleTestCase):
+
+    def test_restores_the_interval_of_the_index_behind_an_alias(self):
+        client = mock.Mock()
+        client.indices.get_settings.return_value = {"todos-2": {"settings": {"index": {"refresh_interval": "30s"}}}}
+
+        with suspended_refresh("todos", client):
+            client.indices.put_settings.assert_called_once_with(index="todos-2", settings={"index": {"refresh_interval": "-1"}})
+
+        client.indices.put_settings.assert_called_with(index="todos-2", settings={"index": {"refresh_interval": "30s"}})
@@ -1,26 +1,56 @@
+from django.conf import settings
 from django.urls import path
 from todo.interfaces.views.todo import (
     ListTodoView,
     ListTodoListsView,
     SingleTodoListView,
-    SingleTodoView
+    SingleTodoView,
+    BatchTodoView,
+    SearchTodoView
 )
 from todo.interfaces.views.tasks import (
     process_todo_upload_task,
+    upload_todo_file_task,
     cleanup_old_todos_task,
     send_todo_reminders_task,
+    reconcile_todo_counters_task,
+    get_task_status,
     get_available_tasks
 )
+from todo.interfaces.views.export import export_todo_list, export_all_todos
+from todo.interfaces.views.events import todo_events_stream, todo_list_events_stream
+from todo.interfaces.views.todo_async import (
+    AsyncListTodoListsView,
+    AsyncSingleTodoListView,
+    AsyncListTodoView,
+    AsyncSingleTodoView
+)
+
+if settings.TODO_ASYNC_VIEWS:
+    # same URLs, reads served on the event loop
+    ListTodoListsView = AsyncListTodoListsView
+    SingleTodoListView = AsyncSingleTodoListView
+    ListTodoView = AsyncListTodoView
+    SingleTodoView = AsyncSingleTodoView
 
 urlpatterns = [
     path("todo-lists/", ListTodoListsView.as_view()),
     path("todo-lists/<int:list_id>/", SingleTodoListView.as_view()),
     path("todo-lists/<int:list_id>/todos/", ListTodoView.as_view()),
-    path("todo-lists/<int:list_id>/todos/<int:todo_id>/", SingleTodoView.as_view()),
+    path("todo-lists/<int:list_id>/todos/batch/", BatchTodoView.as_view()),
+    path("todo-lists/<int:todo_list_id>/todos/<int:todo_id>/", SingleTodoView.as_view()),
+    path("todos/search/", SearchTodoView.as_view()),
+    path("todo-lists/export/", export_all_todos, name="export_todos"),
+    path("todo-lists/<int:list_id>/export/", export_todo_list, name="export_todo_list"),
+    path("todo-lists/<int:list_id>/events/", todo_list_events_stream, name="todo_list_events"),
+    path("events/", todo_events_stream, name="todo_events"),
     
     # Task endpoints
     path("tasks/", get_available_tasks, name="available_tasks"),
     path("tasks/upload/", process_todo_upload_task, name="process_todo_upload"),
+    path("tasks/upload/file/", upload_todo_file_task, name="upload_todo_file"),
     path("tasks/cleanup/", cleanup_old_todos_task, name="cleanup_old_todos"),
     path("tasks/reminders/", send_todo_reminders_task, name="send_todo_reminders"),
+    path("tasks/counters/", reconcile_todo_counters_task, name="reconcile_todo_counters"),
+    path("tasks/<str:task_id>/", get_task_status, name="task_status"),
 ]
\ No newline at end of file